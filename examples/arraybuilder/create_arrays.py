@@ -0,0 +1,43 @@
+import hycohanz as hfss
+
+# Remember: with the current library version, all the oAnsoftApp, oDesktop,
+# oProject, oDesign and oEditor objects can be omitted
+
+input('Press "Enter" to connect to HFSS.>')
+
+hfss.setup_interface()
+
+input('Press "Enter" to create a new project.>')
+
+hfss.new_project()
+
+input('Press "Enter" to insert a new DrivenModal design named HFSSDesign1.>')
+
+hfss.insert_design("HFSSDesign1", "DrivenModal")
+hfss.set_active_editor()
+
+def patch_cell(oEditor):
+    patch = hfss.create_rectangle(oEditor, 0, 0, 0, "8mm", "6mm", Name="Patch",
+                                  MaterialName="pec")
+    feed = hfss.create_cylinder(oEditor, "4mm", "2mm", "-1.6mm", "0.3mm", "1.6mm",
+                                Name="Feed", MaterialName="pec")
+    return [patch, feed]
+
+input('Press "Enter" to draw an 8x4 rectangular array of patches (one cell, two duplicates).>')
+
+elements = hfss.create_rectangular_array(patch_cell, 8, 4, "15mm", "12mm")
+print('{0} objects'.format(len(elements)))
+
+input('Press "Enter" to draw a 3-ring circular array of vias with 12 vias per ring.>')
+
+def via_cell(oEditor):
+    return hfss.create_cylinder(oEditor, "20mm", 0, 0, "0.5mm", "2mm", Name="Via")
+
+vias = hfss.create_circular_array(via_cell, 12, rings=3, ring_spacing="3mm")
+print('{0} vias'.format(len(vias)))
+
+input('Press "Enter" to quit HFSS.>')
+
+hfss.quit_application()
+
+hfss.clean_interface()
@@ -0,0 +1,44 @@
+import numpy as np
+
+import hycohanz as hfss
+
+# Remember: with the current library version, all the oAnsoftApp, oDesktop,
+# oProject, oDesign and oEditor objects can be omitted
+
+input('Press "Enter" to connect to HFSS.>')
+
+hfss.setup_interface()
+
+input('Press "Enter" to create a new project.>')
+
+hfss.new_project()
+
+input('Press "Enter" to insert a new DrivenModal design named HFSSDesign1.>')
+
+hfss.insert_design("HFSSDesign1", "DrivenModal")
+hfss.set_active_editor()
+
+input('Press "Enter" to draw a substrate and a 10x10 array of via holes.>')
+
+substrate = hfss.create_box("-1mm", "-1mm", 0, "11mm", "11mm", "1.6mm", Name="Substrate")
+x, y = np.meshgrid(np.arange(10), np.arange(10))
+centers = np.column_stack([x.ravel(), y.ravel(), np.zeros(100)])
+holes = hfss.create_cylinders(centers, 0.2, 1.6, names="Hole")
+pads = hfss.create_cylinders(centers + [0, 0, 1.6], 0.4, 0.035, names="Pad")
+
+input('Press "Enter" to subtract the holes and unite the pads one by one, through the planner.>')
+
+with hfss.BooleanPlanner() as planner:
+    for hole in holes:
+        planner.subtract([substrate], [hole])
+    for pad in pads[1:]:
+        planner.unite([pads[0], pad])
+
+print('Boolean operations requested: {0}'.format(planner.stats['requested']))
+print('Boolean calls sent to HFSS:   {0}'.format(planner.stats['executed']))
+
+input('Press "Enter" to quit HFSS.>')
+
+hfss.quit_application()
+
+hfss.clean_interface()
@@ -0,0 +1,44 @@
+import numpy as np
+
+import hycohanz as hfss
+
+# Remember: with the current library version, all the oAnsoftApp, oDesktop,
+# oProject, oDesign and oEditor objects can be omitted
+
+input('Press "Enter" to connect to HFSS.>')
+
+hfss.setup_interface()
+
+input('Press "Enter" to create a new project.>')
+
+hfss.new_project()
+
+input('Press "Enter" to insert a new DrivenModal design named HFSSDesign1.>')
+
+hfss.insert_design("HFSSDesign1", "DrivenModal")
+hfss.set_active_editor()
+
+input('Press "Enter" to create a coordinate system rotated by 45deg around Z.>')
+
+hfss.create_relative_cs("Tilted", origin=["10mm", 0, 0], xaxis=[1, 1, 0], yaxis=[-1, 1, 0])
+print(hfss.get_cs_matrix("Tilted"))
+
+input('Press "Enter" to draw a row of boxes in it.>')
+
+positions = [[2*n, 0, 0] for n in range(10)]
+boxes = hfss.create_boxes(positions, [1, 1, 1], PartCoordinateSystem="Tilted")
+
+input('Press "Enter" to get the global coordinates of their corners (computed locally).>')
+
+print(hfss.transform_points(np.array(positions)*1e-3, "Tilted", "Global"))
+print(hfss.get_bounding_box(boxes))
+
+input('Press "Enter" to go back to the global coordinate system.>')
+
+hfss.set_working_cs("Global")
+
+input('Press "Enter" to quit HFSS.>')
+
+hfss.quit_application()
+
+hfss.clean_interface()
@@ -0,0 +1,81 @@
+"""
+Benchmark of create_polyline() with a 10^5-point spiral, comparing the
+former per-coordinate formatting loop with the NumPy fast path. HFSS
+is not needed: the polyline is sent to a stand-in editor that discards it,
+so only the time spent before reaching COM is measured.
+"""
+import timeit
+
+import numpy as np
+import win32com.client
+
+import hycohanz as hfss
+from hycohanz.expression import Expression as Ex
+
+class Editor(win32com.client.CDispatch):
+    """Stand-in for the oEditor COM object."""
+    def __init__(self):
+        pass
+    def __eq__(self, other):
+        return self is other
+    def CreatePolyline(self, parameters, attributes):
+        return attributes[2]
+    def Unite(self, selections, parameters):
+        pass
+
+oEditor = Editor()
+
+N = 100000
+t = np.linspace(0, 200*np.pi, N)
+x = 1e-4*t*np.cos(t)
+y = 1e-4*t*np.sin(t)
+z = np.zeros(N)
+
+def old_polyline_points(x, y, z):
+    polylinepoints = ["NAME:PolylinePoints"]
+    for n in range(0, len(x)):
+        if isinstance(x[n], (str, Ex)):
+            xpt = Ex(x[n]).expr
+        elif isinstance(x[n], (float, int)):
+            xpt = str(x[n]) + "meter"
+        else:
+            raise TypeError('x must be of type str, int, float, or Ex')
+
+        if isinstance(y[n], (str, Ex)):
+            ypt = Ex(y[n]).expr
+        elif isinstance(y[n], (float, int)):
+            ypt = str(y[n]) + "meter"
+        else:
+            raise TypeError('y must be of type str, int, float, or Ex')
+
+        if isinstance(z[n], (str, Ex)):
+            zpt = Ex(z[n]).expr
+        elif isinstance(z[n], (float, int)):
+            zpt = str(z[n]) + "meter"
+        else:
+            raise TypeError('z must be of type str, int, float, or Ex')
+
+        polylinepoints.append([["NAME:PLPoint",
+                        "X:=", xpt,
+                        "Y:=", ypt,
+                        "Z:=", zpt]])
+    return polylinepoints
+
+def run_old():
+    old_polyline_points(x, y, z)
+
+def run_new():
+    hfss.create_polyline(oEditor, x, y, z, Name='Spiral', IsPolylineCovered=False)
+
+def run_chunked():
+    hfss.create_polyline(oEditor, x, y, z, Name='Spiral', IsPolylineCovered=False,
+                         MaxPoints=10000)
+
+t_old = timeit.timeit(run_old, number=1)
+t_new = timeit.timeit(run_new, number=1)
+t_chunked = timeit.timeit(run_chunked, number=1)
+
+print('{0} points'.format(N))
+print('former point formatting loop:  {0:.2f} s'.format(t_old))
+print('create_polyline (NumPy path):  {0:.2f} s'.format(t_new))
+print('create_polyline (10 chunks):   {0:.2f} s'.format(t_chunked))
@@ -0,0 +1,41 @@
+import hycohanz as hfss
+
+# Remember: with the current library version, all the oAnsoftApp, oDesktop,
+# oProject, oDesign and oEditor objects can be omitted
+
+input('Press "Enter" to connect to HFSS.>')
+
+hfss.setup_interface()
+
+input('Press "Enter" to create a new project.>')
+
+hfss.new_project()
+
+input('Press "Enter" to insert a new DrivenModal design named HFSSDesign1.>')
+
+hfss.insert_design("HFSSDesign1", "DrivenModal")
+hfss.set_active_editor()
+
+input('Press "Enter" to draw a row of three boxes.>')
+
+boxes = hfss.create_boxes([[0, 0, 0], [10, 0, 0], [20, 0, 0]], [4, 5, 3])
+
+input('Press "Enter" to grab the twelve vertical edges of the boxes in a single request.> ')
+
+positions = [(box, x0 + dx, dy, 1.5)
+             for box, x0 in zip(boxes, [0, 10, 20])
+             for dx in (0, 4) for dy in (0, 5)]
+edgeids = hfss.get_edges_by_position(positions)
+
+print('edgeids: ' + str(edgeids))
+
+input('Press "Enter" to fillet the edges.> ')
+
+for n, box in enumerate(boxes):
+    hfss.fillet([box], edgeids[4*n:4*n + 4], 1)
+
+input('Press "Enter" to quit HFSS.>')
+
+hfss.quit_application()
+
+hfss.clean_interface()
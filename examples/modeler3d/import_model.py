@@ -27,6 +27,20 @@ input('Press "Enter" to import a model of a machine screw from an SAT file.> ')
 
 hfss.import_model(oEditor, os.path.abspath('Capscrew.SAT'))
 
+input('Press "Enter" to import it twice more in a batch, through the import cache.> ')
+
+partlists = hfss.import_models(oEditor, [os.path.abspath('Capscrew.SAT')]*2, Cache=True)
+print(partlists)
+
+input('Press "Enter" to export the screw as an STL tessellation and import it simplified.> ')
+
+hfss.export_model(oEditor, partlists[0], os.path.abspath('Capscrew.stl'))
+hfss.import_model(oEditor, os.path.abspath('Capscrew.stl'), Simplify=True, SimplifyTolerance=0.01)
+report = hfss.get_simplify_report()
+print('{0} -> {1} triangles in {2:.2f} s'.format(report['triangles_before'],
+                                                 report['triangles_after'],
+                                                 report['simplify_time']))
+
 input('Press "Enter" to quit HFSS.>')
 
 hfss.quit_application(oDesktop)
@@ -0,0 +1,64 @@
+"""
+Benchmark of the local position queries of hycohanz.geometry on a large via
+array: a substrate with a 50x50 array of vias, as recorded by create_box()
+and duplicate_along_line(). Only the local part is measured, so HFSS is not
+needed: the queries that are answered locally do not call HFSS at all, so
+compare these times with the time of a GetBodyNamesByPosition call in your
+installation.
+
+The bounding volume hierarchy is compared with a linear scan over the same
+geometries.
+"""
+import timeit
+
+import numpy as np
+
+import hycohanz.geometry as geometry
+import hycohanz.model as model
+
+class Editor(object):
+    """Stand-in for the oEditor COM object, used only as a table key."""
+
+oEditor = Editor()
+table = model.model_table(oEditor)
+table.units = 'mm'
+table.synced = True
+
+N = 50
+pitch = 1.0
+box = ["NAME:BoxParameters",
+       "XPosition:=", "-1mm", "YPosition:=", "-1mm", "ZPosition:=", "0mm",
+       "XSize:=", "{0}mm".format(N*pitch + 1), "YSize:=", "{0}mm".format(N*pitch + 1),
+       "ZSize:=", "1.6mm"]
+model.record_primitive(oEditor, 'Substrate', 'Box', box, ["NAME:Attributes"])
+for i in range(N):
+    for j in range(N):
+        cylinder = ["NAME:CylinderParameters",
+                    "XCenter:=", "{0}mm".format(i*pitch), "YCenter:=", "{0}mm".format(j*pitch),
+                    "ZCenter:=", "0mm", "Radius:=", "0.15mm", "Height:=", "1.6mm",
+                    "WhichAxis:=", "Z", "NumSides:=", "0"]
+        model.record_primitive(oEditor, 'Via_{0}_{1}'.format(i, j), 'Cylinder',
+                               cylinder, ["NAME:Attributes"])
+
+rng = np.random.RandomState(0)
+points = np.column_stack([rng.uniform(-1, N*pitch, 1000),
+                          rng.uniform(-1, N*pitch, 1000),
+                          rng.uniform(0, 1.6, 1000)])*1e-3
+
+def run_bvh():
+    for point in points:
+        geometry.find_bodies(oEditor, point)
+
+def run_linear():
+    index = geometry.spatial_index(oEditor)
+    for point in points:
+        [name for name, g in zip(index.names, index.geometries) if g.contains(point)]
+
+t_build = timeit.timeit(lambda: geometry.SpatialIndex(oEditor, table), number=1)
+t_bvh = timeit.timeit(run_bvh, number=3)/3
+t_linear = timeit.timeit(run_linear, number=1)
+
+print('{0} objects, {1} point queries'.format(len(table.names()), len(points)))
+print('index build:  {0:.1f} ms'.format(t_build*1e3))
+print('BVH:          {0:.1f} us/query'.format(t_bvh/len(points)*1e6))
+print('linear scan:  {0:.1f} us/query'.format(t_linear/len(points)*1e6))
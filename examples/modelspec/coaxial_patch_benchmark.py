@@ -0,0 +1,96 @@
+"""
+Coaxial-fed patch antenna (see create_coaxial_fed_patch_antenna.py) as a
+declarative ModelSpec, and a benchmark of incremental re-application
+against rebuilding the whole model, for several geometric changes.
+"""
+import time
+
+import hycohanz as hfss
+
+OuterCoaxRadius = "2.05mm"
+innerCoaxRadius = "0.635mm"
+thicknessOuterConductor = "180um"
+
+def coaxial_patch(probe_radius=innerCoaxRadius, patch_material="copper"):
+    spec = hfss.ModelSpec()
+    LengthCoax = spec.variable("LengthCoaxial", "5mm")
+    h = spec.variable("thicknessSubstrate", "30mils")
+    S = spec.variable("SubstrateSize", "20mm")
+    t = spec.variable("thicknessPatch", "180um")
+    d = spec.variable("FedDealignment", "1.31mm")
+    W = spec.variable("W", "7.02mm")
+    L = spec.variable("L", "4.78mm")
+
+    spec.primitive("create_rectangle", -S/2, -S/2, 0, S, S, Name="GNDPlane",
+                   Transparency=0.2, Color=(200, 143, 14))
+    spec.primitive("create_circle", 0, -d, 0, OuterCoaxRadius, Name="GNDHole")
+    spec.operation("GNDCut", "subtract", ["GNDPlane"], ["GNDHole"])
+    spec.primitive("create_box", -S/2, -S/2, 0, S, S, h, Name="SubstratePlane",
+                   MaterialName="Rogers RO4350 (tm)", Transparency=0.7)
+    spec.primitive("create_box", -W/2, -L/2, h, W, L, t, Name="Patch",
+                   MaterialName=patch_material, Transparency=0.1, Color=(200, 143, 14))
+
+    spec.primitive("create_cylinder", 0, -d, -LengthCoax,
+                   hfss.Expression(OuterCoaxRadius) + thicknessOuterConductor, LengthCoax,
+                   MaterialName="pec", Name="Coaxial")
+    spec.primitive("create_cylinder", 0, -d, -LengthCoax, OuterCoaxRadius, LengthCoax,
+                   Name="CoaxialErase")
+    spec.operation("CoaxialCut", "subtract", ["Coaxial"], ["CoaxialErase"])
+    spec.primitive("create_cylinder", 0, -d, -LengthCoax, OuterCoaxRadius, LengthCoax,
+                   MaterialName="Teflon (tm)", Name="CoaxialInterior")
+    spec.primitive("create_cylinder", 0, -d, -LengthCoax, probe_radius, LengthCoax,
+                   Name="CoaxialInteriorErase")
+    spec.operation("CoaxialInteriorCut", "subtract", ["CoaxialInterior"], ["CoaxialInteriorErase"])
+    spec.primitive("create_cylinder", 0, -d, -LengthCoax, probe_radius, LengthCoax,
+                   MaterialName="pec", Name="CoaxialCore")
+    spec.primitive("create_cylinder", 0, -d, 0, probe_radius, h,
+                   MaterialName="pec", Name="CoaxialProbe")
+    spec.operation("ProbeCut", "subtract", ["SubstratePlane"], ["CoaxialProbe"], KeepOriginals=True)
+
+    spec.boundary("PerfE_GND", "assign_perfect_e", "PerfE_GND", hfss.FaceIDs("GNDPlane"))
+    spec.boundary("CoaxialWaveport", "assign_lumpedport",
+                  [hfss.FaceAt("CoaxialInterior", (hfss.Expression(OuterCoaxRadius) + probe_radius)/2,
+                               -d, -LengthCoax)],
+                  [0, -d - probe_radius, -LengthCoax],
+                  [0, -d - OuterCoaxRadius, -LengthCoax],
+                  PortImpedance="47.5ohm", portname="CoaxialWaveport")
+    return spec
+
+hfss.setup_interface()
+hfss.new_project()
+hfss.insert_design("HFSSDesign1", "DrivenModal")
+hfss.set_active_editor()
+
+input('Press "Enter" to build the antenna from its spec.>')
+
+report = hfss.apply_model_spec(coaxial_patch())
+print('Built in {0:.2f} s'.format(report['time']))
+
+changes = [("patch width (variable)", dict(), {"W": "7.5mm"}),
+           ("patch material (attribute)", dict(patch_material="gold"), {}),
+           ("probe radius (primitive parameters)", dict(probe_radius="0.5mm"), {})]
+
+input('Press "Enter" to run the benchmark.>')
+
+for description, arguments, variables in changes:
+    spec = coaxial_patch(**arguments)
+    for name, value in variables.items():
+        spec.variable(name, value)
+
+    report = hfss.apply_model_spec(spec)
+    incremental = report['time']
+    print('{0}: updated {1}, rebuilt {2}'.format(description, report['updated'], report['rebuilt']))
+
+    # Back to the original model, and the same change rebuilding everything
+    hfss.apply_model_spec(coaxial_patch())
+    start = time.time()
+    hfss.apply_model_spec(spec, rebuild=True)
+    full = time.time() - start
+    print('    incremental {0:.2f} s, full rebuild {1:.2f} s'.format(incremental, full))
+    hfss.apply_model_spec(coaxial_patch())
+
+input('Press "Enter" to quit HFSS.>')
+
+hfss.quit_application()
+
+hfss.clean_interface()
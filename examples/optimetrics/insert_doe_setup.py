@@ -0,0 +1,41 @@
+import hycohanz as hfss
+
+# Remember: with the current library version, all the oAnsoftApp, oDesktop,
+# oProject, oDesign and oEditor objects can be omitted
+
+input('Press "Enter" to connect to HFSS.>')
+
+hfss.setup_interface()
+
+input('Press "Enter" to create a new project.>')
+
+hfss.new_project()
+
+input('Press "Enter" to insert a new DrivenModal design named HFSSDesign1.>')
+
+hfss.insert_design("HFSSDesign1", "DrivenModal")
+hfss.set_active_editor()
+
+hfss.add_property(["W", "L"], ["7mm", "5mm"])
+hfss.create_box(0, 0, 0, hfss.Expression("W"), hfss.Expression("L"), "1mm")
+
+setupname = hfss.insert_analysis_setup(10e9)
+
+input('Press "Enter" to insert a parametric setup with 16 Sobol variations of W and L.>')
+
+variations = hfss.insert_doe_setup({"W": ("6mm", "8mm"), "L": ("4mm", "6mm")},
+                                   [setupname],
+                                   plan="sobol",
+                                   samples=16,
+                                   Name="DOE1")
+print(variations)
+
+input('Press "Enter" to solve all the variations in a single batch.>')
+
+hfss.solve_parametric_setup("DOE1")
+
+input('Press "Enter" to quit HFSS.>')
+
+hfss.quit_application()
+
+hfss.clean_interface()
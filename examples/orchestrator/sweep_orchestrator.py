@@ -0,0 +1,35 @@
+"""
+Run a list of variations across several workers with simulated solve times,
+so the orchestration can be tried without HFSS. Every worker gets a
+contiguous chunk of the variations, and the slow ones (the variations with
+the largest W) are stolen by the workers that finish first.
+
+With HFSS, setup_worker() would connect to one desktop per worker, and
+run_variation() would apply the variables (or rebuild the geometry), call
+solve() and export the results.
+"""
+import random
+import time
+
+import hycohanz as hfss
+
+variations = hfss.generate_variations({"W": ("6mm", "8mm"), "L": ("4mm", "6mm")},
+                                      levels=5)
+
+def run_variation(worker, variation):
+    width = float(variation["W"][:-2])
+    # Simulated solve time, longer for the largest patches
+    solve_time = 0.02*width**2*random.uniform(0.5, 1.5)
+    time.sleep(solve_time)
+    return {"solve_time": solve_time}
+
+orchestrator = hfss.SweepOrchestrator(4, run_variation)
+table = orchestrator.run(variations)
+
+serial_time = sum(row["solve_time"] for row in table)
+print("{0} variations solved by {1} workers".format(len(table), len(orchestrator.workers)))
+print("Variations per worker: {0}".format(orchestrator.stats["completed"]))
+print("Stolen variations: {0}".format(orchestrator.stats["steals"]))
+print("Elapsed time: {0:.2f} s (serial: {1:.2f} s)".format(orchestrator.stats["elapsed"], serial_time))
+
+hfss.write_csv(table, "sweep_results.csv")
@@ -0,0 +1,58 @@
+"""
+Benchmark of the unit conversion done by eval_expression(), comparing the
+former per-token quantiphy parsing with the precompiled table of
+hycohanz.units. Only the local part of the evaluation is measured (the
+expressions are already expanded), so HFSS is not needed.
+
+The expressions mimic the coordinates computed by the boundary functions
+(e.g. assign_waveport() or assign_floquetport()), which call
+eval_expression() for every coordinate of every port.
+"""
+import re
+import timeit
+
+from quantiphy import Quantity
+
+import hycohanz.units as units
+
+# Expanded expressions as they come out of expand_expression()
+expressions = ['-(20mm)/2 + 0.5*(4.78mm)',
+               '(30mil) + (180um)/2',
+               '299792458.0/14GHz/4 + 18um',
+               '(7.02mm)/2 - (1.31mm)',
+               '2*(20mm) + 0.25*299792458.0/14GHz',
+               '(5*1e-3) + (30mil)']*50
+
+def old_to_si(str1):
+    for variableWithUnits in list(set(re.findall(r'\b[\d]+\.?[\d]*[A-Za-z]+', str1))):
+        if 'mil' in variableWithUnits:
+            aux = variableWithUnits.replace('mil', '')
+            str1 = str1.replace(variableWithUnits, str(float(aux)*2.54e-5))
+        else:
+            str1 = str1.replace(variableWithUnits, str(float(Quantity(variableWithUnits))))
+    return str1
+
+def run_old():
+    for expr in expressions:
+        try:
+            eval(old_to_si(expr))
+        except Exception:
+            pass    # e.g. '5*1e-3' is not handled by the former parser
+
+def run_new():
+    for expr in expressions:
+        units.evaluate(expr)
+
+def run_new_uncached():
+    units.clear_cache()
+    run_new()
+
+number = 20
+t_old = timeit.timeit(run_old, number=number)/number
+t_new = timeit.timeit(run_new_uncached, number=number)/number
+t_cached = timeit.timeit(run_new, number=number)/number
+
+print('{0} expressions per run'.format(len(expressions)))
+print('quantiphy per token:     {0:.2f} ms'.format(t_old*1e3))
+print('unit table (cold cache): {0:.2f} ms'.format(t_new*1e3))
+print('unit table (warm cache): {0:.2f} ms'.format(t_cached*1e3))
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""
+Construction of periodic arrays (antenna arrays, via fences...) from a unit
+cell.
+
+The unit cell is drawn once by a user function, and the array is made with
+duplicate_along_line() and duplicate_around_axis() (nested for 2D
+lattices), so an N x M array costs a single cell construction and a few
+duplicate calls instead of N*M cell constructions.
+
+Example Usage
+-------------
+>>> def patch_cell(oEditor):
+...     return [hfss.create_rectangle(oEditor, 0, 0, "h", "W", "L", Name="Patch")]
+>>> elements = hfss.create_rectangular_array(patch_cell, 8, 4, "20mm", "25mm")
+"""
+
+from __future__ import division, print_function, unicode_literals, absolute_import
+
+import math
+
+import hycohanz.conf as conf
+from hycohanz.expression import Expression as Ex
+from hycohanz.modeler3d import duplicate_along_line, duplicate_around_axis
+
+# In-plane directions (first and second) for each lattice plane normal
+_plane_axes = {'X': ((0, 1, 0), (0, 0, 1)),
+               'Y': ((0, 0, 1), (1, 0, 0)),
+               'Z': ((1, 0, 0), (0, 1, 0))}
+
+def _scaled(direction, length):
+    """
+    Returns the components of a vector of the given length along a
+    coordinate direction.
+    """
+    return [Ex(length) if c else 0 for c in direction]
+
+def _build_cell(oEditor, build_cell):
+    partlist = build_cell(oEditor)
+    if isinstance(partlist, str):
+        partlist = [partlist]
+    return list(partlist)
+
+@conf.checkDefaultEditor
+def create_rectangular_array(oEditor, build_cell, nx, ny, dx, dy, plane='Z', **kwargs):
+    """
+    Draw a rectangular array of unit cells.
+
+    Parameters
+    ----------
+    oEditor : pywin32 COMObject
+        The HFSS editor in which the operation will be performed.
+    build_cell : callable
+        Function build_cell(oEditor) that draws the first cell of the array
+        and returns the name (or list of names) of its objects.
+    nx, ny : int
+        Number of cells along the first and second directions of the plane.
+    dx, dy : float, str or hycohanz Expression object
+        Spacing between cells along the first and second directions.
+    plane : str
+        Normal of the plane of the array: 'Z' (the array is along X and Y),
+        'X' (along Y and Z) or 'Y' (along Z and X).
+    **kwargs :
+        Options passed to duplicate_along_line().
+
+    Returns
+    -------
+    partlist : list of str
+        Names of the objects of all the cells, starting with the first cell.
+    """
+    first, second = _plane_axes[plane]
+    partlist = _build_cell(oEditor, build_cell)
+    if nx > 1:
+        partlist = duplicate_along_line(oEditor, partlist, *_scaled(first, dx),
+                                        clonesNumber=nx, **kwargs)
+    if ny > 1:
+        partlist = duplicate_along_line(oEditor, partlist, *_scaled(second, dy),
+                                        clonesNumber=ny, **kwargs)
+    return partlist
+
+@conf.checkDefaultEditor
+def create_triangular_array(oEditor, build_cell, nx, ny, dx, dy=None, plane='Z', **kwargs):
+    """
+    Draw a triangular array of unit cells, in which every other row is
+    shifted by half the spacing along the rows.
+
+    The array is made of a row of nx cells, a shifted copy of it, nested
+    duplicates of both rows and, for an odd number of rows, a copy of the
+    first row on top, so it costs at most four duplicate calls.
+
+    Parameters
+    ----------
+    oEditor : pywin32 COMObject
+        The HFSS editor in which the operation will be performed.
+    build_cell : callable
+        Function build_cell(oEditor) that draws the first cell of the array
+        and returns the name (or list of names) of its objects.
+    nx : int
+        Number of cells per row.
+    ny : int
+        Number of rows.
+    dx : float, str or hycohanz Expression object
+        Spacing between cells along the rows.
+    dy : float, str or hycohanz Expression object
+        Spacing between rows. By default, dx*sqrt(3)/2 (equilateral
+        triangles, i.e. a hexagonal lattice).
+    plane : str
+        Normal of the plane of the array ('X', 'Y' or 'Z').
+    **kwargs :
+        Options passed to duplicate_along_line().
+
+    Returns
+    -------
+    partlist : list of str
+        Names of the objects of all the cells, starting with the first cell.
+    """
+    if dy is None:
+        dy = Ex(dx)*(math.sqrt(3)/2)
+    first, second = _plane_axes[plane]
+    row = _build_cell(oEditor, build_cell)
+    if nx > 1:
+        row = duplicate_along_line(oEditor, row, *_scaled(first, dx), clonesNumber=nx, **kwargs)
+    if ny < 2:
+        return row
+
+    # The directions are orthogonal, so each component comes from one of them
+    shift = [a or b for a, b in zip(_scaled(first, Ex(dx)*0.5), _scaled(second, dy))]
+    pair = duplicate_along_line(oEditor, row, *shift, clonesNumber=2, **kwargs)
+    partlist = pair
+    if ny//2 > 1:
+        partlist = duplicate_along_line(oEditor, pair, *_scaled(second, Ex(dy)*2),
+                                        clonesNumber=ny//2, **kwargs)
+    if ny % 2:
+        top = duplicate_along_line(oEditor, row, *_scaled(second, Ex(dy)*(ny - 1)),
+                                   clonesNumber=2, **kwargs)
+        partlist = partlist + top[len(row):]
+    return partlist
+
+@conf.checkDefaultEditor
+def create_circular_array(oEditor, build_cell, count, rings=1, ring_spacing=0,
+                          angle=None, axis='Z', **kwargs):
+    """
+    Draw a circular (polar) array of unit cells around a coordinate axis.
+
+    The first cell must be drawn at the radius of the first ring, along the
+    first direction of the plane normal to the axis (X for the Z axis, Y for
+    the X axis and Z for the Y axis). Further rings are made by duplicating
+    the cell radially, and all the rings are then duplicated around the
+    axis, so every ring has the same number of cells.
+
+    Parameters
+    ----------
+    oEditor : pywin32 COMObject
+        The HFSS editor in which the operation will be performed.
+    build_cell : callable
+        Function build_cell(oEditor) that draws the first cell of the array
+        and returns the name (or list of names) of its objects.
+    count : int
+        Number of cells per ring.
+    rings : int
+        Number of rings.
+    ring_spacing : float, str or hycohanz Expression object
+        Radial distance between rings.
+    angle : float, str or hycohanz Expression object
+        Angle between consecutive cells of a ring. By default, 360deg/count.
+    axis : str
+        Axis of the array ('X', 'Y' or 'Z').
+    **kwargs :
+        Options passed to duplicate_along_line() and duplicate_around_axis().
+
+    Returns
+    -------
+    partlist : list of str
+        Names of the objects of all the cells, starting with the first cell.
+    """
+    if angle is None:
+        angle = Ex('360deg')/count
+    partlist = _build_cell(oEditor, build_cell)
+    if rings > 1:
+        partlist = duplicate_along_line(oEditor, partlist, *_scaled(_plane_axes[axis][0], ring_spacing),
+                                        clonesNumber=rings, **kwargs)
+    if count > 1:
+        partlist = duplicate_around_axis(oEditor, partlist, angle, count, axis=axis, **kwargs)
+    return partlist
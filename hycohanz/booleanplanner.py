@@ -0,0 +1,487 @@
+# -*- coding: utf-8 -*-
+"""
+Planner of boolean operations (subtract and unite) of the 3D modeler.
+
+Scripts often subtract or unite one tool at a time in loops, which costs a
+COM call and a boolean evaluation of the growing body per tool. The planner
+collects the pending operations instead, merges the ones that can be done
+in a single call (the subtractions from the same blanks, and the chains of
+unions) and executes them in as few calls as possible, with the tools in
+spatial order.
+
+Operations are only merged (and moved earlier) when no operation between
+them involves the same objects, so the result is the same as running them
+in the given order.
+
+Before any call, the tools of every subtraction are checked against the
+blanks with their local geometry (see hycohanz.geometry.interference()),
+as left by the operations before it: tools that do not reach into any
+blank would leave the blanks unchanged, so when leaving them out saves
+whole calls (a subtraction, or a batch of it, left without tools) they
+are deleted instead (all of them in a single call at the end). A tool
+that contains a blank would leave it empty, which HFSS rejects, so it is
+skipped for that blank: it is only subtracted, in a separate call, from
+the other blanks it reaches into, or deleted like the unused tools. The
+parts of large unions are ordered so that the batches unite neighbouring,
+touching parts first.
+
+Example Usage
+-------------
+>>> with hfss.BooleanPlanner() as planner:
+...     for via in vias:
+...         planner.subtract(['Substrate'], [via])
+>>> planner.stats
+{'requested': 400, 'executed': 1, 'saved': 0, 'skipped': 0}
+"""
+
+from __future__ import division, print_function, unicode_literals, absolute_import
+
+import numpy as np
+
+import hycohanz.conf as conf
+import hycohanz.geometry as geometry
+import hycohanz.modeler3d as modeler3d
+from hycohanz.model import model_table
+
+def _morton_code(cell):
+    """
+    Interleaves the bits of three 10-bit integers.
+    """
+    code = 0
+    for bit in range(10):
+        for axis in range(3):
+            code |= ((int(cell[axis]) >> bit) & 1) << (3*bit + axis)
+    return code
+
+def spatial_order(oEditor, names):
+    """
+    Returns the names sorted along a Z-order curve of the centers of their
+    bounding boxes, so that neighbouring objects are consecutive. Objects of
+    unknown geometry are kept at the end, in their original order.
+    """
+    table = model_table(oEditor)
+    known = []
+    centers = []
+    unknown = []
+    for name in names:
+        objectgeometry = None
+        if name in table:
+            objectgeometry = geometry.object_geometry(oEditor, table[name])
+        if objectgeometry is None:
+            unknown.append(name)
+        else:
+            known.append(name)
+            centers.append((objectgeometry.lower + objectgeometry.upper)/2)
+    if len(known) < 2:
+        return known + unknown
+
+    centers = np.array(centers)
+    lower = centers.min(axis=0)
+    extent = np.maximum(centers.max(axis=0) - lower, 1e-300)
+    cells = np.floor((centers - lower)/extent*1023).astype(int)
+    codes = [_morton_code(cell) for cell in cells]
+    return [known[n] for n in sorted(range(len(known)), key=lambda n: codes[n])] + unknown
+
+class BooleanPlanner(object):
+    """
+    Collects subtract and unite operations and executes them with the
+    fewest calls.
+
+    Parameters
+    ----------
+    oEditor : pywin32 COMObject
+        The HFSS editor in which the operations will be performed. The
+        current global editor by default.
+    batchsize : int
+        Maximum number of objects per call. Larger unions are done as a
+        balanced tree of unions of neighbouring objects, and larger
+        subtractions in several calls. By default, each merged operation is
+        done in a single call.
+    spatial : bool
+        Whether to sort the tools in spatial order.
+    check : bool
+        Whether to check the interference of the tools and blanks of the
+        subtractions, and of the parts of the unions, before executing them.
+
+    Attributes
+    ----------
+    stats : dict
+        Number of operations requested ('requested'), of calls sent to
+        HFSS ('executed'), of boolean calls avoided by the interference
+        checks ('saved') and of tools skipped because they would leave a
+        blank empty ('skipped') by the last execute().
+    skipped : list of tuples
+        (tool, blank) pairs of the subtractions skipped by the last
+        execute() because the tool contains the blank.
+
+    The planner is also a context manager, which executes the pending
+    operations on exit (unless an exception was raised).
+
+    """
+    def __init__(self, oEditor=None, batchsize=None, spatial=True, check=True):
+        if oEditor is None:
+            if not conf.oEditorList:
+                raise Exception("Internal oEditor object has not been initialized yet")
+            oEditor = conf.oEditorList[-1]
+        self.oEditor = oEditor
+        self.batchsize = batchsize
+        self.spatial = spatial
+        self.check = check
+        self.pending = []
+        self.stats = {'requested': 0, 'executed': 0, 'saved': 0, 'skipped': 0}
+        self.skipped = []
+        self._merged_into = dict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.execute()
+
+    def subtract(self, blanklist, toollist, KeepOriginals=False):
+        """
+        Queues a subtraction (see modeler3d.subtract()).
+
+        Returns
+        -------
+        blank : str
+            Name of the object that will hold the result.
+        """
+        self.pending.append(('Subtract', list(blanklist), list(toollist), KeepOriginals))
+        return blanklist[0]
+
+    def unite(self, partlist, KeepOriginals=False):
+        """
+        Queues a union (see modeler3d.unite()).
+
+        Returns
+        -------
+        part : str
+            Name of the object that will hold the result.
+        """
+        self.pending.append(('Unite', list(partlist), [], KeepOriginals))
+        return partlist[0]
+
+    def final_name(self, name):
+        """
+        Returns the name of the object in which a united object ended up
+        after execute(), or the name itself if it was not united.
+        """
+        while name in self._merged_into:
+            name = self._merged_into[name]
+        return name
+
+    def plan(self):
+        """
+        Merges the pending operations.
+
+        Returns
+        -------
+        groups : list of tuples
+            Merged operations, in execution order, as ('Subtract', blanks,
+            tools, KeepOriginals) or ('Unite', parts, [], KeepOriginals).
+        """
+        operations = self.pending
+        touched = [set(blanks) | set(tools) for kind, blanks, tools, keep in operations]
+        group_of = list(range(len(operations)))
+
+        def members(group):
+            return [i for i in range(len(operations)) if group_of[i] == group]
+
+        def can_move(names, start, stop, exclude):
+            # Whether no operation between start and stop (excluded) other
+            # than the ones in exclude involves any of the names
+            return not any(touched[j] & names for j in range(start + 1, stop)
+                           if group_of[j] not in exclude)
+
+        for i, (kind, blanks, tools, keep) in enumerate(operations):
+            if keep:
+                continue
+            if kind == 'Subtract':
+                for group in sorted(set(group_of[:i])):
+                    first = operations[group]
+                    if (first[0] == 'Subtract' and not first[3] and first[1] == blanks
+                        and can_move(touched[i], group, i, (group,))):
+                        group_of[i] = group
+                        break
+            else:
+                # Unions sharing objects with this one are merged with it,
+                # provided they can be moved up to the first of them
+                linked = sorted(set(group_of[j] for j in range(i)
+                                    if operations[group_of[j]][0] == 'Unite'
+                                    and not operations[group_of[j]][3]
+                                    and touched[j] & touched[i]))
+                if not linked:
+                    continue
+                target = linked[0]
+                groupnames = set(touched[i])
+                for group in linked[1:]:
+                    for j in members(group):
+                        groupnames |= touched[j]
+                if not can_move(groupnames, target, i, linked):
+                    continue
+                for group in linked[1:]:
+                    for j in members(group):
+                        group_of[j] = target
+                group_of[i] = target
+
+        groups = []
+        for group in sorted(set(group_of)):
+            indexes = members(group)
+            kind, blanks, tools, keep = operations[group]
+            if kind == 'Subtract':
+                tools = []
+                for i in indexes:
+                    tools.extend(tool for tool in operations[i][2] if tool not in tools)
+                groups.append(('Subtract', blanks, tools, keep))
+            else:
+                groups.append(('Unite', self._union_parts(indexes), [], keep))
+        return groups
+
+    def _union_parts(self, indexes):
+        """
+        Returns the objects of a chain of unions, with the one holding the
+        final result first.
+        """
+        # Object holding each object after the unions so far
+        holder = dict()
+        def find(name):
+            while holder.get(name, name) != name:
+                name = holder[name]
+            return name
+
+        parts = []
+        for i in indexes:
+            partlist = self.pending[i][1]
+            parts.extend(part for part in partlist if part not in parts)
+            # The first object of each union keeps the result
+            result = find(partlist[0])
+            for part in partlist:
+                holder[find(part)] = result
+        final = find(parts[0])
+        return [final] + [part for part in parts if part != final]
+
+    def _run(self, kind, names, tools, keep):
+        """
+        Executes a merged operation, in batches if needed.
+        """
+        oEditor = self.oEditor
+        if kind == 'Subtract':
+            if not tools:
+                return
+            batchsize = self.batchsize or len(tools)
+            if self.spatial:
+                tools = spatial_order(oEditor, tools)
+            for start in range(0, len(tools), batchsize):
+                modeler3d.subtract(oEditor, names, tools[start:start+batchsize], KeepOriginals=keep)
+                self.stats['executed'] += 1
+            return
+
+        final, others = names[0], names[1:]
+        if self.spatial:
+            others = spatial_order(oEditor, others)
+        if self.check and self.batchsize:
+            others = self._touching_order(final, others)
+        parts = [final] + others
+        batchsize = max(self.batchsize or len(parts), 2)
+        # Balanced tree: unite consecutive batches, then their results
+        while len(parts) > 1:
+            results = []
+            for start in range(0, len(parts), batchsize):
+                batch = parts[start:start+batchsize]
+                if len(batch) > 1:
+                    modeler3d.unite(oEditor, batch, KeepOriginals=keep)
+                    self.stats['executed'] += 1
+                    if not keep:
+                        for part in batch[1:]:
+                            self._merged_into[part] = batch[0]
+                results.append(batch[0])
+            parts = results
+
+    def _check(self, groups):
+        """
+        Checks the subtractions of the merged operations, following the
+        local geometry of the objects through the operations before each
+        of them, without changing the model table.
+
+        Returns
+        -------
+        groups : list of tuples
+            The merged operations, without the tools left out of the
+            subtractions, and with the subtractions of the tools that
+            contain some blank from the other blanks only.
+        unused : list of str
+            Tools left out that must be deleted.
+        """
+        table = model_table(self.oEditor)
+        # Geometry of the objects changed by the operations so far (None
+        # for the removed ones)
+        changed = dict()
+        def known_geometry(name):
+            if name in changed:
+                return changed[name]
+            return geometry.object_geometry(self.oEditor, table[name]) if name in table else None
+
+        def bounding_box(names):
+            geometries = [known_geometry(name) for name in names]
+            if None in geometries:
+                return None
+            result = geometries[0]
+            for other in geometries[1:]:
+                result = result.union(other)
+            return geometry.Geometry(result.lower, result.upper)
+
+        def calls(tools):
+            return -(-len(tools)//(self.batchsize or len(tools))) if tools else 0
+
+        checked = []
+        unused = []
+        for kind, names, tools, keep in groups:
+            if kind == 'Subtract':
+                used, toolsout, emptying = self._check_subtract(names, tools, known_geometry)
+                skippedtools = [tool for tool, contained, reached in emptying]
+                kept = [tool for tool in tools if tool not in skippedtools]
+                # Deleting the tools costs a call too, so they are only left
+                # out when whole subtractions (or batches) are saved
+                if calls(used) < calls(kept):
+                    kept = used
+                    if not keep:
+                        unused.extend(toolsout)
+                self.stats['saved'] += calls(tools) - calls(kept)
+                checked.append((kind, names, kept, keep))
+
+                # The tools that would empty a blank are subtracted from the
+                # other blanks they reach into, grouped by these blanks
+                others = []
+                for tool, contained, reached in emptying:
+                    self.skipped.extend((tool, blank) for blank in contained)
+                    if not reached:
+                        if not keep:
+                            unused.append(tool)
+                        continue
+                    for blanks, blanktools in others:
+                        if blanks == reached:
+                            blanktools.append(tool)
+                            break
+                    else:
+                        others.append((reached, [tool]))
+                self.stats['skipped'] += len(emptying)
+                checked.extend(('Subtract', blanks, blanktools, keep) for blanks, blanktools in others)
+
+                for blank in names:
+                    changed[blank] = bounding_box([blank])
+                if not keep:
+                    # The tools are consumed by the subtraction or deleted
+                    changed.update((name, None) for name in used + toolsout + skippedtools)
+            else:
+                changed[names[0]] = bounding_box(names)
+                if not keep:
+                    changed.update((name, None) for name in names[1:])
+                checked.append((kind, names, tools, keep))
+        return checked, unused
+
+    def _check_subtract(self, blanks, tools, known_geometry):
+        """
+        Returns the tools of a subtraction that reach into some blank, the
+        ones that do not, and the ones that contain some blank, with the
+        geometries returned by known_geometry(name).
+
+        Returns
+        -------
+        used, unused : list of str
+            The tools that reach into some blank, and the other ones.
+        emptying : list of tuples
+            (tool, contained, reached) for the tools that contain some blank,
+            with the blanks that they contain and the other blanks that they
+            reach into.
+        """
+        blankgeometries = [known_geometry(blank) for blank in blanks]
+        used = []
+        unused = []
+        emptying = []
+        for tool in tools:
+            toolgeometry = known_geometry(tool)
+            if toolgeometry is None or None in blankgeometries:
+                used.append(tool)
+                continue
+            reached = [blank for blank, blankgeometry in zip(blanks, blankgeometries)
+                       if geometry.interference(blankgeometry, toolgeometry)
+                       not in ('disjoint', 'touching')]
+            contained = [blank for blank, blankgeometry in zip(blanks, blankgeometries)
+                         if geometry.contains_geometry(toolgeometry, blankgeometry)]
+            if contained:
+                emptying.append((tool, contained, [blank for blank in reached
+                                                   if blank not in contained]))
+            elif reached:
+                used.append(tool)
+            else:
+                unused.append(tool)
+        return used, unused, emptying
+
+    def _touching_order(self, final, others):
+        """
+        Returns the parts of a union grouped by clusters of touching
+        bounding boxes, starting with the cluster of the final part, and
+        followed by the parts of unknown geometry.
+        """
+        table = model_table(self.oEditor)
+        known = []
+        unknown = []
+        for name in others:
+            objectgeometry = None
+            if name in table:
+                objectgeometry = geometry.object_geometry(self.oEditor, table[name])
+            if objectgeometry is None:
+                unknown.append(name)
+            else:
+                known.append((name, objectgeometry))
+        finalgeometry = geometry.object_geometry(self.oEditor, table[final]) if final in table else None
+        if finalgeometry is not None:
+            known.insert(0, (final, finalgeometry))
+
+        # Clusters of touching boxes, by union-find
+        cluster = list(range(len(known)))
+        def find(n):
+            while cluster[n] != n:
+                cluster[n] = cluster[cluster[n]]
+                n = cluster[n]
+            return n
+        bvh = geometry.BoundingVolumeHierarchy([g.lower for name, g in known],
+                                               [g.upper for name, g in known])
+        for n, (name, objectgeometry) in enumerate(known):
+            for m in bvh.query_box(objectgeometry.lower, objectgeometry.upper, geometry.tolerance):
+                cluster[find(m)] = find(n)
+
+        roots = []
+        for n in range(len(known)):
+            if find(n) not in roots:
+                roots.append(find(n))
+        ordered = [name for root in roots for n, (name, g) in enumerate(known) if find(n) == root]
+        return [name for name in ordered if name != final] + unknown
+
+    def execute(self):
+        """
+        Plans and executes the pending operations.
+
+        Returns
+        -------
+        stats : dict
+            Number of operations requested ('requested'), of calls sent to
+            HFSS ('executed'), of boolean calls avoided ('saved') and of
+            tools skipped because they would leave a blank empty ('skipped').
+        """
+        groups = self.plan()
+        self.stats = {'requested': len(self.pending), 'executed': 0, 'saved': 0, 'skipped': 0}
+        self.skipped = []
+        unused = []
+        if self.check:
+            # Every subtraction is checked before the first call
+            groups, unused = self._check(groups)
+        for kind, names, tools, keep in groups:
+            self._run(kind, names, tools, keep)
+        if unused:
+            modeler3d.delete(self.oEditor, unused)
+            self.stats['executed'] += 1
+        self.pending = []
+        return dict(self.stats)
@@ -11,6 +11,7 @@ import re
 
 import hycohanz.conf as conf
 from hycohanz.design import get_module
+from hycohanz.model import record_design_change
 from hycohanz.property import eval_expression
 from hycohanz.expression import Expression as Ex
 
@@ -473,6 +474,8 @@ def create_PML(oDesign,
     		"RadDist:=", Ex(RadDist).expr]
 
     oBoundarySetupModule.CreatePML(arg)
+    # The PML object is renamed, and joining objects may be created
+    record_design_change(oDesign)
 
 @conf.checkDefaultDesign
 def assign_primary(oDesign,
@@ -12,6 +12,9 @@ the hycohanz interface even though more than one project, design or editor
 have been handled.
 """
 
+import functools
+import threading
+
 import win32com.client
 
 oDesktop = None
@@ -20,6 +23,12 @@ oProjectList = []
 oDesignList = []
 oEditorList = []
 
+# Lock of the lists of COM objects and of the local stores below, which
+# are shared by all the threads (e.g. the workers of a SweepOrchestrator).
+# The global COM objects are shared too, so threads should pass their own
+# COM objects explicitly instead of relying on them.
+store_lock = threading.RLock()
+
 ## The following functions handle the internal storage of the COM objects
 # When one of these functions is called from another hycohanz function, the
 # new COM object becomes the currently handled internally
@@ -31,22 +40,43 @@ def update_oDesktop(new_oDesktop):
     oDesktop = new_oDesktop
 
 def update_oProject(new_oProject):
-    if new_oProject not in oProjectList:
-        oProjectList.append(new_oProject)
-    else:
-        oProjectList.append(oProjectList.pop(oProjectList.index(new_oProject)))
+    with store_lock:
+        if new_oProject not in oProjectList:
+            oProjectList.append(new_oProject)
+        else:
+            oProjectList.append(oProjectList.pop(oProjectList.index(new_oProject)))
 
 def update_oDesign(new_oDesign):
-    if new_oDesign not in oDesignList:
-        oDesignList.append(new_oDesign)
-    else:
-        oDesignList.append(oDesignList.pop(oDesignList.index(new_oDesign)))
+    with store_lock:
+        if new_oDesign not in oDesignList:
+            oDesignList.append(new_oDesign)
+        else:
+            oDesignList.append(oDesignList.pop(oDesignList.index(new_oDesign)))
 
 def update_oEditor(new_oEditor):
-    if new_oEditor not in oEditorList:
-        oEditorList.append(new_oEditor)
-    else:
-        oEditorList.append(oEditorList.pop(oEditorList.index(new_oEditor)))
+    with store_lock:
+        if new_oEditor not in oEditorList:
+            oEditorList.append(new_oEditor)
+        else:
+            oEditorList.append(oEditorList.pop(oEditorList.index(new_oEditor)))
+
+## Local storage associated with COM objects
+# Some hycohanz functions keep local information (caches, registries...)
+# about a given COM object. These stores are lists of [COM object, data]
+# pairs, as COM objects are compared by identity of the underlying object.
+
+def get_object_store(store, oObject, factory=dict):
+    """
+    Returns the object associated with oObject in the given store, creating
+    it with factory() (an empty dict by default) if oObject is not in the
+    store yet.
+    """
+    with store_lock:
+        for pair in store:
+            if pair[0] == oObject:
+                return pair[1]
+        store.append([oObject, factory()])
+        return store[-1][1]
 
 ## Wrappers
 
@@ -57,6 +87,7 @@ def checkDefaultDesktop(func):
     """
     global oDesktop
 
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
         if len(args)==0 or not isinstance(args[0], win32com.client.CDispatch):
             # Check if internal COM object already exists
@@ -74,6 +105,7 @@ def checkDefaultProject(func):
     """
     global oProjectList
 
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
         if len(args)==0 or not isinstance(args[0], win32com.client.CDispatch):
             # Check if internal COM object already exists
@@ -91,6 +123,7 @@ def checkDefaultDesign(func):
     """
     global oDesignList
 
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
         if len(args)==0 or not isinstance(args[0], win32com.client.CDispatch):
             # Check if internal COM object already exists
@@ -108,6 +141,7 @@ def checkDefaultEditor(func):
     """
     global oEditorList
 
+    @functools.wraps(func)
     def wrapper(*args, **kwargs):
         if len(args)==0 or not isinstance(args[0], win32com.client.CDispatch):
             # Check if internal COM object already exists
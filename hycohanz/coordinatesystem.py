@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+Coordinate systems of the 3D modeler.
+
+The coordinate systems created with these functions are recorded in the
+model table of the editor (see hycohanz.model), and their 4x4 transforms
+to the global coordinate system are computed locally (see
+hycohanz.geometry.cs_matrix()). Thus, the coordinates of many parts can be
+transformed between coordinate systems in a single NumPy operation, and
+the parts drawn in a coordinate system (PartCoordinateSystem argument of
+the creation functions) keep a known geometry.
+
+Example Usage
+-------------
+>>> hfss.create_relative_cs("Tilted", origin=["10mm", 0, 0], xaxis=[1, 1, 0], yaxis=[-1, 1, 0])
+>>> hfss.create_boxes(positions, [1, 1, 1], PartCoordinateSystem="Tilted")
+>>> hfss.transform_points(positions*1e-3, "Tilted", "Global")
+"""
+
+from __future__ import division, print_function, unicode_literals, absolute_import
+
+import hycohanz.conf as conf
+import hycohanz.geometry as geometry
+import hycohanz.model as model
+from hycohanz.expression import Expression as Ex
+
+@conf.checkDefaultEditor
+def create_relative_cs(oEditor, name, origin=(0, 0, 0), xaxis=(1, 0, 0), yaxis=(0, 1, 0),
+                       reference=None):
+    """
+    Create a relative coordinate system, which becomes the working
+    coordinate system.
+
+    Parameters
+    ----------
+    oEditor : pywin32 COMObject
+        The HFSS editor in which the operation will be performed.
+    name : str
+        Name of the coordinate system.
+    origin : list of float, str or hycohanz Expression object
+        Origin of the coordinate system in the reference coordinate system.
+    xaxis, yaxis : list of float, str or hycohanz Expression object
+        Vectors along the X and Y axes of the coordinate system, in the
+        reference coordinate system.
+    reference : str
+        Coordinate system in which the new one is defined. The working
+        coordinate system by default. If it is another one, it becomes the
+        working coordinate system first.
+
+    Returns
+    -------
+    name : str
+        The name of the created coordinate system.
+    """
+    table = model.model_table(oEditor)
+    if reference is not None and reference != table.working_cs:
+        set_working_cs(oEditor, reference)
+    reference = table.working_cs
+
+    origin = [Ex(c).expr for c in origin]
+    xaxis = [Ex(c).expr for c in xaxis]
+    yaxis = [Ex(c).expr for c in yaxis]
+    oEditor.CreateRelativeCS(["NAME:RelativeCSParameters",
+                              "Mode:=", "Axis/Position",
+                              "OriginX:=", origin[0],
+                              "OriginY:=", origin[1],
+                              "OriginZ:=", origin[2],
+                              "XAxisXvec:=", xaxis[0],
+                              "XAxisYvec:=", xaxis[1],
+                              "XAxisZvec:=", xaxis[2],
+                              "YAxisXvec:=", yaxis[0],
+                              "YAxisYvec:=", yaxis[1],
+                              "YAxisZvec:=", yaxis[2]],
+                             ["NAME:Attributes",
+                              "Name:=", name])
+    model.record_coordinate_system(oEditor, model.CoordinateSystem(
+        name, 'Relative', {'Origin': tuple(origin), 'XAxis': tuple(xaxis), 'YAxis': tuple(yaxis)},
+        reference))
+
+    return name
+
+@conf.checkDefaultEditor
+def create_face_cs(oEditor, name, partname, faceid, edgeid, ZRotationAngle='0deg',
+                   XOffset=0, YOffset=0, AutoFlip=False):
+    """
+    Create a face coordinate system, which becomes the working coordinate
+    system. Its origin is at the center of the face, its Z axis along the
+    normal of the face and its X axis towards the center of an edge.
+
+    Its transform is known locally when the part is a box of known geometry
+    and the face and edge IDs were obtained with get_face_by_position() and
+    get_edge_by_position().
+
+    Parameters
+    ----------
+    oEditor : pywin32 COMObject
+        The HFSS editor in which the operation will be performed.
+    name : str
+        Name of the coordinate system.
+    partname : str
+        Name of the object of the face.
+    faceid : int
+        ID of the face.
+    edgeid : int
+        ID of the edge whose center sets the X axis.
+    ZRotationAngle : float, str or hycohanz Expression object
+        Rotation of the X and Y axes around the Z axis.
+    XOffset, YOffset : float, str or hycohanz Expression object
+        Offset of the origin along the X and Y axes.
+    AutoFlip : bool
+        Whether HFSS may flip the axes.
+
+    Returns
+    -------
+    name : str
+        The name of the created coordinate system.
+    """
+    oEditor.CreateFaceCS(["NAME:FaceCSParameters",
+                          "Origin:=", ["NAME:OriginPosn",
+                                       "IsAttachedToEntity:=", True,
+                                       "EntityID:=", faceid,
+                                       "PositionType:=", "FaceCenter",
+                                       "UParam:=", 0,
+                                       "VParam:=", 0,
+                                       "XPosition:=", "0",
+                                       "YPosition:=", "0",
+                                       "ZPosition:=", "0"],
+                          "MoveToEnd:=", False,
+                          "FaceID:=", faceid,
+                          "AxisPosn:=", ["NAME:AxisPosn",
+                                         "IsAttachedToEntity:=", True,
+                                         "EntityID:=", edgeid,
+                                         "PositionType:=", "EdgeCenter",
+                                         "UParam:=", 0.5,
+                                         "VParam:=", 0,
+                                         "XPosition:=", "0",
+                                         "YPosition:=", "0",
+                                         "ZPosition:=", "0"],
+                          "WhichAxis:=", "X",
+                          "ZRotationAngle:=", Ex(ZRotationAngle).expr,
+                          "XOffset:=", Ex(XOffset).expr,
+                          "YOffset:=", Ex(YOffset).expr,
+                          "AutoFlip:=", AutoFlip],
+                         ["NAME:Attributes",
+                          "Name:=", name,
+                          "PartName:=", partname])
+    model.record_coordinate_system(oEditor, model.CoordinateSystem(
+        name, 'Face', {'PartName': partname, 'FaceID': faceid, 'EdgeID': edgeid,
+                       'ZRotationAngle': Ex(ZRotationAngle).expr,
+                       'XOffset': Ex(XOffset).expr, 'YOffset': Ex(YOffset).expr}))
+
+    return name
+
+@conf.checkDefaultEditor
+def set_working_cs(oEditor, name):
+    """
+    Set the working coordinate system.
+
+    Parameters
+    ----------
+    oEditor : pywin32 COMObject
+        The HFSS editor in which the operation will be performed.
+    name : str
+        Name of the coordinate system ('Global' for the global one).
+
+    Returns
+    -------
+    None
+    """
+    oEditor.SetWCS(["NAME:SetWCS Parameter",
+                    "Working Coordinate System:=", name,
+                    "RegionDepCSOk:=", False])
+    model.model_table(oEditor).working_cs = name
+
+@conf.checkDefaultEditor
+def get_cs_matrix(oEditor, name):
+    """
+    Get the transform from a coordinate system to the global one, computed
+    locally.
+
+    Parameters
+    ----------
+    oEditor : pywin32 COMObject
+        The HFSS editor in which the coordinate system is.
+    name : str
+        Name of the coordinate system.
+
+    Returns
+    -------
+    matrix : numpy array
+        4x4 homogeneous transform, with lengths in meters, such that
+        matrix.dot([x, y, z, 1]) are the global coordinates of the point
+        (x, y, z) of the coordinate system.
+
+    Raises
+    ------
+    ValueError
+        If the coordinate system is not known locally.
+    """
+    matrix = geometry.cs_matrix(oEditor, name)
+    if matrix is None:
+        raise ValueError("The coordinate system {0} is not known".format(name))
+    return matrix.copy()
+
+@conf.checkDefaultEditor
+def transform_points(oEditor, points, from_cs='Global', to_cs='Global'):
+    """
+    Transform the coordinates of many points between coordinate systems in
+    a single vectorized operation.
+
+    Parameters
+    ----------
+    oEditor : pywin32 COMObject
+        The HFSS editor in which the coordinate systems are.
+    points : array_like of shape (N, 3)
+        Coordinates of the points in from_cs, in meters.
+    from_cs, to_cs : str
+        Names of the coordinate systems.
+
+    Returns
+    -------
+    points : numpy array of shape (N, 3)
+        Coordinates of the points in to_cs, in meters.
+
+    Raises
+    ------
+    ValueError
+        If a coordinate system is not known locally.
+    """
+    return geometry.transform_points(oEditor, points, from_cs, to_cs)
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+Deferred execution of 3D modeler calls with names known in advance.
+
+HFSS renames a new object when the requested name is already used, so the
+name of an object is normally only known once the creation call returns.
+The DeferredModeler queues modeler3d calls instead, and gives every object
+its final name (see model.allocate_name()) at once, so that the names can
+be used in further calls before anything is sent to HFSS.
+
+Example Usage
+-------------
+>>> with hfss.DeferredModeler() as modeler:
+...     substrate = modeler.create_box(0, 0, 0, "W", "L", "h", Name="Substrate")
+...     via = modeler.create_cylinder(0, 0, 0, "r", "h", Name="Via")
+...     modeler.subtract([substrate], [via])
+>>> substrate
+'Substrate'
+"""
+
+from __future__ import division, print_function, unicode_literals, absolute_import
+
+import hycohanz.conf as conf
+import hycohanz.modeler3d as modeler3d
+from hycohanz.model import allocate_name, release_name
+
+# Name argument of the creation functions: keyword, position (without the
+# editor) and default value. The bulk creation functions take a list of
+# names or a prefix.
+_single_creations = {'create_rectangle': ('Name', 6, 'Rectangle1'),
+                     'create_EQbasedcurve': ('Name', 7, 'EQcurve1'),
+                     'create_circle': ('Name', 6, 'Circle1'),
+                     'create_cylinder': ('Name', 7, 'Circle1'),
+                     'create_sphere': ('Name', 4, 'Sphere1'),
+                     'create_box': ('Name', 6, 'Box1'),
+                     'create_polyline': ('Name', 3, 'Polyline1')}
+
+_bulk_creations = {'create_boxes': ('names', 2, 'Box'),
+                   'create_cylinders': ('names', 5, 'Cylinder'),
+                   'create_spheres': ('names', 2, 'Sphere'),
+                   'create_rectangles': ('names', 5, 'Rectangle')}
+
+def _replace_names(value, names):
+    """
+    Returns value with the strings found in names replaced, also inside
+    lists and tuples.
+    """
+    if isinstance(value, str):
+        return names.get(value, value)
+    if isinstance(value, (list, tuple)):
+        return type(value)(_replace_names(item, names) for item in value)
+    return value
+
+class DeferredModeler(object):
+    """
+    Queues modeler3d calls, and executes them in order with execute().
+
+    Any function of modeler3d can be called as a method, without the editor
+    argument. The creation functions (create_box(), create_boxes()...)
+    return the names of the new objects immediately: the requested names if
+    they are free, or the names that HFSS would give them otherwise. Other
+    functions are just queued and return None.
+
+    Parameters
+    ----------
+    oEditor : pywin32 COMObject
+        The HFSS editor in which the calls will be executed. The current
+        global editor by default.
+
+    Attributes
+    ----------
+    results : list
+        Values returned by the calls of the last execute(), in order.
+
+    If an object ends up with another name (e.g. because an object with the
+    same name was created meanwhile outside the modeler), the names in the
+    later calls are replaced accordingly, and final_name() returns the
+    actual name.
+
+    The modeler is also a context manager, which executes the queued calls
+    on exit (or discards them if an exception was raised).
+
+    """
+    # Modules whose functions can be queued
+    _modules = (modeler3d,)
+
+    def __init__(self, oEditor=None):
+        if oEditor is None:
+            if not conf.oEditorList:
+                raise Exception("Internal oEditor object has not been initialized yet")
+            oEditor = conf.oEditorList[-1]
+        self.oEditor = oEditor
+        self.pending = []
+        self.results = []
+        self._actual_names = dict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.execute()
+        else:
+            self.discard()
+
+    def __getattr__(self, attr):
+        function = None
+        if not attr.startswith('_'):
+            for module in self._modules:
+                function = getattr(module, attr, None)
+                if callable(function):
+                    break
+        if not callable(function):
+            raise AttributeError("No function named {0} can be queued".format(attr))
+
+        def deferred(*args, **kwargs):
+            return self._queue(attr, function, list(args), kwargs)
+        return deferred
+
+    def _queue(self, attr, function, args, kwargs):
+        creation = _single_creations.get(attr) or _bulk_creations.get(attr)
+        if creation is None:
+            self.pending.append((function, args, kwargs, None))
+            return None
+
+        keyword, position, default = creation
+        if len(args) > position:
+            requested = args[position]
+        else:
+            requested = kwargs.get(keyword, default)
+
+        if attr in _single_creations:
+            names = allocate_name(self.oEditor, requested)
+            predicted = [names]
+        else:
+            predicted = [allocate_name(self.oEditor, name)
+                         for name in modeler3d._bulk_names(requested, len(args[0]))]
+            names = list(predicted)
+
+        if len(args) > position:
+            args[position] = names
+        else:
+            kwargs[keyword] = names
+        self.pending.append((function, args, kwargs, predicted))
+        return names
+
+    def final_name(self, name):
+        """
+        Returns the actual name of an object created by the last execute(),
+        given the name returned when its creation was queued.
+        """
+        return self._actual_names.get(name, name)
+
+    def discard(self):
+        """
+        Forgets the queued calls and releases the names given to the objects
+        they would have created.
+        """
+        for function, args, kwargs, predicted in self.pending:
+            for name in predicted or ():
+                release_name(self.oEditor, name)
+        self.pending = []
+
+    def execute(self):
+        """
+        Executes the queued calls, in order.
+
+        Returns
+        -------
+        results : list
+            Values returned by the calls.
+        """
+        self._actual_names = dict()
+        self.results = []
+        pending, self.pending = self.pending, []
+        try:
+            for function, args, kwargs, predicted in pending:
+                args = _replace_names(args, self._actual_names)
+                kwargs = dict((key, _replace_names(value, self._actual_names))
+                              for key, value in kwargs.items())
+                result = self._run(function, args, kwargs)
+                self.results.append(result)
+                if predicted is None:
+                    continue
+                actual = [result] if isinstance(result, str) else list(result)
+                for old, new in zip(predicted, actual):
+                    if str(new) != old:
+                        self._actual_names[old] = str(new)
+        finally:
+            # The names of the objects of the calls that did not complete
+            # are not going to be used
+            for function, args, kwargs, predicted in pending[len(self.results):]:
+                for name in predicted or ():
+                    release_name(self.oEditor, name)
+        return self.results
+
+    def _run(self, function, args, kwargs):
+        """
+        Executes a queued call.
+        """
+        return function(self.oEditor, *args, **kwargs)
@@ -9,6 +9,7 @@ from __future__ import division, print_function, unicode_literals, absolute_impo
 
 import hycohanz.conf as conf
 from hycohanz.expression import Expression
+from hycohanz.model import model_table, record_design_change
 
 @conf.checkDefaultDesign
 def get_module(oDesign, ModuleName):
@@ -63,6 +64,7 @@ def set_active_editor(oDesign, editorname="3D Modeler"):
     """
     oEditor = oDesign.SetActiveEditor(editorname)
     conf.update_oEditor(oEditor)
+    model_table(oEditor).oDesign = oDesign
 
     return oEditor
 
@@ -95,6 +97,8 @@ def create_open_region(oDesign, frequency, Boundary="Radiation", ApplyInfiniteGP
 			"Boundary:="        , Boundary,
 			"ApplyInfiniteGP:=" , ApplyInfiniteGP
 		])
+    # The region is a new object of the 3D modeler
+    record_design_change(oDesign)
 
 @conf.checkDefaultDesign
 def insert_infinite_sphere(oDesign,
@@ -0,0 +1,1451 @@
+# -*- coding: utf-8 -*-
+"""
+Local geometry of the 3D modeler objects.
+
+The primitives recorded in the model tables (see hycohanz.model) are
+evaluated into axis-aligned bounding boxes, which are stored in a bounding
+volume hierarchy (BVH). Position queries (bodies, faces and edges at a
+point) are answered locally whenever the known geometry is enough to be
+sure of the answer, and are sent to HFSS otherwise. The primitives also
+give exact measures (volume, area, length) and coarse triangle meshes of
+their surfaces, used for ray picking of faces.
+
+Lengths without units are taken in the model units of the editor, which are
+requested to HFSS once. Variables are evaluated in SI units, so the lengths
+that mix them with numbers without units (e.g. 'W + 1', or a variable W
+defined as '2') are not evaluated locally, and their queries are sent to
+HFSS.
+
+"""
+
+from __future__ import division, print_function, unicode_literals, absolute_import
+
+import math
+import re
+
+import numpy as np
+
+import hycohanz.conf as conf
+import hycohanz.property as prop
+import hycohanz.units as units
+from hycohanz.expression import Expression as Ex
+from hycohanz.model import model_table
+
+# Distance (in meters) below which a point is considered to be on a surface
+tolerance = 1e-9
+
+_axis_index = {'X': 0, 'Y': 1, 'Z': 2}
+
+# Names of variables, constants and functions referenced by an expression
+_name_regex = re.compile(r'\$?\b[a-zA-Z_]\w*')
+
+class Geometry(object):
+    """
+    Known geometry of an object of the 3D modeler.
+
+    Parameters
+    ----------
+    lower, upper : numpy arrays
+        Corners of the axis-aligned bounding box of the object, in meters.
+    shape : tuple
+        Exact description of the object, or None if the bounding box is only
+        an upper bound of its extent. One of ('box',) for boxes and
+        rectangles (the bounding box is exact), ('cylinder', center, radius,
+        height, axis) for cylinders and circles (height 0), and ('sphere',
+        center, radius).
+
+    """
+    def __init__(self, lower, upper, shape=None):
+        self.lower = np.asarray(lower, dtype=float)
+        self.upper = np.asarray(upper, dtype=float)
+        self.shape = shape
+
+    def __repr__(self):
+        return "Geometry({0}, {1}, {2!r})".format(self.lower.tolist(),
+                                                  self.upper.tolist(), self.shape)
+
+    def translated(self, vector):
+        """
+        Returns the geometry moved by a vector.
+        """
+        shape = self.shape
+        if shape is not None and shape[0] != 'box':
+            shape = (shape[0], shape[1] + vector) + shape[2:]
+        return Geometry(self.lower + vector, self.upper + vector, shape)
+
+    def transformed(self, function):
+        """
+        Returns the (inexact) bounding box of the geometry transformed by a
+        function of an array of points.
+        """
+        corners = np.array([[self.upper[0] if i & 1 else self.lower[0],
+                             self.upper[1] if i & 2 else self.lower[1],
+                             self.upper[2] if i & 4 else self.lower[2]]
+                            for i in range(8)])
+        corners = function(corners)
+        return Geometry(corners.min(axis=0), corners.max(axis=0))
+
+    def union(self, other):
+        """
+        Returns the (inexact) bounding box of two geometries.
+        """
+        return Geometry(np.minimum(self.lower, other.lower),
+                        np.maximum(self.upper, other.upper))
+
+    def contains(self, point, tol=None):
+        """
+        Whether a point touches the object (inside or on its surface). Only
+        valid for exact geometries.
+        """
+        tol = tolerance if tol is None else tol
+        if np.any(point < self.lower - tol) or np.any(point > self.upper + tol):
+            return False
+        if self.shape[0] == 'box':
+            return True
+        if self.shape[0] == 'sphere':
+            return np.linalg.norm(point - self.shape[1]) <= self.shape[2] + tol
+        # Cylinder: the bounding box already limits the axial coordinate
+        radial = point - self.shape[1]
+        radial[self.shape[4]] = 0.0
+        return np.linalg.norm(radial) <= self.shape[2] + tol
+
+    def face_key(self, point, tol=None):
+        """
+        Returns a key identifying the face of the object on which a point
+        lies, or None if it cannot be known locally (inexact geometry, or a
+        point on an edge or off the surface).
+        """
+        tol = tolerance if tol is None else tol
+        if self.shape is None or not self.contains(point, tol):
+            return None
+        if self.shape[0] == 'box':
+            sheets, hits = self._box_hits(point, tol)
+            if sheets:
+                return ('sheet',) if len(sheets) == 1 else None
+            return hits[0] if len(hits) == 1 else None
+        if self.shape[0] == 'sphere':
+            distance = np.linalg.norm(point - self.shape[1])
+            return ('surface',) if abs(distance - self.shape[2]) <= tol else None
+        caps, side = self._cylinder_hits(point, tol)
+        if self.shape[3] == 0:
+            return ('sheet',)
+        if len(caps) + side == 1:
+            return ('side',) if side else ('cap', caps[0])
+        return None
+
+    def edge_key(self, point, tol=None):
+        """
+        Returns a key identifying the edge of the object on which a point
+        lies, or None if it cannot be known locally.
+        """
+        tol = tolerance if tol is None else tol
+        if self.shape is None or self.shape[0] == 'sphere' or not self.contains(point, tol):
+            return None
+        if self.shape[0] == 'box':
+            sheets, hits = self._box_hits(point, tol)
+            if len(sheets) + len(hits) == 2 and len(sheets) < 2:
+                return tuple(sorted(hits))
+            return None
+        caps, side = self._cylinder_hits(point, tol)
+        if self.shape[3] == 0:
+            return ('rim', 0) if side else None
+        if len(caps) == 1 and side:
+            return ('rim', caps[0])
+        return None
+
+    def _box_hits(self, point, tol):
+        """
+        Returns the axes along which the box is flat, and the (axis, side)
+        of the box faces on which a point lies.
+        """
+        sheets = []
+        hits = []
+        for axis in range(3):
+            if self.upper[axis] - self.lower[axis] <= tol:
+                sheets.append(axis)
+            elif abs(point[axis] - self.lower[axis]) <= tol:
+                hits.append((axis, 0))
+            elif abs(point[axis] - self.upper[axis]) <= tol:
+                hits.append((axis, 1))
+        return sheets, hits
+
+    def _cylinder_hits(self, point, tol):
+        """
+        Returns the caps (0 for the base, 1 for the top) on which a point
+        lies, and whether it lies on the side of a cylinder.
+        """
+        center, radius, height, axis = self.shape[1:]
+        axial = point[axis] - center[axis]
+        caps = [cap for cap, position in enumerate((0.0, height))
+                if abs(axial - position) <= tol]
+        radial = point - center
+        radial[axis] = 0.0
+        side = abs(np.linalg.norm(radial) - radius) <= tol
+        return caps, side
+
+class BoundingVolumeHierarchy(object):
+    """
+    Static bounding volume hierarchy over a set of axis-aligned boxes.
+
+    Parameters
+    ----------
+    lower, upper : array_like
+        (N, 3) arrays with the lower and upper corners of the boxes.
+    leafsize : int
+        Maximum number of boxes in the leaves of the tree.
+
+    """
+    def __init__(self, lower, upper, leafsize=8):
+        self.lower = np.asarray(lower, dtype=float).reshape(-1, 3)
+        self.upper = np.asarray(upper, dtype=float).reshape(-1, 3)
+        self.leafsize = leafsize
+        # Each node is (lower, upper, first child or None, start, stop), and
+        # the children of a node are stored consecutively
+        self.nodes = []
+        self.order = np.arange(len(self.lower))
+        if len(self.lower):
+            self._build()
+
+    def _build(self):
+        centers = (self.lower + self.upper)/2
+        self.nodes.append(None)
+        pending = [(0, 0, len(self.order))]
+        while pending:
+            node, start, stop = pending.pop()
+            indexes = self.order[start:stop]
+            lower = tuple(self.lower[indexes].min(axis=0))
+            upper = tuple(self.upper[indexes].max(axis=0))
+            if stop - start <= self.leafsize:
+                self.nodes[node] = (lower, upper, None, start, stop)
+                continue
+            # Median split along the longest extent of the box centers
+            extent = centers[indexes].max(axis=0) - centers[indexes].min(axis=0)
+            axis = int(np.argmax(extent))
+            self.order[start:stop] = indexes[np.argsort(centers[indexes, axis], kind='mergesort')]
+            middle = (start + stop)//2
+            child = len(self.nodes)
+            self.nodes.extend([None, None])
+            self.nodes[node] = (lower, upper, child, start, stop)
+            pending.append((child, start, middle))
+            pending.append((child + 1, middle, stop))
+
+    def __len__(self):
+        return len(self.order)
+
+    def query_box(self, lower, upper, tol=0.0):
+        """
+        Returns the indexes of the boxes that intersect a given box, in
+        increasing order.
+        """
+        lower = [c - tol for c in lower]
+        upper = [c + tol for c in upper]
+        found = []
+        pending = [0] if self.nodes else []
+        while pending:
+            nodelower, nodeupper, child, start, stop = self.nodes[pending.pop()]
+            if (nodelower[0] > upper[0] or nodeupper[0] < lower[0] or
+                nodelower[1] > upper[1] or nodeupper[1] < lower[1] or
+                nodelower[2] > upper[2] or nodeupper[2] < lower[2]):
+                continue
+            if child is not None:
+                pending.extend((child, child + 1))
+                continue
+            indexes = self.order[start:stop]
+            inside = np.all((self.lower[indexes] <= upper) & (self.upper[indexes] >= lower),
+                            axis=1)
+            found.extend(indexes[inside].tolist())
+        return sorted(found)
+
+    def query_point(self, point, tol=0.0):
+        """
+        Returns the indexes of the boxes that contain a point, in increasing
+        order.
+        """
+        return self.query_box(point, point, tol)
+
+def model_units(oEditor):
+    """
+    Returns the model units of an editor, requesting them to HFSS only the
+    first time.
+    """
+    table = model_table(oEditor)
+    if table.units is None:
+        table.units = str(oEditor.GetModelUnits())
+    return table.units
+
+def _evaluate_variables(oEditor, expr):
+    """
+    Evaluates an expression with variables in SI units, with the design of
+    the editor (see eval_expression()).
+    """
+    oDesign = model_table(oEditor).oDesign
+    if oDesign is None:
+        raise ValueError("Cannot evaluate '{0}' without its design".format(expr))
+    try:
+        return prop.eval_expression(oDesign, expr)
+    except Exception as exc:
+        raise ValueError("Cannot evaluate '{0}': {1}".format(expr, exc))
+
+def _has_unitless_terms(expr):
+    """
+    Returns True if an expression has numbers without units that are not
+    factors of a product or quotient (e.g. the 1 of 'W + 1').
+    """
+    for match in units._literal_regex.finditer(expr):
+        if match.group(2):
+            continue
+        before = expr[:match.start()].rstrip()[-1:]
+        after = expr[match.end():].lstrip()[:1]
+        if before not in ('*', '/') and after not in ('*', '/', '^'):
+            return True
+    return False
+
+def evaluate_length(oEditor, expr):
+    """
+    Evaluates a length expression in meters. Numbers without units are taken
+    in the model units, and variables are evaluated with the design of the
+    editor (see eval_expression()).
+
+    Raises
+    ------
+    ValueError
+        If the expression cannot be evaluated locally, also when it mixes
+        variables (evaluated in SI units) with numbers without units, either
+        in itself or in the variables it references.
+    """
+    expr = Ex(expr).expr
+    try:
+        value = units.evaluate(expr)
+    except Exception:
+        value = _evaluate_variables(oEditor, expr)
+        graph = prop._variable_graph(model_table(oEditor).oDesign)
+        # The expressions of all the variables it references, which are
+        # known after the evaluation
+        expressions = [expr]
+        pending = list(graph.references(expr))
+        visited = set()
+        while pending:
+            name = pending.pop()
+            if name not in visited and name in graph:
+                visited.add(name)
+                expressions.append(graph.expressions[name])
+                pending.extend(graph.dependencies[name])
+        if any(_has_unitless_terms(expression) for expression in expressions):
+            raise ValueError("Cannot evaluate '{0}' locally: it mixes variables with "
+                             "numbers without units".format(expr))
+        return value
+    if any(match.group(2) for match in units._literal_regex.finditer(expr)):
+        return value
+    return value*units.units_dict[model_units(oEditor)]
+
+def _evaluate_scalar(oEditor, expr):
+    """
+    Evaluates an expression in SI units, also with variables. Used for
+    angles (in radians, the unit of numbers without units, see rotate())
+    and scale factors.
+    """
+    expr = Ex(expr).expr
+    try:
+        return units.evaluate(expr)
+    except Exception:
+        return _evaluate_variables(oEditor, expr)
+
+def _evaluate_angle(oEditor, expr):
+    return _evaluate_scalar(oEditor, expr)
+
+def _vector(oEditor, values):
+    return np.array([evaluate_length(oEditor, value) for value in values])
+
+def _primitive_geometry(oEditor, modelobject):
+    """
+    Returns the geometry of an object as created, or None if unknown.
+    """
+    p = modelobject.parameters
+    if modelobject.primitive == 'Box':
+        position = _vector(oEditor, (p['XPosition'], p['YPosition'], p['ZPosition']))
+        size = _vector(oEditor, (p['XSize'], p['YSize'], p['ZSize']))
+        return Geometry(np.minimum(position, position + size),
+                        np.maximum(position, position + size), ('box',))
+
+    if modelobject.primitive == 'Rectangle':
+        if not p.get('IsCovered', True):
+            return None
+        position = _vector(oEditor, (p['XStart'], p['YStart'], p['ZStart']))
+        axis = _axis_index[str(p['WhichAxis'])]
+        size = np.zeros(3)
+        size[(axis + 1) % 3] = evaluate_length(oEditor, p['Width'])
+        size[(axis + 2) % 3] = evaluate_length(oEditor, p['Height'])
+        return Geometry(np.minimum(position, position + size),
+                        np.maximum(position, position + size), ('box',))
+
+    if modelobject.primitive in ('Cylinder', 'Circle'):
+        center = _vector(oEditor, (p['XCenter'], p['YCenter'], p['ZCenter']))
+        radius = evaluate_length(oEditor, p['Radius'])
+        if modelobject.primitive == 'Cylinder':
+            height = evaluate_length(oEditor, p['Height'])
+            polygonal = str(p.get('NumSides', '0')) != '0'
+        else:
+            height = 0.0
+            polygonal = str(p.get('NumSegments', '0')) != '0'
+        axis = _axis_index[str(p['WhichAxis'])]
+        if height < 0:
+            center[axis] += height
+            height = -height
+        lower = center - radius
+        upper = center + radius
+        lower[axis] = center[axis]
+        upper[axis] = center[axis] + height
+        shape = None if polygonal else ('cylinder', center, radius, height, axis)
+        return Geometry(lower, upper, shape)
+
+    if modelobject.primitive == 'Sphere':
+        center = _vector(oEditor, (p['XCenter'], p['YCenter'], p['ZCenter']))
+        radius = evaluate_length(oEditor, p['Radius'])
+        return Geometry(center - radius, center + radius, ('sphere', center, radius))
+
+    if modelobject.primitive == 'Polyline':
+        points = _polyline_vertices(oEditor, p)
+        return Geometry(points.min(axis=0), points.max(axis=0))
+
+    return None
+
+def _polyline_vertices(oEditor, parameters):
+    """
+    Returns the vertices of a polyline as an (N, 3) array in meters.
+    """
+    points = parameters['Points']
+    if not isinstance(points, np.ndarray):
+        points = np.array([_vector(oEditor, point) for point in points])
+    return points
+
+def _rotation(axis, angle):
+    """
+    Returns a function rotating an array of points around a coordinate axis.
+    """
+    i = _axis_index[str(axis)]
+    j, k = (i + 1) % 3, (i + 2) % 3
+    c, s = math.cos(angle), math.sin(angle)
+    def rotate(points):
+        rotated = points.copy()
+        rotated[:, j] = c*points[:, j] - s*points[:, k]
+        rotated[:, k] = s*points[:, j] + c*points[:, k]
+        return rotated
+    return rotate
+
+def _mirror(base, normal):
+    """
+    Returns a function mirroring an array of points about a plane.
+    """
+    normal = normal/np.linalg.norm(normal)
+    def mirror(points):
+        return points - 2*np.outer((points - base).dot(normal), normal)
+    return mirror
+
+def _scale_factors(oEditor, transform):
+    return np.array([_evaluate_scalar(oEditor, factor) for factor in transform[1]])
+
+def _transform_function(oEditor, transform):
+    """
+    Returns a function applying a recorded transform to an array of points.
+    """
+    if transform[0] == 'CoordinateSystem':
+        matrix = _transform_cs_matrix(oEditor, transform)
+        inverse = np.linalg.inv(matrix)
+        function = _transform_function(oEditor, transform[2])
+        return lambda points: _apply_matrix(matrix, function(_apply_matrix(inverse, points)))
+    if transform[0] == 'Move':
+        vector = _vector(oEditor, transform[1])
+        return lambda points: points + vector
+    if transform[0] == 'Rotate':
+        return _rotation(transform[1], _evaluate_angle(oEditor, transform[2]))
+    if transform[0] == 'Mirror':
+        return _mirror(_vector(oEditor, transform[1]), _vector(oEditor, transform[2]))
+    if transform[0] == 'Scale':
+        factors = _scale_factors(oEditor, transform)
+        return lambda points: points*factors
+    raise ValueError("Unknown transform '{0}'".format(transform[0]))
+
+def _transform_cs_matrix(oEditor, transform):
+    """
+    Returns the matrix of the coordinate system of a transform applied in
+    another coordinate system than the global one.
+    """
+    matrix = cs_matrix(oEditor, transform[1])
+    if matrix is None:
+        raise ValueError("The coordinate system {0} is not known".format(transform[1]))
+    return matrix
+
+def _apply_transform(oEditor, geometry, transform):
+    if transform[0] == 'Move':
+        return geometry.translated(_vector(oEditor, transform[1]))
+    if transform[0] == 'CoordinateSystem' and transform[2][0] == 'Move':
+        rotation = _transform_cs_matrix(oEditor, transform)[:3, :3]
+        return geometry.translated(rotation.dot(_vector(oEditor, transform[2][1])))
+    return geometry.transformed(_transform_function(oEditor, transform))
+
+# Operations that leave the body inside its previous bounding box, and
+# operations that keep the exact shape of the body
+_bounded_operations = ('Subtract', 'Imprint', 'Fillet', 'Split', 'SeparateBody',
+                       'UncoverFaces', 'Unite', 'Connect')
+_exact_operations = ('Imprint',)
+
+def _compute_geometry(oEditor, modelobject):
+    geometry = _primitive_geometry(oEditor, modelobject)
+    if modelobject.coordinate_system != 'Global':
+        matrix = cs_matrix(oEditor, modelobject.coordinate_system)
+        if matrix is None or geometry is None:
+            return None
+        geometry = _geometry_to_global(geometry, matrix)
+    # Transforms and operations are replayed in the order they were applied
+    for kind, item in modelobject.history:
+        if geometry is None:
+            return None
+        if kind == 'Transform':
+            geometry = _apply_transform(oEditor, geometry, item)
+            continue
+        operation, consumed = item
+        if operation not in _bounded_operations:
+            return None
+        if operation in ('Unite', 'Connect'):
+            for other in consumed:
+                othergeometry = object_geometry(oEditor, other)
+                if othergeometry is None:
+                    return None
+                geometry = geometry.union(othergeometry)
+        if operation not in _exact_operations:
+            geometry = Geometry(geometry.lower, geometry.upper)
+    return geometry
+
+def object_geometry(oEditor, modelobject):
+    """
+    Returns the geometry of an object of the model table, or None if it
+    cannot be known locally. The result is cached in the object until it is
+    modified or any variable changes.
+    """
+    def cache_key():
+        table = model_table(oEditor)
+        return (len(modelobject.transforms), len(modelobject.operations),
+                prop._variable_version, table.units,
+                id(table.coordinate_systems.get(modelobject.coordinate_system)),
+                tuple(id(table.coordinate_systems.get(transform[1]))
+                      for transform in modelobject.transforms
+                      if transform[0] == 'CoordinateSystem'))
+    cached = getattr(modelobject, '_geometry', None)
+    if cached is not None and cached[0] == cache_key():
+        return cached[1]
+    # Unknown while it is computed, in case it depends on a face coordinate
+    # system of the object itself
+    modelobject._geometry = (cache_key(), None)
+    try:
+        geometry = _compute_geometry(oEditor, modelobject)
+    except (ValueError, KeyError, TypeError, ZeroDivisionError):
+        geometry = None
+    modelobject._geometry = (cache_key(), geometry)
+    return geometry
+
+class SpatialIndex(object):
+    """
+    Spatial index of the objects of a model table.
+
+    Attributes
+    ----------
+    names : list of str
+        Names of the objects with known geometry.
+    geometries : list of Geometry
+        Geometry of each object in names.
+    unknown : list of str
+        Names of the objects whose geometry is not known.
+    bvh : BoundingVolumeHierarchy
+        Hierarchy over the bounding boxes of the geometries.
+
+    """
+    def __init__(self, oEditor, table):
+        self.names = []
+        self.geometries = []
+        self.unknown = []
+        for name, modelobject in table.objects.items():
+            geometry = object_geometry(oEditor, modelobject)
+            if geometry is None:
+                self.unknown.append(name)
+            else:
+                self.names.append(name)
+                self.geometries.append(geometry)
+        self.bvh = BoundingVolumeHierarchy([g.lower for g in self.geometries],
+                                           [g.upper for g in self.geometries])
+
+    def candidates(self, point, tol=None):
+        """
+        Returns the names and geometries of the objects whose bounding box
+        contains a point.
+        """
+        tol = tolerance if tol is None else tol
+        return [(self.names[n], self.geometries[n])
+                for n in self.bvh.query_point(point, tol)]
+
+# Spatial indexes of each editor, as [index, key] pairs
+_spatial_indexes = []
+
+def spatial_index(oEditor):
+    """
+    Returns the spatial index of the objects of an editor, rebuilding it if
+    the model table or the variables changed since it was built.
+    """
+    table = model_table(oEditor)
+    if not table.synced:
+        table.reconcile(oEditor.GetMatchedObjectName("*"))
+    cached = conf.get_object_store(_spatial_indexes, oEditor, lambda: [None, None])
+    if cached[1] != (table.version, prop._variable_version):
+        model_units(oEditor)
+        cached[0] = SpatialIndex(oEditor, table)
+        # Evaluating the geometry may have fetched new variable values
+        cached[1] = (table.version, prop._variable_version)
+    return cached[0]
+
+def evaluate_point(oEditor, x, y, z):
+    """
+    Returns a point as an array in meters, or None if it cannot be
+    evaluated locally.
+    """
+    try:
+        return _vector(oEditor, (x, y, z))
+    except (ValueError, KeyError):
+        return None
+
+def find_bodies(oEditor, point):
+    """
+    Returns the names of the objects touching a point, or None if it cannot
+    be known locally (some object has unknown or inexact geometry there).
+    """
+    index = spatial_index(oEditor)
+    if index.unknown:
+        return None
+    bodies = []
+    for name, geometry in index.candidates(point):
+        if geometry.shape is None:
+            return None
+        if geometry.contains(point):
+            bodies.append(name)
+    return bodies
+
+def position_key(oEditor, bodyname, x, y, z, kind):
+    """
+    Returns the key of the face or edge of a body at a point (see
+    Geometry.face_key() and Geometry.edge_key()), or None if it cannot be
+    known locally.
+    """
+    table = model_table(oEditor)
+    point = evaluate_point(oEditor, x, y, z) if bodyname in table else None
+    if point is None:
+        return None
+    geometry = object_geometry(oEditor, table[bodyname])
+    if geometry is None:
+        return None
+    if kind == 'face':
+        return geometry.face_key(point)
+    return geometry.edge_key(point)
+
+def lookup_id(oEditor, bodyname, x, y, z, kind, request):
+    """
+    Returns the ID of the face or edge of a body at a point, from the IDs
+    found before for the same face or edge, or calling request().
+    """
+    table = model_table(oEditor)
+    key = position_key(oEditor, bodyname, x, y, z, kind)
+    if key is not None and (kind, key) in table[bodyname].position_ids:
+        return table[bodyname].position_ids[(kind, key)]
+
+    foundid = request()
+    if key is not None:
+        table[bodyname].position_ids[(kind, key)] = foundid
+    return foundid
+
+## Coordinate systems
+
+def _apply_matrix(matrix, points):
+    """
+    Applies a 4x4 homogeneous transform to an (N, 3) array of points.
+    """
+    return points.dot(matrix[:3, :3].T) + matrix[:3, 3]
+
+def _frame_matrix(origin, xaxis, yaxis):
+    """
+    Returns the 4x4 transform from a frame, given by its origin and the
+    directions of its X and Y axes (the latter is orthogonalized), to the
+    frame in which they are given.
+    """
+    x = xaxis/np.linalg.norm(xaxis)
+    y = yaxis - x.dot(yaxis)*x
+    y = y/np.linalg.norm(y)
+    matrix = np.eye(4)
+    matrix[:3, 0] = x
+    matrix[:3, 1] = y
+    matrix[:3, 2] = np.cross(x, y)
+    matrix[:3, 3] = origin
+    return matrix
+
+def _find_key(modelobject, kind, foundid):
+    """
+    Returns the local key of the face or edge of an object with a given ID,
+    if it was found by position before.
+    """
+    for (idkind, key), value in modelobject.position_ids.items():
+        if idkind == kind and value == foundid:
+            return key
+    return None
+
+def _face_cs_matrix(oEditor, parameters):
+    """
+    Returns the transform of a face coordinate system on a face of a box
+    (origin at the center of the face, Z axis along the outer normal and X
+    axis towards the center of an edge), or None if unknown.
+    """
+    table = model_table(oEditor)
+    if parameters['PartName'] not in table:
+        return None
+    modelobject = table[parameters['PartName']]
+    geometry = object_geometry(oEditor, modelobject)
+    facekey = _find_key(modelobject, 'face', parameters['FaceID'])
+    edgekey = _find_key(modelobject, 'edge', parameters['EdgeID'])
+    if (geometry is None or geometry.shape is None or geometry.shape[0] != 'box'
+        or facekey is None or len(facekey) != 2 or edgekey is None or len(edgekey) != 2):
+        return None
+
+    def position(hits):
+        point = (geometry.lower + geometry.upper)/2
+        for axis, side in hits:
+            point[axis] = geometry.upper[axis] if side else geometry.lower[axis]
+        return point
+
+    origin = position([facekey])
+    normal = np.eye(3)[facekey[0]]*(1 if facekey[1] else -1)
+    xaxis = position(edgekey) - origin
+    angle = _evaluate_angle(oEditor, parameters['ZRotationAngle'])
+    yaxis = np.cross(normal, xaxis)
+    xaxis, yaxis = (math.cos(angle)*xaxis + math.sin(angle)*yaxis,
+                    -math.sin(angle)*xaxis + math.cos(angle)*yaxis)
+    matrix = _frame_matrix(origin, xaxis, yaxis)
+    offset = np.array([evaluate_length(oEditor, parameters['XOffset']),
+                       evaluate_length(oEditor, parameters['YOffset']), 0.0])
+    matrix[:3, 3] += matrix[:3, :3].dot(offset)
+    return matrix
+
+def cs_matrix(oEditor, name):
+    """
+    Returns the 4x4 homogeneous transform from a coordinate system of an
+    editor to the global one (lengths in meters), or None if it is not
+    known locally. The transforms are cached until the model table or any
+    variable changes.
+    """
+    if name == 'Global':
+        return np.eye(4)
+    table = model_table(oEditor)
+    coordinatesystem = table.coordinate_systems.get(name)
+    if coordinatesystem is None:
+        return None
+    key = (table.version, prop._variable_version, table.units)
+    cached = getattr(coordinatesystem, '_matrix', None)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    matrix = None
+    p = coordinatesystem.parameters
+    try:
+        if coordinatesystem.kind == 'Relative':
+            reference = cs_matrix(oEditor, coordinatesystem.reference)
+            if reference is not None:
+                matrix = reference.dot(_frame_matrix(_vector(oEditor, p['Origin']),
+                                                     _vector(oEditor, p['XAxis']),
+                                                     _vector(oEditor, p['YAxis'])))
+        elif coordinatesystem.kind == 'Face':
+            matrix = _face_cs_matrix(oEditor, p)
+    except (ValueError, KeyError, TypeError, ZeroDivisionError):
+        matrix = None
+    coordinatesystem._matrix = (key, matrix)
+    return matrix
+
+def _geometry_to_global(geometry, matrix):
+    """
+    Returns a geometry given in a coordinate system in global coordinates.
+    The shape is kept when the axes of the coordinate system are parallel
+    to the global ones.
+    """
+    rotation = matrix[:3, :3]
+    translation = matrix[:3, 3]
+    permutation = np.allclose(np.abs(rotation), np.round(np.abs(rotation)))
+    if geometry.shape is None or not permutation:
+        return geometry.transformed(lambda points: _apply_matrix(matrix, points))
+
+    corners = _apply_matrix(matrix, np.array([geometry.lower, geometry.upper]))
+    lower, upper = corners.min(axis=0), corners.max(axis=0)
+    shape = geometry.shape
+    if shape[0] == 'sphere':
+        shape = ('sphere', rotation.dot(shape[1]) + translation, shape[2])
+    elif shape[0] == 'cylinder':
+        center, radius, height, axis = shape[1:]
+        newaxis = int(np.argmax(np.abs(rotation[:, axis])))
+        center = rotation.dot(center) + translation
+        if rotation[newaxis, axis] < 0:
+            center[newaxis] -= height
+        shape = ('cylinder', center, radius, height, newaxis)
+    return Geometry(lower, upper, shape)
+
+def transform_points(oEditor, points, from_cs='Global', to_cs='Global'):
+    """
+    Transforms an (N, 3) array of points in meters from a coordinate system
+    to another one, in a single vectorized operation.
+
+    Raises
+    ------
+    ValueError
+        If a coordinate system is not known locally.
+    """
+    matrices = []
+    for name in (from_cs, to_cs):
+        matrix = cs_matrix(oEditor, name)
+        if matrix is None:
+            raise ValueError("The coordinate system {0} is not known".format(name))
+        matrices.append(matrix)
+    matrix = np.linalg.solve(matrices[1], matrices[0])
+    return _apply_matrix(matrix, np.asarray(points, dtype=float).reshape(-1, 3))
+
+## Interference of geometries
+
+def _box_point_distance(lower, upper, point):
+    """
+    Returns the distance from a point to an axis-aligned box (0 inside).
+    """
+    return np.linalg.norm(np.maximum(np.maximum(lower - point, point - upper), 0.0))
+
+def _exact_overlap(a, b, tol):
+    """
+    Returns whether the interiors of two exact geometries whose bounding
+    boxes overlap intersect, or None if it is not known.
+    """
+    kinds = (a.shape[0], b.shape[0])
+    if kinds == ('box', 'box'):
+        return True
+    if kinds == ('sphere', 'sphere'):
+        return np.linalg.norm(a.shape[1] - b.shape[1]) < a.shape[2] + b.shape[2] - tol
+    if 'box' in kinds and 'sphere' in kinds:
+        box, sphere = (a, b) if kinds[0] == 'box' else (b, a)
+        return _box_point_distance(box.lower, box.upper, sphere.shape[1]) < sphere.shape[2] - tol
+    if 'cylinder' in kinds and 'sphere' not in kinds:
+        # Both are extrusions along the cylinder axis, whose overlap along
+        # the axis is given by the bounding boxes
+        cylinder, other = (a, b) if kinds[0] == 'cylinder' else (b, a)
+        axis = cylinder.shape[4]
+        if other.shape[0] == 'cylinder' and other.shape[4] != axis:
+            return None
+        plane = [n for n in range(3) if n != axis]
+        center = cylinder.shape[1][plane]
+        if other.shape[0] == 'box':
+            distance = _box_point_distance(other.lower[plane], other.upper[plane], center)
+            return distance < cylinder.shape[2] - tol
+        distance = np.linalg.norm(other.shape[1][plane] - center)
+        return distance < cylinder.shape[2] + other.shape[2] - tol
+    return None
+
+def interference(a, b, tol=None):
+    """
+    Returns how two geometries interfere: 'disjoint' if they are apart,
+    'touching' if their interiors do not intersect (they may touch, e.g.
+    with coincident faces), 'overlapping' if their interiors intersect, or
+    None if it cannot be known. Inexact geometries can only be disjoint or
+    touching, as their bounding boxes are upper bounds of their extent.
+    """
+    tol = tolerance if tol is None else tol
+    gap = np.max(np.maximum(a.lower - b.upper, b.lower - a.upper))
+    if gap > tol:
+        return 'disjoint'
+    if gap >= -tol:
+        return 'touching'
+    if a.shape is None or b.shape is None:
+        return None
+    # Flat objects (sheets) have no interior
+    if np.any(a.upper - a.lower <= tol) or np.any(b.upper - b.lower <= tol):
+        return None
+    overlap = _exact_overlap(a, b, tol)
+    if overlap is None:
+        return None
+    return 'overlapping' if overlap else 'touching'
+
+def contains_geometry(outer, inner):
+    """
+    Whether an exact convex geometry contains another one, judging by the
+    corners of the bounding box of the latter.
+    """
+    if outer.shape is None:
+        return False
+    corners = [[inner.upper[0] if i & 1 else inner.lower[0],
+                inner.upper[1] if i & 2 else inner.lower[1],
+                inner.upper[2] if i & 4 else inner.lower[2]] for i in range(8)]
+    return all(outer.contains(np.array(corner)) for corner in corners)
+
+## Measures and tessellation of the primitives
+
+class Mesh(object):
+    """
+    Triangle mesh of the surface of an object of the 3D modeler.
+
+    Parameters
+    ----------
+    vertices : numpy array
+        (N, 3) array with the vertices, in meters.
+    triangles : numpy array
+        (M, 3) integer array with the vertex indexes of each triangle.
+    faces : numpy array
+        (M,) integer array with the index in keys of the face of each
+        triangle.
+    keys : list of tuples
+        Keys identifying the faces of the object, as returned by
+        Geometry.face_key().
+
+    """
+    def __init__(self, vertices, triangles, faces, keys):
+        self.vertices = np.asarray(vertices, dtype=float).reshape(-1, 3)
+        self.triangles = np.asarray(triangles, dtype=int).reshape(-1, 3)
+        self.faces = np.asarray(faces, dtype=int)
+        self.keys = list(keys)
+
+    def __repr__(self):
+        return "Mesh({0} vertices, {1} triangles)".format(len(self.vertices),
+                                                           len(self.triangles))
+
+    def transformed(self, function):
+        """
+        Returns the mesh with the vertices transformed by a function of an
+        array of points.
+        """
+        return Mesh(function(self.vertices), self.triangles, self.faces, self.keys)
+
+    def _corners(self):
+        return [self.vertices[self.triangles[:, n]] for n in range(3)]
+
+    def area(self):
+        """
+        Returns the total area of the triangles.
+        """
+        a, b, c = self._corners()
+        return 0.5*np.linalg.norm(np.cross(b - a, c - a), axis=1).sum()
+
+    def intersect(self, origin, direction):
+        """
+        Returns the distance along the ray origin + t*direction (t >= 0) to
+        the first triangle hit, and the key of its face, or (None, None) if
+        no triangle is hit.
+        """
+        if not len(self.triangles):
+            return None, None
+        # Moller-Trumbore, for all the triangles at once
+        a, b, c = self._corners()
+        edge1 = b - a
+        edge2 = c - a
+        pvec = np.cross(direction, edge2)
+        det = np.einsum('ij,ij->i', edge1, pvec)
+        valid = np.abs(det) > 1e-300
+        invdet = np.where(valid, 1.0/np.where(valid, det, 1.0), 0.0)
+        tvec = origin - a
+        u = np.einsum('ij,ij->i', tvec, pvec)*invdet
+        qvec = np.cross(tvec, edge1)
+        v = qvec.dot(direction)*invdet
+        t = np.einsum('ij,ij->i', edge2, qvec)*invdet
+        eps = 1e-12
+        hit = valid & (u >= -eps) & (v >= -eps) & (u + v <= 1 + eps) & (t >= 0)
+        if not np.any(hit):
+            return None, None
+        first = np.flatnonzero(hit)[np.argmin(t[hit])]
+        return t[first], self.keys[self.faces[first]]
+
+def _frame(axis):
+    """
+    Returns the unit vectors of a coordinate axis and of the two axes
+    that follow it.
+    """
+    return [np.eye(3)[(axis + n) % 3] for n in range(3)]
+
+def _box_mesh(lower, upper):
+    corners = np.array([[upper[0] if i & 1 else lower[0],
+                         upper[1] if i & 2 else lower[1],
+                         upper[2] if i & 4 else lower[2]] for i in range(8)])
+    flat = [axis for axis in range(3) if upper[axis] - lower[axis] <= tolerance]
+    quads = []
+    keys = []
+    for axis in range(3):
+        if flat and axis != flat[0]:
+            continue
+        b, c = (axis + 1) % 3, (axis + 2) % 3
+        for side in ((0,) if flat else (0, 1)):
+            quads.append([side << axis | u << b | v << c
+                          for u, v in ((0, 0), (1, 0), (1, 1), (0, 1))])
+            keys.append(('sheet',) if flat else (axis, side))
+    quads = np.array(quads)
+    triangles = np.concatenate([quads[:, [0, 1, 2]], quads[:, [0, 2, 3]]])
+    faces = np.tile(np.arange(len(quads)), 2)
+    return Mesh(corners, triangles, faces, keys)
+
+def _cylinder_mesh(center, radius, height, axis, segments):
+    normal, first, second = _frame(axis)
+    angles = 2*np.pi*np.arange(segments)/segments
+    ring = center + radius*(np.outer(np.cos(angles), first) + np.outer(np.sin(angles), second))
+    k = np.arange(segments)
+    following = (k + 1) % segments
+    if height == 0:
+        vertices = np.vstack([center, ring])
+        triangles = np.column_stack([np.zeros(segments, dtype=int), 1 + k, 1 + following])
+        return Mesh(vertices, triangles, np.zeros(segments, dtype=int), [('sheet',)])
+
+    vertices = np.vstack([center, center + height*normal, ring, ring + height*normal])
+    bottom, top = 2 + k, 2 + segments + k
+    bottomnext, topnext = 2 + following, 2 + segments + following
+    zeros = np.zeros(segments, dtype=int)
+    triangles = np.concatenate([np.column_stack([bottom, bottomnext, topnext]),
+                                np.column_stack([bottom, topnext, top]),
+                                np.column_stack([zeros, bottom, bottomnext]),
+                                np.column_stack([zeros + 1, top, topnext])])
+    faces = np.repeat([0, 0, 1, 2], segments)
+    return Mesh(vertices, triangles, faces, [('side',), ('cap', 0), ('cap', 1)])
+
+def _sphere_mesh(center, radius, segments):
+    rings = max(segments//2, 2)
+    polar = np.pi*np.arange(1, rings)/rings
+    azimuth = 2*np.pi*np.arange(segments)/segments
+    points = np.column_stack([np.outer(np.sin(polar), np.cos(azimuth)).ravel(),
+                              np.outer(np.sin(polar), np.sin(azimuth)).ravel(),
+                              np.repeat(np.cos(polar), segments)])
+    vertices = center + radius*np.vstack([[0, 0, 1], points, [0, 0, -1]])
+    k = np.arange(segments)
+    following = (k + 1) % segments
+    south = len(vertices) - 1
+    triangles = [np.column_stack([np.zeros(segments, dtype=int), 1 + k, 1 + following])]
+    for ring in range(rings - 2):
+        upper = 1 + ring*segments
+        lower = upper + segments
+        triangles.append(np.column_stack([upper + k, lower + k, lower + following]))
+        triangles.append(np.column_stack([upper + k, lower + following, upper + following]))
+    last = 1 + (rings - 2)*segments
+    triangles.append(np.column_stack([last + k, np.full(segments, south), last + following]))
+    triangles = np.concatenate(triangles)
+    return Mesh(vertices, triangles, np.zeros(len(triangles), dtype=int), [('surface',)])
+
+def _cylinder_parameters(oEditor, modelobject):
+    """
+    Returns the center of the base, radius, height (not negative), axis
+    index and number of sides (0 for a true circle) of a cylinder or circle.
+    """
+    p = modelobject.parameters
+    center = _vector(oEditor, (p['XCenter'], p['YCenter'], p['ZCenter']))
+    radius = evaluate_length(oEditor, p['Radius'])
+    axis = _axis_index[str(p['WhichAxis'])]
+    if modelobject.primitive == 'Cylinder':
+        height = evaluate_length(oEditor, p['Height'])
+        sides = int(str(p.get('NumSides', '0')))
+    else:
+        height = 0.0
+        sides = int(str(p.get('NumSegments', '0')))
+    if height < 0:
+        center[axis] += height
+        height = -height
+    return center, radius, height, axis, sides
+
+def _primitive_mesh(oEditor, modelobject, segments):
+    """
+    Returns the mesh of an object as created, or None if unknown.
+    """
+    primitive = modelobject.primitive
+    if primitive in ('Box', 'Rectangle'):
+        geometry = _primitive_geometry(oEditor, modelobject)
+        return None if geometry is None else _box_mesh(geometry.lower, geometry.upper)
+    if primitive in ('Cylinder', 'Circle'):
+        center, radius, height, axis, sides = _cylinder_parameters(oEditor, modelobject)
+        return _cylinder_mesh(center, radius, height, axis, sides or segments)
+    if primitive == 'Sphere':
+        p = modelobject.parameters
+        center = _vector(oEditor, (p['XCenter'], p['YCenter'], p['ZCenter']))
+        return _sphere_mesh(center, evaluate_length(oEditor, p['Radius']), segments)
+    if primitive == 'Polyline':
+        p = modelobject.parameters
+        points = _polyline_vertices(oEditor, p)
+        if p.get('IsPolylineCovered') and len(points) >= 3:
+            k = np.arange(1, len(points) - 1)
+            triangles = np.column_stack([np.zeros(len(k), dtype=int), k, k + 1])
+            return Mesh(points, triangles, np.zeros(len(k), dtype=int), [('sheet',)])
+        return Mesh(points, np.zeros((0, 3)), [], [])
+    return None
+
+def object_mesh(oEditor, modelobject, segments=16):
+    """
+    Returns a triangle mesh of the surface of an object of the model table,
+    or None if it cannot be known locally. Curved surfaces are approximated
+    with the given number of segments per turn, and the mesh of an uncovered
+    polyline has no triangles.
+    """
+    if any(operation != 'Imprint' for operation, consumed in modelobject.operations):
+        return None
+    try:
+        mesh = _primitive_mesh(oEditor, modelobject, segments)
+        if mesh is None:
+            return None
+        # Transforms are exact on the vertices
+        mesh = mesh.transformed(_placement(oEditor, modelobject))
+    except (ValueError, KeyError, TypeError, ZeroDivisionError):
+        return None
+    return mesh
+
+def _placement(oEditor, modelobject):
+    """
+    Returns a function mapping an array of points of an object as created
+    to their global coordinates, through its coordinate system and its
+    transforms.
+
+    Raises
+    ------
+    ValueError
+        If the coordinate system or a transform is not known locally.
+    """
+    functions = []
+    if modelobject.coordinate_system != 'Global':
+        matrix = cs_matrix(oEditor, modelobject.coordinate_system)
+        if matrix is None:
+            raise ValueError("The coordinate system {0} is not known".format(
+                modelobject.coordinate_system))
+        functions.append(lambda points: _apply_matrix(matrix, points))
+    functions.extend(_transform_function(oEditor, transform) for transform in modelobject.transforms)
+    def place(points):
+        for function in functions:
+            points = function(points)
+        return points
+    return place
+
+def surface_point(oEditor, name, point, key):
+    """
+    Returns the point of the exact surface of a face of an object closest
+    to a point of the face on its mesh (see pick()). The curved faces of
+    spheres and cylinders are approximated by chords in the mesh, so their
+    points are inside the body.
+
+    Raises
+    ------
+    ValueError
+        If the surface is not known locally.
+    """
+    modelobject = model_table(oEditor)[name]
+    p = modelobject.parameters
+    if key == ('surface',) and modelobject.primitive == 'Sphere':
+        center = _vector(oEditor, (p['XCenter'], p['YCenter'], p['ZCenter']))
+        radius = evaluate_length(oEditor, p['Radius'])
+        local = np.vstack([center, center + radius*np.eye(3)])
+    elif key == ('side',) and modelobject.primitive == 'Cylinder':
+        center, radius, height, axis, sides = _cylinder_parameters(oEditor, modelobject)
+        if sides:
+            # The sides of a polygonal cylinder are flat
+            return point
+        normal, first, second = _frame(axis)
+        local = np.array([center, center + radius*first, center + radius*second,
+                          center + height*normal])
+    else:
+        # Flat faces are exact in the mesh
+        return point
+
+    placed = _placement(oEditor, modelobject)(local)
+    center = placed[0]
+    radial = point - center
+    if key == ('surface',):
+        radii = np.linalg.norm(placed[1:] - center, axis=1)
+    else:
+        radii = np.linalg.norm(placed[1:3] - center, axis=1)
+        # Center on the axis at the height of the point
+        axis = (placed[3] - center)/np.linalg.norm(placed[3] - center)
+        center = center + radial.dot(axis)*axis
+        radial = radial - radial.dot(axis)*axis
+    # Non-uniform scalings leave ellipsoids and elliptic cylinders
+    if not np.allclose(radii, radii[0]):
+        raise ValueError("The surface of {0} is not known".format(name))
+    return center + radii[0]*radial/np.linalg.norm(radial)
+
+def _primitive_measures(oEditor, modelobject):
+    """
+    Returns the exact measures of an object as created (see
+    object_measures()), or None if unknown.
+    """
+    primitive = modelobject.primitive
+    if primitive in ('Box', 'Rectangle'):
+        geometry = _primitive_geometry(oEditor, modelobject)
+        if geometry is None:
+            return None
+        size = geometry.upper - geometry.lower
+        if np.any(size <= tolerance):
+            return {'area': float(np.prod(size[size > tolerance]))}
+        return {'volume': float(np.prod(size)),
+                'area': float(2*(size[0]*size[1] + size[1]*size[2] + size[2]*size[0]))}
+    if primitive in ('Cylinder', 'Circle'):
+        center, radius, height, axis, sides = _cylinder_parameters(oEditor, modelobject)
+        if sides:
+            base = sides/2*radius**2*math.sin(2*math.pi/sides)
+            perimeter = 2*sides*radius*math.sin(math.pi/sides)
+        else:
+            base = math.pi*radius**2
+            perimeter = 2*math.pi*radius
+        if height == 0:
+            return {'area': base}
+        return {'volume': base*height, 'area': 2*base + perimeter*height}
+    if primitive == 'Sphere':
+        radius = evaluate_length(oEditor, modelobject.parameters['Radius'])
+        return {'volume': 4/3*math.pi*radius**3, 'area': 4*math.pi*radius**2}
+    return None
+
+def object_measures(oEditor, modelobject):
+    """
+    Returns the exact measures of an object of the model table, in SI
+    units: {'volume': ..., 'area': ...} for solids (area of the whole
+    surface), {'area': ...} for sheets and {'length': ...} for lines (and
+    also 'area' for covered polylines). Returns None if they cannot be
+    known locally.
+    """
+    if any(operation != 'Imprint' for operation, consumed in modelobject.operations):
+        return None
+    try:
+        if modelobject.primitive == 'Polyline':
+            p = modelobject.parameters
+            points = _polyline_vertices(oEditor, p)
+            for transform in modelobject.transforms:
+                points = _transform_function(oEditor, transform)(points)
+            closed = np.vstack([points, points[:1]])
+            path = closed if p.get('IsPolylineClosed') else points
+            measures = {'length': float(np.linalg.norm(np.diff(path, axis=0), axis=1).sum())}
+            if p.get('IsPolylineCovered'):
+                # Vector area of the (planar) polygon
+                measures['area'] = float(np.linalg.norm(np.cross(closed[:-1], closed[1:]).sum(axis=0))/2)
+            return measures
+
+        measures = _primitive_measures(oEditor, modelobject)
+        if measures is None:
+            return None
+        # Rigid transforms keep the measures. A scaling multiplies the volume
+        # by the product of the factors, and the area only if it is uniform.
+        for transform in modelobject.transforms:
+            if transform[0] == 'CoordinateSystem':
+                transform = transform[2]
+            if transform[0] != 'Scale':
+                continue
+            factors = np.abs(_scale_factors(oEditor, transform))
+            if 'volume' in measures:
+                measures['volume'] *= float(np.prod(factors))
+            if np.allclose(factors, factors[0]):
+                measures['area'] *= float(factors[0]**2)
+            else:
+                measures.pop('area')
+    except (ValueError, KeyError, TypeError, ZeroDivisionError):
+        return None
+    return measures
+
+def _ray_box_entry(lower, upper, origin, direction):
+    """
+    Returns the distances along a ray at which it enters each of the boxes
+    given by (N, 3) arrays of corners (inf for the boxes it misses).
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        inverse = 1.0/direction
+        t1 = (lower - tolerance - origin)*inverse
+        t2 = (upper + tolerance - origin)*inverse
+    # Axes along which the ray is parallel to the slabs
+    parallel = direction == 0
+    inside = np.all(~parallel | ((origin >= lower - tolerance) & (origin <= upper + tolerance)),
+                    axis=1)
+    tnear = np.where(parallel, -np.inf, np.minimum(t1, t2)).max(axis=1)
+    tfar = np.where(parallel, np.inf, np.maximum(t1, t2)).min(axis=1)
+    tnear = np.maximum(tnear, 0.0)
+    return np.where(inside & (tnear <= tfar), tnear, np.inf)
+
+def pick(oEditor, origin, direction, segments=16):
+    """
+    Returns the first object surface hit by the ray origin + t*direction
+    (t >= 0), as (name, point, face key), or None if no object is hit.
+
+    Raises
+    ------
+    ValueError
+        If it cannot be known locally (an object of unknown geometry or
+        mesh may be hit first).
+    """
+    origin = np.asarray(origin, dtype=float)
+    direction = np.asarray(direction, dtype=float)
+    direction = direction/np.linalg.norm(direction)
+    index = spatial_index(oEditor)
+    if index.unknown:
+        raise ValueError("The geometry of {0} is not known".format(', '.join(index.unknown)))
+    if not index.names:
+        return None
+
+    table = model_table(oEditor)
+    entries = _ray_box_entry(index.bvh.lower, index.bvh.upper, origin, direction)
+    best = None
+    for n in np.argsort(entries):
+        if not np.isfinite(entries[n]) or (best is not None and entries[n] > best[0]):
+            break
+        mesh = object_mesh(oEditor, table[index.names[n]], segments)
+        if mesh is None:
+            raise ValueError("The surface of {0} is not known".format(index.names[n]))
+        t, key = mesh.intersect(origin, direction)
+        if t is not None and (best is None or t < best[0]):
+            best = (t, index.names[n], key)
+    if best is None:
+        return None
+    return best[1], origin + best[0]*direction, best[2]
+
+## Point reduction of polylines and equation based curves
+
+def _segment_distances(points, start, end):
+    """
+    Returns the distances from an array of points to the segment between
+    the points start and end.
+    """
+    direction = end - start
+    length2 = direction.dot(direction)
+    if length2 == 0.0:
+        return np.linalg.norm(points - start, axis=1)
+    u = np.clip((points - start).dot(direction)/length2, 0.0, 1.0)
+    return np.linalg.norm(points - start - np.outer(u, direction), axis=1)
+
+def simplify_polyline(points, tol):
+    """
+    Returns the indexes of the vertices of a polyline kept by the
+    Ramer-Douglas-Peucker algorithm, so that no removed vertex is farther
+    than tol from the simplified polyline.
+
+    Parameters
+    ----------
+    points : array_like
+        (N, 3) array with the vertices of the polyline.
+    tol : float
+        Maximum deviation, in the units of the points.
+
+    Returns
+    -------
+    indexes : numpy array
+        Sorted indexes of the kept vertices. The first and last vertices are
+        always kept.
+    """
+    points = np.asarray(points, dtype=float)
+    keep = np.zeros(len(points), dtype=bool)
+    keep[[0, -1]] = True
+    pending = [(0, len(points) - 1)]
+    while pending:
+        first, last = pending.pop()
+        if last - first < 2:
+            continue
+        distances = _segment_distances(points[first+1:last], points[first], points[last])
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tol:
+            middle = first + 1 + farthest
+            keep[middle] = True
+            pending.append((first, middle))
+            pending.append((middle, last))
+    return np.flatnonzero(keep)
+
+def _equation_names(oEditor, expr):
+    """
+    Returns the values (in SI units) of the constants and variables
+    referenced by an equation, and whether there are variables among them.
+    """
+    names = dict()
+    variables = False
+    for name in set(_name_regex.findall(expr)):
+        if name == '_t' or name in units.array_functions_dict:
+            continue
+        if name in prop.constants_dict:
+            names[name] = float(prop.constants_dict[name])
+        else:
+            names[name] = evaluate_length(oEditor, name)
+            variables = True
+    return names, variables
+
+def _evaluate_parameter(oEditor, expr):
+    """
+    Evaluates a limit of the parameter _t of an equation based curve.
+    """
+    expr = Ex(expr).expr
+    return float(units.evaluate_array(expr, _equation_names(oEditor, expr)[0]))
+
+def _equation_function(oEditor, expr):
+    """
+    Returns a function evaluating the equation of a curve coordinate (in
+    meters) for an array of values of its parameter _t.
+    """
+    expr = Ex(expr).expr
+    names, variables = _equation_names(oEditor, expr)
+    withunits = variables or any(match.group(2)
+                                 for match in units._literal_regex.finditer(expr))
+    factor = 1.0 if withunits else units.units_dict[model_units(oEditor)]
+    def function(t):
+        names['_t'] = t
+        return np.broadcast_to(units.evaluate_array(expr, names)*factor, np.shape(t))
+    return function
+
+def curve_point_count(oEditor, xt, yt, zt, tstart, tend, tol, maxpoints=0, samples=100001):
+    """
+    Returns the minimum number of equally spaced points (in the parameter
+    _t) of an equation based curve so that the polyline through them does
+    not deviate from the curve more than tol.
+
+    The curve is evaluated locally at a number of samples, and the number of
+    points is searched by doubling and bisection.
+
+    Parameters
+    ----------
+    oEditor : pywin32 COMObject
+        The HFSS editor in which the curve will be drawn.
+    xt, yt, zt : str
+        Equations of the coordinates as functions of _t.
+    tstart, tend : str or float
+        Limits of _t.
+    tol : float
+        Maximum deviation in meters.
+    maxpoints : int
+        Maximum number of points (0 for no limit other than the samples).
+    samples : int
+        Number of samples of the curve used to measure the deviation.
+
+    Returns
+    -------
+    numpoints : int
+        Number of points of the curve.
+
+    Raises
+    ------
+    ValueError
+        If the equations cannot be evaluated locally.
+    """
+    try:
+        functions = [_equation_function(oEditor, expr) for expr in (xt, yt, zt)]
+        t0 = _evaluate_parameter(oEditor, tstart)
+        t1 = _evaluate_parameter(oEditor, tend)
+        def curve(t):
+            return np.column_stack([function(t) for function in functions])
+        t = np.linspace(t0, t1, samples)
+        dense = curve(t)
+    except Exception as exc:
+        raise ValueError("Cannot evaluate the curve locally: {0}".format(exc))
+
+    maxpoints = min(maxpoints or samples, samples)
+
+    def deviation(numpoints):
+        vertices = curve(np.linspace(t0, t1, numpoints))
+        segment = np.minimum((np.arange(samples)*(numpoints - 1))//(samples - 1), numpoints - 2)
+        start = vertices[segment]
+        direction = vertices[segment + 1] - start
+        length2 = np.maximum(np.einsum('ij,ij->i', direction, direction), 1e-300)
+        u = np.clip(np.einsum('ij,ij->i', dense - start, direction)/length2, 0.0, 1.0)
+        return np.max(np.linalg.norm(dense - start - u[:, None]*direction, axis=1))
+
+    low, high = 1, 2
+    while deviation(high) > tol:
+        if high >= maxpoints:
+            return maxpoints
+        low, high = high, min(2*high, maxpoints)
+    while high - low > 1:
+        middle = (low + high)//2
+        if deviation(middle) > tol:
+            low = middle
+        else:
+            high = middle
+    return high
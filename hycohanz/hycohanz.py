@@ -56,6 +56,9 @@ from hycohanz.project import (get_project_name,
 from hycohanz.property import ( constants_dict,
                                 add_property,
                                 set_variable,
+                                set_variables,
+                                get_variable_cache_stats,
+                                clear_variable_cache,
                                 get_variables,
                                 get_variable_value,
                                 expand_expression,
@@ -71,6 +74,31 @@ from hycohanz.design import (get_module,
 
 from hycohanz.expression import Expression
 from hycohanz.modeler3d import *
+from hycohanz.model import (get_model_table,
+                            reconcile_model,
+                            get_object_info,
+                            get_model_object_names,
+                            clear_topology_cache,
+                            allocate_name,
+                            release_name)
+from hycohanz.booleanplanner import BooleanPlanner
+from hycohanz.deferred import DeferredModeler
+from hycohanz.transaction import Transaction, transaction
+from hycohanz.meshsimplify import (simplify_mesh_file,
+                                   get_simplify_report)
+from hycohanz.modelspec import (ModelSpec,
+                                FaceIDs,
+                                FaceAt,
+                                apply_model_spec,
+                                reset_model_spec)
+from hycohanz.coordinatesystem import (create_relative_cs,
+                                       create_face_cs,
+                                       set_working_cs,
+                                       get_cs_matrix,
+                                       transform_points)
+from hycohanz.arraybuilder import (create_rectangular_array,
+                                   create_triangular_array,
+                                   create_circular_array)
 from hycohanz.material import ( add_material,
                                 does_material_exist,
                                 )
@@ -80,6 +108,14 @@ from hycohanz.analysis_setup import (insert_frequency_sweep,
                                      get_setups,
                                      get_sweeps)
 
+from hycohanz.optimetrics import (generate_variations,
+                                  insert_parametric_setup,
+                                  insert_doe_setup,
+                                  solve_parametric_setup)
+
+from hycohanz.orchestrator import (SweepOrchestrator,
+                                   write_csv)
+
 from hycohanz.boundarysetup import (assign_perfect_e,
                                     assign_radiation,
                                     assign_perfect_h,
@@ -0,0 +1,361 @@
+# -*- coding: utf-8 -*-
+"""
+Simplification of triangulated (STL and OBJ) geometry before its import.
+
+Scanned or exported tessellations are often much denser than needed, and
+every triangle becomes a face that HFSS has to heal and mesh. The files are
+reduced locally, in two stages:
+
+- Vertex clustering: the vertices closer than a tolerance (in the same
+  cell of a grid of that size) are merged, and the triangles that collapse
+  are removed.
+- Coplanar merging: the vertices inside flat regions, or along straight
+  edges between them, are removed by collapsing them onto a neighbor when
+  no triangle leaves its plane (within an angle), so every flat region ends
+  up with a few large triangles.
+
+import_model() applies them with its SimplifyTolerance option.
+
+Example Usage
+-------------
+>>> report = hfss.simplify_mesh_file("scan.stl", "scan_reduced.stl", 0.05)
+>>> report['triangles_before'], report['triangles_after']
+(812344, 40126)
+"""
+
+from __future__ import division, print_function, unicode_literals, absolute_import
+
+import math
+import os
+import re
+import struct
+import time
+
+import numpy as np
+
+# Report of the last simplification (see get_simplify_report())
+_last_report = dict()
+
+## Reading and writing
+
+def _indexed(corners):
+    """
+    Returns the vertices and triangles of an (M, 3, 3) array with the
+    corners of each triangle, merging the equal vertices.
+    """
+    vertices, inverse = np.unique(corners.reshape(-1, 3), axis=0, return_inverse=True)
+    return vertices, inverse.reshape(-1, 3)
+
+def read_stl(filename):
+    """
+    Reads an ASCII or binary STL file. Returns the vertices, as an (N, 3)
+    array, and the triangles, as an (M, 3) array of vertex indices.
+    """
+    with open(filename, 'rb') as f:
+        content = f.read()
+    if len(content) >= 84:
+        count = struct.unpack('<I', content[80:84])[0]
+        if len(content) == 84 + 50*count:
+            records = np.frombuffer(content, dtype=np.dtype([('normal', '<f4', 3),
+                                                             ('corners', '<f4', (3, 3)),
+                                                             ('attribute', '<u2')]),
+                                    count=count, offset=84)
+            return _indexed(records['corners'].astype(float))
+    numbers = re.findall(br'vertex\s+(\S+)\s+(\S+)\s+(\S+)', content)
+    return _indexed(np.array(numbers, dtype=float).reshape(-1, 3, 3))
+
+def read_obj(filename):
+    """
+    Reads the vertices and faces of an OBJ file, with the faces of more than
+    three vertices split into triangles. Returns the vertices, as an (N, 3)
+    array, and the triangles, as an (M, 3) array of vertex indices.
+    """
+    vertices = []
+    triangles = []
+    with open(filename) as f:
+        for line in f:
+            fields = line.split()
+            if not fields:
+                continue
+            if fields[0] == 'v':
+                vertices.append([float(c) for c in fields[1:4]])
+            elif fields[0] == 'f':
+                # OBJ indices start at 1, and negative ones count from the end
+                face = [int(field.split('/')[0]) for field in fields[1:]]
+                face = [n - 1 if n > 0 else len(vertices) + n for n in face]
+                triangles.extend([face[0], face[n], face[n + 1]] for n in range(1, len(face) - 1))
+    return np.array(vertices, dtype=float).reshape(-1, 3), np.array(triangles, dtype=int).reshape(-1, 3)
+
+def write_stl(filename, vertices, triangles):
+    """
+    Writes a binary STL file.
+    """
+    corners = vertices[triangles]
+    normals = np.cross(corners[:, 1] - corners[:, 0], corners[:, 2] - corners[:, 0])
+    lengths = np.linalg.norm(normals, axis=1)
+    normals = normals/np.where(lengths > 0, lengths, 1)[:, None]
+    records = np.zeros(len(triangles), dtype=np.dtype([('normal', '<f4', 3),
+                                                       ('corners', '<f4', (3, 3)),
+                                                       ('attribute', '<u2')]))
+    records['normal'] = normals
+    records['corners'] = corners
+    with open(filename, 'wb') as f:
+        f.write(b'hycohanz simplified mesh'.ljust(80, b' '))
+        f.write(struct.pack('<I', len(triangles)))
+        f.write(records.tobytes())
+
+def write_obj(filename, vertices, triangles):
+    """
+    Writes an OBJ file with the vertices and triangles.
+    """
+    with open(filename, 'w') as f:
+        np.savetxt(f, vertices, fmt='v %.9g %.9g %.9g')
+        np.savetxt(f, triangles + 1, fmt='f %d %d %d')
+
+## Simplification
+
+def _clean(vertices, triangles):
+    """
+    Removes the degenerate and repeated triangles, and the unused vertices.
+    """
+    degenerate = ((triangles[:, 0] == triangles[:, 1]) | (triangles[:, 1] == triangles[:, 2])
+                  | (triangles[:, 2] == triangles[:, 0]))
+    triangles = triangles[~degenerate]
+    if len(triangles):
+        triangles = triangles[np.sort(np.unique(np.sort(triangles, axis=1), axis=0,
+                                                return_index=True)[1])]
+    used, inverse = np.unique(triangles, return_inverse=True)
+    return vertices[used], inverse.reshape(-1, 3)
+
+def cluster_vertices(vertices, triangles, tolerance):
+    """
+    Merges the vertices in the same cell of a grid of size tolerance into
+    their mean, and removes the triangles that collapse.
+
+    Parameters
+    ----------
+    vertices : numpy array
+        (N, 3) array with the vertices.
+    triangles : numpy array
+        (M, 3) array with the vertex indices of each triangle.
+    tolerance : float
+        Size of the cells, in the units of the vertices.
+
+    Returns
+    -------
+    vertices, triangles : numpy arrays
+        The simplified mesh.
+    """
+    cells = np.floor(vertices/tolerance).astype(np.int64)
+    cells, inverse = np.unique(cells, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+    counts = np.bincount(inverse, minlength=len(cells))
+    merged = np.zeros((len(cells), 3))
+    np.add.at(merged, inverse, vertices)
+    merged /= counts[:, None]
+    return _clean(merged, inverse[triangles])
+
+def _normals(vertices, triangles):
+    normals = np.cross(vertices[triangles[:, 1]] - vertices[triangles[:, 0]],
+                       vertices[triangles[:, 2]] - vertices[triangles[:, 0]])
+    areas = np.linalg.norm(normals, axis=1)
+    return normals/np.where(areas > 0, areas, 1)[:, None], areas/2
+
+def _edges(count, first, second):
+    """
+    Returns the distinct (first, second) pairs of vertices, sorted, and
+    the number of times each of them appears, with the pairs encoded as
+    single integers (faster than np.unique(..., axis=0)).
+    """
+    keys, counts = np.unique(first.astype(np.int64)*count + second, return_counts=True)
+    return np.stack([keys//count, keys % count], axis=1), counts
+
+def _collapses(vertices, triangles, normals, minarea, mincos, candidates):
+    """
+    Returns the valid collapses of the candidate vertices onto their
+    neighbors, as arrays of vertices and neighbors, sorted by vertex and
+    then by the length of the collapsed edge. All of them are tested at
+    once, with every remaining triangle around each vertex.
+    """
+    # Corners of the triangles: vertex, the next two vertices (in the
+    # orientation of the triangle) and triangle
+    corner_v = triangles.ravel()
+    corner_a = triangles[:, [1, 2, 0]].ravel()
+    corner_b = triangles[:, [2, 0, 1]].ravel()
+    corner_t = np.repeat(np.arange(len(triangles)), 3)
+    order = np.argsort(corner_v, kind='stable')
+    corner_v, corner_a, corner_b, corner_t = (corner_v[order], corner_a[order],
+                                              corner_b[order], corner_t[order])
+    starts = np.searchsorted(corner_v, np.arange(len(vertices) + 1))
+    fansize = np.diff(starts)
+
+    # Edges from each vertex, with the number of triangles on them. Only
+    # vertices surrounded by a closed fan of triangles can be removed.
+    pairs, counts = _edges(len(vertices), np.concatenate([corner_v, corner_v]),
+                           np.concatenate([corner_a, corner_b]))
+    ringsize = np.bincount(pairs[:, 0], minlength=len(vertices))
+    opencount = np.bincount(pairs[counts != 2, 0], minlength=len(vertices))
+    closed = (ringsize >= 3) & (ringsize == fansize) & (opencount == 0)
+    iscandidate = np.zeros(len(vertices), dtype=bool)
+    iscandidate[candidates] = True
+    pairs = pairs[closed[pairs[:, 0]] & iscandidate[pairs[:, 0]]]
+    if not len(pairs):
+        return pairs[:, 0], pairs[:, 1]
+
+    # Every pair with every triangle around its vertex
+    v, u = pairs[:, 0], pairs[:, 1]
+    reps = fansize[v]
+    pairindex = np.repeat(np.arange(len(pairs)), reps)
+    offsets = np.arange(reps.sum()) - np.repeat(np.cumsum(reps) - reps, reps)
+    corner = starts[v][pairindex] + offsets
+    a, b, newu = corner_a[corner], corner_b[corner], u[pairindex]
+    # The triangles on the collapsed edge disappear, and the rest must
+    # keep their plane without degenerating
+    remaining = (a != newu) & (b != newu)
+    fan = corner_t[corner][remaining]
+    moved = np.where(triangles[fan] == v[pairindex][remaining, None],
+                     newu[remaining, None], triangles[fan])
+    newnormals, newareas = _normals(vertices, moved)
+    valid = (newareas > minarea) & (np.einsum('ij,ij->i', newnormals, normals[fan]) >= mincos)
+    failures = np.bincount(pairindex[remaining][~valid], minlength=len(pairs))
+    v, u = v[failures == 0], u[failures == 0]
+
+    lengths = np.linalg.norm(vertices[u] - vertices[v], axis=1)
+    order = np.lexsort((u, lengths, v))
+    return v[order], u[order]
+
+def merge_coplanar(vertices, triangles, angle=1.0, passes=30):
+    """
+    Removes the vertices inside flat regions of a mesh, and along straight
+    edges between them, collapsing each of them onto one of its neighbors
+    when every remaining triangle around it stays in its plane (within
+    angle) and none of them degenerates.
+
+    Parameters
+    ----------
+    vertices : numpy array
+        (N, 3) array with the vertices.
+    triangles : numpy array
+        (M, 3) array with the vertex indices of each triangle.
+    angle : float
+        Maximum rotation of the normal of a triangle, in degrees.
+    passes : int
+        Maximum number of passes over the mesh. In each pass, the removed
+        vertices are not neighbors of each other.
+
+    Returns
+    -------
+    vertices, triangles : numpy arrays
+        The simplified mesh.
+    """
+    mincos = math.cos(math.radians(angle))
+    triangles = np.array(triangles, dtype=int)
+    # Vertices whose triangles changed since they were last tried
+    candidates = np.arange(len(vertices))
+    for n in range(passes):
+        normals, areas = _normals(vertices, triangles)
+        minarea = 1e-9*areas.max() if len(areas) else 0
+        v, u = _collapses(vertices, triangles, normals, minarea, mincos, candidates)
+
+        # Collapses of vertices that are not neighbors of each other, the
+        # shortest one of each vertex, in the order of the vertices
+        following = triangles[:, [1, 2, 0]].ravel()
+        neighbors = _edges(len(vertices), np.concatenate([triangles.ravel(), following]),
+                           np.concatenate([following, triangles.ravel()]))[0]
+        ringstarts = np.searchsorted(neighbors[:, 0], np.arange(len(vertices) + 1))
+        first = np.flatnonzero(np.r_[True, v[1:] != v[:-1]]) if len(v) else v
+        locked = np.zeros(len(vertices), dtype=bool)
+        target = np.arange(len(vertices))
+        for vertex, onto in zip(v[first].tolist(), u[first].tolist()):
+            if locked[vertex]:
+                continue
+            locked[neighbors[ringstarts[vertex]:ringstarts[vertex + 1], 1]] = True
+            locked[vertex] = True
+            target[vertex] = onto
+        collapsed = np.flatnonzero(target != np.arange(len(vertices)))
+        if not len(collapsed):
+            break
+
+        # The triangles on the collapsed edges disappear, and the rest
+        # follow their vertices
+        moved = target[triangles]
+        changed = moved != triangles
+        dead = np.any(changed[:, :, None] & (moved[:, :, None] == triangles[:, None, :]), axis=(1, 2))
+        triangles = moved[~dead]
+        candidates = np.flatnonzero(locked)
+    return _clean(vertices, triangles)
+
+def simplify_mesh(vertices, triangles, tolerance=None, angle=1.0):
+    """
+    Simplifies a mesh by vertex clustering (if tolerance is given) and
+    coplanar merging. See cluster_vertices() and merge_coplanar().
+    """
+    if tolerance:
+        vertices, triangles = cluster_vertices(vertices, triangles, tolerance)
+    else:
+        vertices, triangles = _clean(vertices, triangles)
+    if angle is not None:
+        vertices, triangles = merge_coplanar(vertices, triangles, angle)
+    return vertices, triangles
+
+def simplify_mesh_file(sourcefile, destinationfile, tolerance=None, angle=1.0):
+    """
+    Simplifies an STL or OBJ file, and writes the result to another one.
+
+    Parameters
+    ----------
+    sourcefile : str
+        STL or OBJ file to simplify.
+    destinationfile : str
+        File in which the simplified mesh is written, in the STL (binary)
+        or OBJ format, by its extension.
+    tolerance : float
+        Tolerance of the vertex clustering, in the units of the file. No
+        clustering is done if it is None.
+    angle : float
+        Maximum angle between the normals of the triangles merged as
+        coplanar, in degrees. No merging is done if it is None.
+
+    Returns
+    -------
+    report : dict
+        'triangles_before', 'triangles_after', 'vertices_before',
+        'vertices_after', 'read_time', 'simplify_time' and 'write_time'
+        (seconds), and 'file' (the destination file).
+
+    Raises
+    ------
+    ValueError
+        If the file is not an STL or OBJ file.
+    """
+    extension = os.path.splitext(sourcefile)[1].lower()
+    if extension not in ('.stl', '.obj'):
+        raise ValueError("Only STL and OBJ files can be simplified, not {0}".format(sourcefile))
+
+    start = time.time()
+    vertices, triangles = (read_stl if extension == '.stl' else read_obj)(sourcefile)
+    read = time.time()
+    newvertices, newtriangles = simplify_mesh(vertices, triangles, tolerance, angle)
+    simplified = time.time()
+    if os.path.splitext(destinationfile)[1].lower() == '.obj':
+        write_obj(destinationfile, newvertices, newtriangles)
+    else:
+        write_stl(destinationfile, newvertices, newtriangles)
+
+    _last_report.clear()
+    _last_report.update({'triangles_before': len(triangles),
+                         'triangles_after': len(newtriangles),
+                         'vertices_before': len(vertices),
+                         'vertices_after': len(newvertices),
+                         'read_time': read - start,
+                         'simplify_time': simplified - read,
+                         'write_time': time.time() - simplified,
+                         'file': destinationfile})
+    return dict(_last_report)
+
+def get_simplify_report():
+    """
+    Returns the report of the last simplification (see
+    simplify_mesh_file()), also when it was done by import_model().
+    """
+    return dict(_last_report)
@@ -0,0 +1,644 @@
+# -*- coding: utf-8 -*-
+"""
+Client-side mirror of the HFSS 3D modeler.
+
+hycohanz keeps a local table of the objects of each 3D modeler editor,
+updated by its own modeler3d calls: names, primitive type and parameters,
+material, coordinate system and the transforms (move, rotate, mirror,
+scale) and operations (booleans, fillets...) applied to them. Thus, many
+questions about the model can be answered without querying HFSS.
+
+Objects created or modified outside hycohanz (from the GUI, or by an
+operation whose results cannot be predicted, as split()) are recovered by
+reconcile_model(), which compares the table with the HFSS object list.
+
+"""
+
+from __future__ import division, print_function, unicode_literals, absolute_import
+
+import collections
+import re
+
+import hycohanz.conf as conf
+
+def parameters_to_dict(parametersarray):
+    """
+    Converts an HFSS parameters array, as
+    ["NAME:BoxParameters", "XPosition:=", "1mm", ...],
+    into a dictionary, as {'XPosition': '1mm', ...}.
+    """
+    parameters = collections.OrderedDict()
+    for n in range(1, len(parametersarray) - 1):
+        key = parametersarray[n]
+        if isinstance(key, str) and key.endswith(':='):
+            parameters[key[:-2]] = parametersarray[n + 1]
+    return parameters
+
+class ModelObject(object):
+    """
+    Local record of an object of the 3D modeler.
+
+    Parameters
+    ----------
+    name : str
+        The actual name of the object in HFSS.
+    primitive : str
+        Type of primitive the object was created as ('Box', 'Cylinder',
+        'Sphere', 'Rectangle', 'Circle', 'Polyline', 'EquationCurve',
+        'Imported'), or 'Unknown' if the object was not created by hycohanz.
+    parameters : dict
+        Creation parameters of the primitive, as given to HFSS.
+    material : str
+        Name of the material of the object, or None if unknown.
+    coordinate_system : str
+        Name of the coordinate system in which the object was created.
+
+    Attributes
+    ----------
+    transforms : list of tuples
+        Transforms applied to the object after its creation, in order, as
+        ('Move', (x, y, z)), ('Rotate', axis, angle), ('Mirror', base,
+        normal) or ('Scale', (x, y, z)), with the values given to HFSS.
+        The transforms applied while the working coordinate system was not
+        the global one are wrapped as ('CoordinateSystem', name, transform),
+        since HFSS takes their values in that coordinate system.
+    operations : list of tuples
+        Operations that modified the body of the object, in order, as
+        ('Subtract', [ModelObject, ...]), ('Unite', [ModelObject, ...]) or
+        (operation name, arguments) for the rest ('Imprint', 'Fillet',
+        'Split', 'SweepAlongVector'...).
+    history : list of tuples
+        Transforms and operations together, in the order they were applied,
+        as ('Transform', transform) or ('Operation', operation) with the
+        items of transforms and operations.
+    position_ids : dict
+        Face and edge IDs found by position, with the local key of the face
+        or edge (see hycohanz.geometry) as keys. They are only valid for
+        this object and until its body is modified.
+
+    """
+    def __init__(self, name, primitive, parameters=None, material=None,
+                 coordinate_system='Global'):
+        self.name = name
+        self.primitive = primitive
+        self.parameters = parameters if parameters is not None else collections.OrderedDict()
+        self.material = material
+        self.coordinate_system = coordinate_system
+        self.transforms = []
+        self.operations = []
+        self.history = []
+        self.position_ids = dict()
+
+    def __repr__(self):
+        return "ModelObject({0!r}, {1!r})".format(self.name, self.primitive)
+
+    def add_transform(self, transform):
+        """
+        Records a transform applied to the object.
+        """
+        self.transforms.append(transform)
+        self.history.append(('Transform', transform))
+
+    def add_operation(self, operation, consumed):
+        """
+        Records an operation that modified the body of the object.
+        """
+        self.operations.append((operation, consumed))
+        self.history.append(('Operation', (operation, consumed)))
+
+    def copy(self, name):
+        """
+        Returns a copy of the record with another name.
+        """
+        # The copy module is not used because examples/modeler3d/copy.py
+        # would shadow it when running the examples
+        newobject = ModelObject(name, self.primitive, collections.OrderedDict(self.parameters),
+                                self.material, self.coordinate_system)
+        newobject.transforms = list(self.transforms)
+        newobject.operations = list(self.operations)
+        newobject.history = list(self.history)
+        return newobject
+
+class CoordinateSystem(object):
+    """
+    Local record of a coordinate system of the 3D modeler.
+
+    Parameters
+    ----------
+    name : str
+        Name of the coordinate system.
+    kind : str
+        'Relative' or 'Face'.
+    parameters : dict
+        Definition of the coordinate system, as given to HFSS: 'Origin',
+        'XAxis' and 'YAxis' (tuples of expressions) for relative coordinate
+        systems, and 'PartName', 'FaceID', 'EdgeID', 'ZRotationAngle',
+        'XOffset' and 'YOffset' for face coordinate systems.
+    reference : str
+        Name of the coordinate system in which a relative coordinate system
+        is defined.
+
+    """
+    def __init__(self, name, kind, parameters, reference='Global'):
+        self.name = name
+        self.kind = kind
+        self.parameters = parameters
+        self.reference = reference
+
+    def __repr__(self):
+        return "CoordinateSystem({0!r}, {1!r})".format(self.name, self.kind)
+
+class ModelTable(object):
+    """
+    Local table of the objects of a 3D modeler editor.
+
+    Attributes
+    ----------
+    objects : OrderedDict
+        ModelObject of each object, with the object names as keys, in
+        creation order.
+    synced : bool
+        Whether the table is known to contain every object in HFSS. It is
+        False until the table is reconciled, and after any operation whose
+        resulting objects cannot be predicted.
+    clipboard : list of ModelObject
+        Records of the objects copied with copy().
+    topology : dict
+        Face and edge ID lists of the bodies, with the body names as keys and
+        dictionaries {'faces': [...], 'edges': [...]} as values. They are
+        filled by the first get_face_ids() or get_edge_ids() call for each
+        body, and dropped whenever an operation changes the topology of the
+        body (subtract, unite, imprint, split, fillet...).
+    version : int
+        Counter increased on every change of the table, so that the data
+        derived from it (as the spatial index) can be rebuilt when needed.
+    oDesign : pywin32 COMObject
+        The HFSS design of the editor, if known (see set_active_editor()).
+    units : str
+        Model units of the editor, once known (see hycohanz.geometry).
+    reserved : set of str
+        Names given by allocate_name() to objects not created yet, in lower
+        case.
+    coordinate_systems : OrderedDict
+        CoordinateSystem of each coordinate system created with hycohanz,
+        with their names as keys.
+    working_cs : str
+        Name of the working coordinate system, as set by hycohanz.
+
+    """
+    def __init__(self):
+        self.objects = collections.OrderedDict()
+        self.synced = False
+        self.clipboard = []
+        self.topology = dict()
+        self.version = 0
+        self.oDesign = None
+        self.units = None
+        self.reserved = set()
+        self.coordinate_systems = collections.OrderedDict()
+        self.working_cs = 'Global'
+
+    def __contains__(self, name):
+        return name in self.objects
+
+    def __getitem__(self, name):
+        return self.objects[name]
+
+    def touch(self):
+        """
+        Marks the table as changed.
+        """
+        self.version += 1
+
+    def names(self):
+        """
+        Returns the list of object names in the table.
+        """
+        return list(self.objects)
+
+    def add(self, modelobject):
+        """
+        Adds (or replaces) an object record.
+        """
+        self.objects[modelobject.name] = modelobject
+        self.reserved.discard(modelobject.name.lower())
+        self.touch()
+        return modelobject
+
+    def remove(self, names):
+        """
+        Removes the records of the given objects, returning them.
+        """
+        self.touch()
+        self.invalidate_topology(names)
+        return [self.objects.pop(name) for name in names if name in self.objects]
+
+    def invalidate_topology(self, names):
+        """
+        Drops the cached face and edge IDs of the given bodies.
+        """
+        for name in names:
+            self.topology.pop(name, None)
+
+    def rename(self, oldname, newname):
+        """
+        Renames an object record, keeping its position in the table.
+        """
+        if oldname in self.topology:
+            self.topology[newname] = self.topology.pop(oldname)
+        if oldname not in self.objects:
+            return
+        items = [(newname if name == oldname else name, modelobject)
+                 for name, modelobject in self.objects.items()]
+        self.objects = collections.OrderedDict(items)
+        self.objects[newname].name = newname
+        self.touch()
+
+    def get_or_unknown(self, name):
+        """
+        Returns the record of an object, adding an 'Unknown' one if the
+        object is not in the table.
+        """
+        if name not in self.objects:
+            self.add(ModelObject(name, 'Unknown'))
+        return self.objects[name]
+
+    def reconcile(self, hfss_names):
+        """
+        Makes the table consistent with the list of object names in HFSS:
+        records of objects that no longer exist are removed, and missing
+        objects are added as 'Unknown'.
+
+        Returns
+        -------
+        added : list of str
+            Names of the objects added to the table.
+        removed : list of str
+            Names of the objects removed from the table.
+        """
+        hfss_names = [str(name) for name in hfss_names]
+        hfss_set = set(hfss_names)
+        removed = [name for name in self.objects if name not in hfss_set]
+        self.remove(removed)
+        self.invalidate_topology([name for name in self.topology if name not in hfss_set])
+        added = [name for name in hfss_names if name not in self.objects]
+        for name in added:
+            self.add(ModelObject(name, 'Unknown'))
+        self.synced = True
+        return added, removed
+
+    def clear(self):
+        """
+        Forgets all the objects.
+        """
+        self.objects.clear()
+        self.synced = False
+        del self.clipboard[:]
+        self.topology.clear()
+        self.reserved.clear()
+        self.coordinate_systems.clear()
+        self.working_cs = 'Global'
+        self.touch()
+
+    def snapshot(self):
+        """
+        Returns a copy of the state of the table, for restore().
+        """
+        objects = collections.OrderedDict((name, modelobject.copy(name))
+                                          for name, modelobject in self.objects.items())
+        topology = dict((name, dict(ids)) for name, ids in self.topology.items())
+        return (objects, topology, self.synced, list(self.clipboard), set(self.reserved),
+                collections.OrderedDict(self.coordinate_systems), self.working_cs)
+
+    def restore(self, snapshot):
+        """
+        Restores a state of the table returned by snapshot().
+        """
+        (objects, topology, self.synced, clipboard, reserved,
+         coordinate_systems, self.working_cs) = snapshot
+        self.objects = collections.OrderedDict((name, modelobject.copy(name))
+                                               for name, modelobject in objects.items())
+        self.topology = dict((name, dict(ids)) for name, ids in topology.items())
+        self.clipboard[:] = clipboard
+        self.reserved = set(reserved)
+        self.coordinate_systems = collections.OrderedDict(coordinate_systems)
+        self.touch()
+
+    def free_name(self, name, taken=()):
+        """
+        Returns the name HFSS gives to a new object requested with the given
+        name (see allocate_name()), without reserving it. The names in taken
+        (in lower case) are considered taken too.
+        """
+        taken = set(existing.lower() for existing in self.objects) | self.reserved | set(taken)
+        if name.lower() not in taken:
+            return name
+        base, number = _name_regex.match(name).groups()
+        number = int(number) + 1 if number else 1
+        while (base + str(number)).lower() in taken:
+            number += 1
+        return base + str(number)
+
+# Names split into a base and a trailing number, as HFSS numbers them
+_name_regex = re.compile(r'^(.*?)(\d*)$')
+
+# Model tables of each editor
+_model_tables = []
+
+def model_table(oEditor):
+    """
+    Returns the ModelTable of an editor (without the default editor
+    handling, for internal use).
+    """
+    return conf.get_object_store(_model_tables, oEditor, ModelTable)
+
+## Functions used by modeler3d to keep the tables up to date
+
+def record_primitive(oEditor, name, primitive, parametersarray, attributesarray):
+    """
+    Records an object created from its HFSS parameters and attributes arrays.
+    """
+    attributes = parameters_to_dict(attributesarray)
+    material = attributes.get('MaterialValue', attributes.get('MaterialName'))
+    if material is not None:
+        material = material.strip('"')
+    if isinstance(parametersarray, dict):
+        parameters = parametersarray
+    else:
+        parameters = parameters_to_dict(parametersarray)
+    return model_table(oEditor).add(ModelObject(str(name), primitive, parameters, material,
+                                    attributes.get('PartCoordinateSystem', 'Global')))
+
+def _in_working_cs(table, transform):
+    """
+    Returns a transform as applied in the working coordinate system.
+    """
+    if table.working_cs == 'Global':
+        return transform
+    return ('CoordinateSystem', table.working_cs, transform)
+
+def record_transform(oEditor, partlist, transform):
+    """
+    Records a transform applied to the given objects, in the working
+    coordinate system.
+    """
+    table = model_table(oEditor)
+    transform = _in_working_cs(table, transform)
+    for name in partlist:
+        table.get_or_unknown(name).add_transform(transform)
+    table.touch()
+
+def record_operation(oEditor, target, operation, consumed=(), KeepOriginals=False):
+    """
+    Records an operation that modified the body of an object. The consumed
+    objects (e.g. the tools of a subtraction) are removed from the table
+    unless KeepOriginals is True.
+    """
+    table = model_table(oEditor)
+    if KeepOriginals:
+        consumedobjects = [table.get_or_unknown(name).copy(name) for name in consumed]
+    else:
+        consumedobjects = [table.get_or_unknown(name) for name in consumed]
+        table.remove(consumed)
+    targetobject = table.get_or_unknown(target)
+    targetobject.add_operation(operation, consumedobjects)
+    targetobject.position_ids.clear()
+    table.invalidate_topology([target])
+    table.touch()
+
+def record_duplicates(oEditor, partlist, newnames, transform_of_clone):
+    """
+    Records the objects created by a duplicate operation, with the new names
+    returned by HFSS. HFSS names the k-th clone of an original as the
+    original followed by '_k', or by the next free number, so these names
+    are predicted for each original, and the new objects with a predicted
+    name are recorded as a copy of their original with the transform
+    returned by transform_of_clone(k) (k >= 1). The other new objects are
+    recorded with unknown geometry.
+    """
+    table = model_table(oEditor)
+    newnames = [str(newname) for newname in newnames]
+    remaining = set(newname.lower() for newname in newnames)
+    # Original and clone number of each predicted name, in lower case
+    clones = dict()
+    for original in partlist:
+        original = str(original)
+        k = 1
+        while True:
+            predicted = table.free_name(original + '_1', clones).lower()
+            if predicted not in remaining:
+                break
+            clones[predicted] = (original, k)
+            remaining.discard(predicted)
+            k += 1
+
+    for newname in newnames:
+        if newname.lower() not in clones:
+            table.add(ModelObject(newname, 'Unknown'))
+            continue
+        original, k = clones[newname.lower()]
+        newobject = table.get_or_unknown(original).copy(newname)
+        newobject.add_transform(_in_working_cs(table, transform_of_clone(k)))
+        table.add(newobject)
+
+def record_coordinate_system(oEditor, coordinatesystem):
+    """
+    Records a coordinate system created in an editor, which becomes the
+    working coordinate system, as in HFSS.
+    """
+    table = model_table(oEditor)
+    table.coordinate_systems[coordinatesystem.name] = coordinatesystem
+    table.working_cs = coordinatesystem.name
+    table.touch()
+    return coordinatesystem
+
+def record_unknown(oEditor, names=None):
+    """
+    Records objects created by an operation whose geometry is unknown. If
+    the names of the new objects are not known either, the table is marked
+    as not synced.
+    """
+    table = model_table(oEditor)
+    if names is None:
+        table.synced = False
+        return
+    for name in names:
+        table.get_or_unknown(str(name))
+
+def record_design_change(oDesign):
+    """
+    Marks the tables of the editors of a design as not synced, after an
+    operation outside the 3D modeler (e.g. creating an open region or a PML)
+    created or renamed objects of the design. The tables whose design is not
+    known are marked as well, as they may belong to it.
+    """
+    with conf.store_lock:
+        tables = [pair[1] for pair in _model_tables]
+    for table in tables:
+        if table.oDesign is None or table.oDesign == oDesign:
+            table.synced = False
+
+## Public functions
+
+@conf.checkDefaultEditor
+def get_model_table(oEditor):
+    """
+    Returns the local table of the objects of an editor.
+
+    Parameters
+    ----------
+    oEditor : pywin32 COMObject
+        The HFSS editor whose table is returned.
+
+    Returns
+    -------
+    table : hycohanz ModelTable object
+        The local table of the objects of the editor.
+    """
+    return model_table(oEditor)
+
+@conf.checkDefaultEditor
+def reconcile_model(oEditor):
+    """
+    Makes the local table of the objects of an editor consistent with
+    HFSS, which is needed whenever the model is modified from outside
+    hycohanz.
+
+    Parameters
+    ----------
+    oEditor : pywin32 COMObject
+        The HFSS editor in which the operation will be performed.
+
+    Returns
+    -------
+    added : list of str
+        Names of the objects that were not known locally.
+    removed : list of str
+        Names of the local objects that no longer exist in HFSS.
+    """
+    return model_table(oEditor).reconcile(oEditor.GetMatchedObjectName("*"))
+
+@conf.checkDefaultEditor
+def get_object_info(oEditor, name):
+    """
+    Returns the local record of an object, without querying HFSS.
+
+    Parameters
+    ----------
+    oEditor : pywin32 COMObject
+        The HFSS editor in which the object is.
+    name : str
+        Name of the object.
+
+    Returns
+    -------
+    info : hycohanz ModelObject object
+        The local record of the object, with its primitive type, creation
+        parameters, material, coordinate system, transforms and operations.
+
+    Raises
+    ------
+    KeyError
+        If the object is not in the local table.
+    """
+    return model_table(oEditor)[name]
+
+@conf.checkDefaultEditor
+def get_model_object_names(oEditor):
+    """
+    Returns the names of the objects of an editor from its local table.
+    The table is reconciled with HFSS first if it is not known to be
+    complete.
+
+    Parameters
+    ----------
+    oEditor : pywin32 COMObject
+        The HFSS editor in which the objects are.
+
+    Returns
+    -------
+    names : list of str
+        The names of the objects in creation order.
+    """
+    table = model_table(oEditor)
+    if not table.synced:
+        table.reconcile(oEditor.GetMatchedObjectName("*"))
+    return table.names()
+
+@conf.checkDefaultEditor
+def allocate_name(oEditor, name):
+    """
+    Returns a name that no object of the editor has, and reserves it until
+    an object is created with it, so that objects created with the names
+    returned keep them in HFSS.
+
+    The name is the requested one if it is free. Otherwise, it is the name
+    HFSS would assign on collision: the trailing number of the name is
+    increased (or 1 is appended if it has none) until the name is free.
+    Names are compared ignoring case, as in HFSS. The table is reconciled
+    with HFSS first if it is not known to be complete.
+
+    Parameters
+    ----------
+    oEditor : pywin32 COMObject
+        The HFSS editor in which the object will be created.
+    name : str
+        Requested name.
+
+    Returns
+    -------
+    name : str
+        Name that the object will have.
+
+    Example Usage
+    -------------
+    >>> hfss.allocate_name("Box1")
+    'Box3'
+    """
+    table = model_table(oEditor)
+    if not table.synced:
+        table.reconcile(oEditor.GetMatchedObjectName("*"))
+    name = table.free_name(name)
+    table.reserved.add(name.lower())
+    return name
+
+@conf.checkDefaultEditor
+def release_name(oEditor, name):
+    """
+    Releases a name reserved by allocate_name() that will not be used.
+
+    Parameters
+    ----------
+    oEditor : pywin32 COMObject
+        The HFSS editor of the reservation.
+    name : str
+        Name returned by allocate_name().
+    """
+    model_table(oEditor).reserved.discard(name.lower())
+
+@conf.checkDefaultEditor
+def clear_topology_cache(oEditor, partlist=None):
+    """
+    Drops the cached face and edge IDs of the given bodies (or of all the
+    bodies of the editor), so they are requested to HFSS again. It is only
+    needed when the bodies are modified from outside hycohanz.
+
+    Parameters
+    ----------
+    oEditor : pywin32 COMObject
+        The HFSS editor whose cache is cleared.
+    partlist : list of str
+        Names of the bodies whose IDs are dropped. All of them by default.
+
+    Returns
+    -------
+    None
+    """
+    table = model_table(oEditor)
+    if partlist is None:
+        table.topology.clear()
+    else:
+        table.invalidate_topology(partlist)
+        for name in partlist:
+            if name in table:
+                table[name].position_ids.clear()
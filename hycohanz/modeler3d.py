@@ -9,9 +9,20 @@ At last count there were 37 functions implemented out of 93.
 
 from __future__ import division, print_function, unicode_literals, absolute_import
 
+import collections
+import hashlib
+import os
+import re
+import shutil
+import tempfile
 import warnings
 
+import numpy as np
+
 import hycohanz.conf as conf
+import hycohanz.geometry as geometry
+import hycohanz.meshsimplify as meshsimplify
+import hycohanz.model as model
 from hycohanz.expression import Expression as Ex
 
 warnings.simplefilter('default')
@@ -28,17 +39,57 @@ warnings.simplefilter('default')
 # modify it from the executable scripts.
 conductors_list = ['pec', 'copper', 'silver', 'gold', 'aluminum']
 
+# Directory where import_model() keeps the healed models it exports when
+# called with Cache=True (None means the system temporary directory). It must
+# be reachable with the same path from HFSS and from Python.
+import_cache_dir = None
+
+# Content hashes of the imported files, by path, with the size and
+# modification time they were computed for
+_import_hashes = dict()
+
+# Compiled regular expressions of the name filters used so far
+_name_filters = dict()
+
+# Minimum number of positions that get_faces_by_position() and
+# get_edges_by_position() request to HFSS in a single script instead of one
+# call at a time
+position_script_threshold = 8
+
+# Minimum number of objects that create_boxes(), create_cylinders(),
+# create_spheres() and create_rectangles() create in a single script instead
+# of one call at a time
+bulk_script_threshold = 8
+
+def _name_filter_regex(name_filter):
+    """
+    Returns the compiled regular expression of an HFSS name filter, in
+    which '*' matches any text and '?' any single character. Unlike
+    fnmatch, brackets have no special meaning.
+    """
+    if name_filter not in _name_filters:
+        pattern = ''.join('.*' if c == '*' else '.' if c == '?' else re.escape(c)
+                          for c in name_filter)
+        _name_filters[name_filter] = re.compile(pattern + r'\Z', re.IGNORECASE | re.DOTALL)
+    return _name_filters[name_filter]
+
 @conf.checkDefaultEditor
 def get_matched_object_name(oEditor, name_filter="*"):
     """
     Returns a list of objects that match the input filter.
 
+    The names are matched against the local table of the objects of the
+    editor, which is only requested to HFSS when it is not known to be
+    complete (see hycohanz.model). Use reconcile_model() after modifying
+    the model from outside hycohanz.
+
     Parameters
     ----------
     oEditor : pywin32 COMObject
         The HFSS editor in which the operation will be performed.
     name_filter : str
         Wildcard text to search.  Should contain '*' wildcard character for tuples.
+        '*' matches any text and '?' any single character, ignoring case.
 
     Returns
     -------
@@ -46,16 +97,23 @@ def get_matched_object_name(oEditor, name_filter="*"):
         List of object names matched to the filter.
 
     """
+    table = model.model_table(oEditor)
+    if not table.synced:
+        table.reconcile(oEditor.GetMatchedObjectName("*"))
 
-    selections = oEditor.GetMatchedObjectName(name_filter)
-
-    return list(selections)
+    regex = _name_filter_regex(name_filter)
+    return [name for name in table.names() if regex.match(name)]
 
 @conf.checkDefaultEditor
 def get_body_names_by_position(oEditor, x, y, z):
     """
     Returns the names of objects that contact a specified point.
 
+    The query is answered locally (see hycohanz.geometry) when the geometry
+    of every object of the editor is known, and exactly for the objects
+    near the point. If the geometry of any object is unknown, or only
+    bounded near the point, the query is sent to HFSS.
+
     Parameters
     ----------
     oEditor : pywin32 COMObject
@@ -71,6 +129,12 @@ def get_body_names_by_position(oEditor, x, y, z):
     -------
     body_list : list of str
     """
+    point = geometry.evaluate_point(oEditor, x, y, z)
+    if point is not None:
+        body_list = geometry.find_bodies(oEditor, point)
+        if body_list is not None:
+            return body_list
+
     attributesarray = ["NAME:Parameters",
                        "XPosition:=", Ex(x).expr,
                        "YPosition:=", Ex(y).expr,
@@ -112,6 +176,9 @@ def assign_material(oEditor, partlist, MaterialName='vacuum', SolveInside=None):
 
     oEditor.AssignMaterial(selectionsarray, attributesarray)
 
+    for part in partlist:
+        model.model_table(oEditor).get_or_unknown(part).material = MaterialName
+
 @conf.checkDefaultEditor
 def create_rectangle(   oEditor,
                         xs,
@@ -196,7 +263,10 @@ def create_rectangle(   oEditor,
                     "MaterialValue:=", '"'+MaterialName+'"',
                     "SolveInside:=", SolveInside]
 
-    return oEditor.CreateRectangle(RectangleParameters, Attributes)
+    part = oEditor.CreateRectangle(RectangleParameters, Attributes)
+    model.record_primitive(oEditor, part, 'Rectangle', RectangleParameters, Attributes)
+
+    return part
 
 @conf.checkDefaultEditor
 def create_EQbasedcurve(   oEditor,
@@ -214,7 +284,8 @@ def create_EQbasedcurve(   oEditor,
                         PartCoordinateSystem='Global',
                         UDMId='',
                         MaterialName='vacuum',
-                        SolveInside=None):
+                        SolveInside=None,
+                        Tolerance=None):
     """
     Draw an equation based curve.
 
@@ -247,6 +318,12 @@ def create_EQbasedcurve(   oEditor,
     SolveInside : bool
         Whether to mesh the interior of the object and solve for the fields
         inside.
+    Tolerance : float, str or hycohanz Expression object
+        If given, the curve is evaluated locally and numpoints is replaced
+        by the minimum number of points whose polyline deviates from the
+        curve less than Tolerance (a length, in model units if it has no
+        units). numpoints is then the maximum number of points, or 0 for no
+        maximum. See curve_point_count() in hycohanz.geometry.
 
     Returns
     -------
@@ -260,6 +337,11 @@ def create_EQbasedcurve(   oEditor,
         else:
             SolveInside = True
 
+    if Tolerance is not None:
+        numpoints = str(geometry.curve_point_count(oEditor, xt, yt, zt, tstart, tend,
+                                                   geometry.evaluate_length(oEditor, Tolerance),
+                                                   maxpoints=int(numpoints)))
+
     EquationCurveParameters = [ "NAME:EquationBasedCurveParameters",
                             "XtFunction:=", xt,
                             "YtFunction:=", yt,
@@ -279,7 +361,10 @@ def create_EQbasedcurve(   oEditor,
                     "MaterialValue:=", '"'+MaterialName+'"',
                     "SolveInside:=", SolveInside]
 
-    return oEditor.CreateEquationCurve(EquationCurveParameters, Attributes)
+    part = oEditor.CreateEquationCurve(EquationCurveParameters, Attributes)
+    model.record_primitive(oEditor, part, 'EquationCurve', EquationCurveParameters, Attributes)
+
+    return part
 
 @conf.checkDefaultEditor
 def create_circle(oEditor, xc, yc, zc, radius,
@@ -355,7 +440,10 @@ def create_circle(oEditor, xc, yc, zc, radius,
                        "MaterialValue:=", '"'+MaterialName+'"',
                        "Solveinside:=", SolveInside]
 
-    return oEditor.CreateCircle(circleparams, attributesarray)
+    part = oEditor.CreateCircle(circleparams, attributesarray)
+    model.record_primitive(oEditor, part, 'Circle', circleparams, attributesarray)
+
+    return part
 
 @conf.checkDefaultEditor
 def create_cylinder(oEditor, xc, yc, zc, radius, height,
@@ -439,7 +527,10 @@ def create_cylinder(oEditor, xc, yc, zc, radius, height,
                        "UseMaterialAppearance:=", False,
                        "IsLightweight:=", False]
 
-    return oEditor.CreateCylinder(cylinderparams, attributesarray)
+    part = oEditor.CreateCylinder(cylinderparams, attributesarray)
+    model.record_primitive(oEditor, part, 'Cylinder', cylinderparams, attributesarray)
+
+    return part
 
 @conf.checkDefaultEditor
 def create_sphere(oEditor, x, y, z, radius,
@@ -514,6 +605,7 @@ def create_sphere(oEditor, x, y, z, radius,
                        "SolveInside:=", SolveInside]
 
     part = oEditor.CreateSphere(sphereparametersarray, attributesarray)
+    model.record_primitive(oEditor, part, 'Sphere', sphereparametersarray, attributesarray)
 
     return part
 
@@ -601,7 +693,351 @@ def create_box( oEditor,
                     "MaterialValue:=", '"'+MaterialName+'"',
                     "SolveInside:=", SolveInside]
 
-    return oEditor.CreateBox(BoxParameters, Attributes)
+    part = oEditor.CreateBox(BoxParameters, Attributes)
+    model.record_primitive(oEditor, part, 'Box', BoxParameters, Attributes)
+
+    return part
+
+def _format_values(values, shape):
+    """
+    Returns the HFSS string representations of an array of values
+    broadcast to the given shape, as nested lists. Numeric arrays are
+    formatted in a single vectorized pass.
+    """
+    array = np.asarray(values)
+    if array.dtype.kind in 'iuf':
+        return np.broadcast_to(array, shape).astype(str).tolist()
+    array = np.broadcast_to(np.asarray(values, dtype=object), shape)
+    return np.frompyfunc(lambda value: Ex(value).expr, 1, 1)(array).tolist()
+
+def _bulk_names(names, count):
+    """
+    Returns the list of requested names of a bulk creation: names itself
+    if it is a list, or names followed by the object index if it is a prefix.
+    """
+    if isinstance(names, str):
+        return [names + str(n + 1) for n in range(count)]
+    if len(names) != count:
+        raise ValueError("{0} names were given for {1} objects".format(len(names), count))
+    return list(names)
+
+def _bulk_attributes(names, materials, Flags, Color, Transparency,
+                     PartCoordinateSystem, UDMId, SolveInside):
+    """
+    Returns the attributes arrays of a bulk creation, one per object.
+    """
+    count = len(names)
+    if isinstance(materials, str):
+        materials = [materials]*count
+
+    color = "({r} {g} {b})".format(r=Color[0], g=Color[1], b=Color[2])
+    attributesarrays = []
+    for n in range(count):
+        solveinside = SolveInside
+        if solveinside == None:
+            solveinside = materials[n] not in conductors_list
+        attributesarrays.append(["NAME:Attributes",
+                                 "Name:=", names[n],
+                                 "Flags:=", Flags,
+                                 "Color:=", color,
+                                 "Transparency:=", Transparency,
+                                 "PartCoordinateSystem:=", PartCoordinateSystem,
+                                 "UDMId:=", UDMId,
+                                 "MaterialValue:=", '"'+materials[n]+'"',
+                                 "SolveInside:=", solveinside])
+    return attributesarrays
+
+@conf.checkDefaultEditor
+def create_boxes(oEditor,
+                 positions,
+                 sizes,
+                 names='Box',
+                 materials='vacuum',
+                 Flags='',
+                 Color=(132, 132, 193),
+                 Transparency=0,
+                 PartCoordinateSystem='Global',
+                 UDMId='',
+                 SolveInside=None,
+                 oDesktop=None):
+    """
+    Draw several 3D boxes at once.
+
+    The parameters of all the boxes are formatted in a single vectorized
+    pass, and from bulk_script_threshold boxes on, all the CreateBox()
+    calls are made by a single oDesktop.RunScript() call, which avoids a
+    COM round trip per box. Fewer boxes, or boxes whose design or project is
+    unknown, are created one call at a time.
+
+    Parameters
+    ----------
+    oEditor : pywin32 COMObject
+        The HFSS editor in which the operation will be performed.
+    positions : array_like of shape (N, 3)
+        The x, y, and z coordinates of the base point of each box. It can
+        have numeric, str or hycohanz Expression elements.
+    sizes : array_like of shape (N, 3) or (3,)
+        x-, y-, and z-dimensions of each box, or of all of them.
+    names : str or list of str
+        The requested names of the objects, or a prefix to which the index
+        of each object (starting at 1) is appended.
+    materials : str or list of str
+        Name of the material to assign to all the objects, or to each of them.
+    Flags, Color, Transparency, PartCoordinateSystem, UDMId, SolveInside :
+        Common attributes of all the objects. See create_box().
+    oDesktop : pywin32 COMObject
+        The HFSS desktop that runs the creation script. The current global
+        desktop by default.
+
+    Returns
+    -------
+    list of str
+        The actual names of the created objects.
+
+    Example Usage
+    -------------
+    >>> import numpy as np
+    >>> xy = np.mgrid[0:10, 0:10].reshape(2, -1).T*2.0
+    >>> vias = hfss.create_boxes(np.c_[xy, np.zeros(len(xy))], [0.5, 0.5, 1.6],
+    ...                          names='Via', materials='copper')
+    """
+    count = len(positions)
+    positions = _format_values(positions, (count, 3))
+    sizes = _format_values(sizes, (count, 3))
+    names = _bulk_names(names, count)
+    attributesarrays = _bulk_attributes(names, materials, Flags, Color, Transparency,
+                                        PartCoordinateSystem, UDMId, SolveInside)
+
+    parametersarrays = [[ "NAME:BoxParameters",
+                          "XPosition:=", positions[n][0],
+                          "YPosition:=", positions[n][1],
+                          "ZPosition:=", positions[n][2],
+                          "XSize:=", sizes[n][0],
+                          "YSize:=", sizes[n][1],
+                          "ZSize:=", sizes[n][2]] for n in range(count)]
+
+    return _create_primitives(oEditor, oDesktop, 'CreateBox', 'Box',
+                              parametersarrays, attributesarrays)
+
+@conf.checkDefaultEditor
+def create_cylinders(oEditor,
+                     centers,
+                     radii,
+                     heights,
+                     WhichAxis='Z',
+                     NumSides=0,
+                     names='Cylinder',
+                     materials='vacuum',
+                     Flags='',
+                     Color=(132, 132, 193),
+                     Transparency=0,
+                     PartCoordinateSystem='Global',
+                     UDMId='',
+                     SolveInside=None,
+                     oDesktop=None):
+    """
+    Draw several cylinders at once, in a single script run like create_boxes().
+
+    Parameters
+    ----------
+    oEditor : pywin32 COMObject
+        The HFSS editor in which the operation will be performed.
+    centers : array_like of shape (N, 3)
+        The x, y, and z coordinates of the bottom center of each cylinder.
+    radii : array_like of shape (N,) or scalar
+        The radius of each cylinder, or of all of them.
+    heights : array_like of shape (N,) or scalar
+        The height of each cylinder, or of all of them.
+    WhichAxis : str
+        The axis normal to all the cylinders.  Can be 'X', 'Y', or 'Z'.
+    NumSides : int
+        If 0, the cylinders are not segmented.  Otherwise, they are
+        segmented into NumSides sides.
+    names, materials, Flags, Color, Transparency, PartCoordinateSystem, UDMId, SolveInside, oDesktop :
+        See create_boxes().
+
+    Returns
+    -------
+    list of str
+        The actual names of the created objects.
+    """
+    count = len(centers)
+    centers = _format_values(centers, (count, 3))
+    radii = _format_values(radii, (count,))
+    heights = _format_values(heights, (count,))
+    names = _bulk_names(names, count)
+    attributesarrays = _bulk_attributes(names, materials, Flags, Color, Transparency,
+                                        PartCoordinateSystem, UDMId, SolveInside)
+
+    parametersarrays = [["NAME:CylinderParameters",
+                         "XCenter:=", centers[n][0],
+                         "YCenter:=", centers[n][1],
+                         "ZCenter:=", centers[n][2],
+                         "Radius:=", radii[n],
+                         "Height:=", heights[n],
+                         "WhichAxis:=", WhichAxis,
+                         "NumSides:=", str(NumSides)] for n in range(count)]
+
+    return _create_primitives(oEditor, oDesktop, 'CreateCylinder', 'Cylinder',
+                              parametersarrays, attributesarrays)
+
+@conf.checkDefaultEditor
+def create_spheres(oEditor,
+                   centers,
+                   radii,
+                   names='Sphere',
+                   materials='vacuum',
+                   Flags='',
+                   Color=(132, 132, 193),
+                   Transparency=0,
+                   PartCoordinateSystem='Global',
+                   UDMId='',
+                   SolveInside=None,
+                   oDesktop=None):
+    """
+    Draw several spheres at once, in a single script run like create_boxes().
+
+    Parameters
+    ----------
+    oEditor : pywin32 COMObject
+        The HFSS editor in which the operation will be performed.
+    centers : array_like of shape (N, 3)
+        The x, y, and z coordinates of the center of each sphere.
+    radii : array_like of shape (N,) or scalar
+        The radius of each sphere, or of all of them.
+    names, materials, Flags, Color, Transparency, PartCoordinateSystem, UDMId, SolveInside, oDesktop :
+        See create_boxes().
+
+    Returns
+    -------
+    list of str
+        The actual names of the created objects.
+    """
+    count = len(centers)
+    centers = _format_values(centers, (count, 3))
+    radii = _format_values(radii, (count,))
+    names = _bulk_names(names, count)
+    attributesarrays = _bulk_attributes(names, materials, Flags, Color, Transparency,
+                                        PartCoordinateSystem, UDMId, SolveInside)
+
+    parametersarrays = [["NAME:SphereParameters",
+                         "XCenter:=", centers[n][0],
+                         "YCenter:=", centers[n][1],
+                         "ZCenter:=", centers[n][2],
+                         "Radius:=", radii[n]] for n in range(count)]
+
+    return _create_primitives(oEditor, oDesktop, 'CreateSphere', 'Sphere',
+                              parametersarrays, attributesarrays)
+
+@conf.checkDefaultEditor
+def create_rectangles(oEditor,
+                      positions,
+                      widths,
+                      heights,
+                      WhichAxis='Z',
+                      IsCovered=True,
+                      names='Rectangle',
+                      materials='vacuum',
+                      Flags='',
+                      Color=(132, 132, 193),
+                      Transparency=0,
+                      PartCoordinateSystem='Global',
+                      UDMId='',
+                      SolveInside=None,
+                      oDesktop=None):
+    """
+    Draw several rectangles at once, in a single script run like create_boxes().
+
+    Parameters
+    ----------
+    oEditor : pywin32 COMObject
+        The HFSS editor in which the operation will be performed.
+    positions : array_like of shape (N, 3)
+        The x, y, and z coordinates of the start of each rectangle.
+    widths : array_like of shape (N,) or scalar
+        The first dimension of each rectangle, or of all of them.
+    heights : array_like of shape (N,) or scalar
+        The second dimension of each rectangle, or of all of them.
+    WhichAxis : str
+        The axis normal to all the rectangles.  Can be 'X', 'Y', or 'Z'.
+    IsCovered : bool
+        Whether the rectangles have a surface or have only edges.
+    names, materials, Flags, Color, Transparency, PartCoordinateSystem, UDMId, SolveInside, oDesktop :
+        See create_boxes().
+
+    Returns
+    -------
+    list of str
+        The actual names of the created objects.
+    """
+    count = len(positions)
+    positions = _format_values(positions, (count, 3))
+    widths = _format_values(widths, (count,))
+    heights = _format_values(heights, (count,))
+    names = _bulk_names(names, count)
+    attributesarrays = _bulk_attributes(names, materials, Flags, Color, Transparency,
+                                        PartCoordinateSystem, UDMId, SolveInside)
+
+    parametersarrays = [[ "NAME:RectangleParameters",
+                          "IsCovered:=", IsCovered,
+                          "XStart:=", positions[n][0],
+                          "YStart:=", positions[n][1],
+                          "ZStart:=", positions[n][2],
+                          "Width:=", widths[n],
+                          "Height:=", heights[n],
+                          "WhichAxis:=", WhichAxis] for n in range(count)]
+
+    return _create_primitives(oEditor, oDesktop, 'CreateRectangle', 'Rectangle',
+                              parametersarrays, attributesarrays)
+
+def _polyline_points(x, y, z):
+    """
+    Returns the PolylinePoints array of a polyline, and its points as
+    recorded in the model table: an (N, 3) array in meters for numeric
+    coordinates, or a list of (x, y, z) expression tuples otherwise.
+    """
+    arrays = [np.asarray(c) for c in (x, y, z)]
+    if all(array.dtype.kind in 'iuf' for array in arrays):
+        # Numeric coordinates are in meters. Converting the arrays to Python
+        # numbers at once and formatting them with map() is faster than
+        # NumPy's own string conversion, and gives the same strings as str().
+        coordinates = [[value + "meter" for value in map(str, array.tolist())]
+                       for array in arrays]
+        polylinepoints = ["NAME:PolylinePoints"]
+        polylinepoints.extend([[["NAME:PLPoint", "X:=", xpt, "Y:=", ypt, "Z:=", zpt]]
+                               for xpt, ypt, zpt in zip(*coordinates)])
+        return polylinepoints, np.column_stack(arrays).astype(float)
+
+    polylinepoints = ["NAME:PolylinePoints"]
+    points = []
+    for n in range(0, len(x)):
+        if isinstance(x[n], (str, Ex)):
+            xpt = Ex(x[n]).expr
+        elif isinstance(x[n], (float, int)):
+            xpt = str(x[n]) + "meter"
+        else:
+            raise TypeError('x must be of type str, int, float, or Ex')
+
+        if isinstance(y[n], (str, Ex)):
+            ypt = Ex(y[n]).expr
+        elif isinstance(y[n], (float, int)):
+            ypt = str(y[n]) + "meter"
+        else:
+            raise TypeError('y must be of type str, int, float, or Ex')
+
+        if isinstance(z[n], (str, Ex)):
+            zpt = Ex(z[n]).expr
+        elif isinstance(z[n], (float, int)):
+            zpt = str(z[n]) + "meter"
+        else:
+            raise TypeError('z must be of type str, int, float, or Ex')
+
+        polylinepoints.append([["NAME:PLPoint",
+                        "X:=", xpt,
+                        "Y:=", ypt,
+                        "Z:=", zpt]])
+        points.append((xpt, ypt, zpt))
+    return polylinepoints, points
 
 @conf.checkDefaultEditor
 def create_polyline(oEditor, x, y, z, Name="Polyline1",
@@ -622,7 +1058,9 @@ def create_polyline(oEditor, x, y, z, Name="Polyline1",
                                 XSectionOrient="Auto",
                                 XSectionType="None",
                                 SegmentType="Line",
-                                NoOfPoints=2):
+                                NoOfPoints=2,
+                                MaxPoints=None,
+                                Tolerance=None):
     """
     Draw a polyline.
 
@@ -656,6 +1094,15 @@ def create_polyline(oEditor, x, y, z, Name="Polyline1",
         Whether the polyline is covered.
     IsPolylineClosed : bool
         Whether the polyline should be considered closed.
+    MaxPoints : int
+        If given, polylines with more points are drawn as several polylines
+        of at most MaxPoints points, which are then united into a single
+        object. Not allowed for closed polylines. It must be at least 2.
+    Tolerance : float
+        If given, the vertices are reduced with the Ramer-Douglas-Peucker
+        algorithm, so that no removed vertex is farther than Tolerance
+        (in meters, as the coordinates) from the drawn polyline. Only for
+        numeric coordinates.
     TODO:  finish documentation of this function.
 
     Returns
@@ -664,7 +1111,10 @@ def create_polyline(oEditor, x, y, z, Name="Polyline1",
         Actual name of the polyline
 
 
-    x, y, and z are lists with numeric or string elements.
+    x, y, and z are lists with numeric or string elements. If all of them
+    are numeric (as NumPy arrays), the points are formatted in a single
+    pass without per-coordinate type checks, which is much faster for large
+    point sets.
 
     Example Usage
     -------------
@@ -675,53 +1125,51 @@ def create_polyline(oEditor, x, y, z, Name="Polyline1",
     >>> oEditor = hfss.set_active_editor(oDesign, "3D Modeler")
     >>> tri = hfss.create_polyline(oEditor, [0, 1, 0], [0, 0, 1], [0, 0, 0])
     """
+    if MaxPoints is not None and MaxPoints < 2:
+        raise ValueError("MaxPoints must be at least 2, not {0}".format(MaxPoints))
+
     if SolveInside == None:
         if MaterialName in conductors_list:
             SolveInside = False
         else:
             SolveInside = True
 
-    Npts = len(x)
-    polylinepoints = ["NAME:PolylinePoints"]
-
-    for n in range(0, Npts):
-        if isinstance(x[n], (str, Ex)):
-            xpt = Ex(x[n]).expr
-        elif isinstance(x[n], (float, int)):
-            xpt = str(x[n]) + "meter"
-        else:
-            raise TypeError('x must be of type str, int, float, or Ex')
+    if Tolerance is not None:
+        arrays = [np.asarray(c) for c in (x, y, z)]
+        if not all(array.dtype.kind in 'iuf' for array in arrays):
+            raise ValueError("Tolerance requires numeric coordinates")
+        keep = geometry.simplify_polyline(np.column_stack(arrays), Tolerance)
+        x, y, z = [array[keep] for array in arrays]
 
-        if isinstance(y[n], (str, Ex)):
-            ypt = Ex(y[n]).expr
-        elif isinstance(y[n], (float, int)):
-            ypt = str(y[n]) + "meter"
-        else:
-            raise TypeError('y must be of type str, int, float, or Ex')
-
-        if isinstance(z[n], (str, Ex)):
-            zpt = Ex(z[n]).expr
-        elif isinstance(z[n], (float, int)):
-            zpt = str(z[n]) + "meter"
-        else:
-            raise TypeError('z must be of type str, int, float, or Ex')
-
-        polylinepoints.append([["NAME:PLPoint",
-                        "X:=", xpt,
-                        "Y:=", ypt,
-                        "Z:=", zpt]])
+    Npts = len(x)
+    if MaxPoints is not None and Npts > MaxPoints:
+        if IsPolylineClosed:
+            raise ValueError("Closed polylines cannot be split into chunks")
+        # Consecutive chunks share their end points, and are united at the end
+        partlist = []
+        for start in range(0, Npts - 1, MaxPoints - 1):
+            stop = min(start + MaxPoints, Npts)
+            partlist.append(create_polyline(oEditor, x[start:stop], y[start:stop], z[start:stop],
+                Name=Name if start == 0 else "{0}_{1}".format(Name, len(partlist)),
+                Flags=Flags, Color=Color, Transparency=Transparency,
+                PartCoordinateSystem=PartCoordinateSystem, UDMId=UDMId,
+                MaterialName=MaterialName, SolveInside=SolveInside,
+                IsPolylineCovered=IsPolylineCovered, IsPolylineClosed=False,
+                SegmentType=SegmentType, NoOfPoints=NoOfPoints))
+        return unite(oEditor, partlist)
+
+    polylinepoints, points = _polyline_points(x, y, z)
 
-    polylinesegments = ["NAME:PolylineSegments"]
     if IsPolylineClosed == True:
         Nsegs = Npts - 1
     else:
         Nsegs = Npts - 1
 
-    for n in range(0, Nsegs):
-        polylinesegments.append(["NAME:PLSegment",
-                                 "SegmentType:=", SegmentType,
-                                 "StartIndex:=", n,
-                                 "NoOfPoints:=", NoOfPoints])
+    polylinesegments = ["NAME:PolylineSegments"]
+    polylinesegments.extend([["NAME:PLSegment",
+                              "SegmentType:=", SegmentType,
+                              "StartIndex:=", n,
+                              "NoOfPoints:=", NoOfPoints] for n in range(0, Nsegs)])
 
     polylinexsection = ["NAME:PolylineXSection",
                         "XSectionType:=", XSectionType,
@@ -750,6 +1198,11 @@ def create_polyline(oEditor, x, y, z, Name="Polyline1",
                        "SolveInside:=",  SolveInside]
 
     polyname = oEditor.CreatePolyline(polylineparams, polylineattribs)
+    model.record_primitive(oEditor, polyname, 'Polyline',
+                           {'Points': points,
+                            'IsPolylineClosed': IsPolylineClosed,
+                            'IsPolylineCovered': IsPolylineCovered},
+                           polylineattribs)
 
     return polyname
 
@@ -802,6 +1255,7 @@ def move(oEditor, partlist, x, y, z, NewPartsModelFlag="Model"):
                            "TranslateVectorZ:=", str(Ex(z).expr)]
 
     oEditor.Move(selectionsarray, moveparametersarray)
+    model.record_transform(oEditor, partlist, ('Move', tuple(moveparametersarray[2::2])))
 
 @conf.checkDefaultEditor
 def get_object_name(oEditor, index):
@@ -815,7 +1269,8 @@ def get_object_name(oEditor, index):
 @conf.checkDefaultEditor
 def copy(oEditor, partlist):
     """
-    Copy specified parts to the clipboard.
+    Copy specified parts to the clipboard. See also clone(), which makes
+    copies without the clipboard.
 
     Parameters
     ----------
@@ -834,6 +1289,9 @@ def copy(oEditor, partlist):
 
     oEditor.Copy(selectionsarray)
 
+    table = model.model_table(oEditor)
+    table.clipboard = [table.get_or_unknown(part).copy(part) for part in partlist]
+
 @conf.checkDefaultEditor
 def get_object_id_by_name(oEditor, objname):
     """
@@ -859,6 +1317,15 @@ def paste(oEditor):
         List of parts that are pasted
     """
     pastelist = oEditor.Paste()
+
+    # Pasted objects are matched with the copied ones in order
+    table = model.model_table(oEditor)
+    if len(table.clipboard) == len(pastelist):
+        for part, copied in zip(pastelist, table.clipboard):
+            table.add(copied.copy(str(part)))
+    else:
+        model.record_unknown(oEditor, pastelist)
+
     return pastelist
 
 @conf.checkDefaultEditor
@@ -875,7 +1342,13 @@ def imprint(oEditor, blanklist, toollist, KeepOriginals=False):
     imprintparams = ["NAME:ImprintParameters",
                      "KeepOriginals:=", KeepOriginals]
 
-    return oEditor.Imprint(imprintselectionsarray, imprintparams)
+    result = oEditor.Imprint(imprintselectionsarray, imprintparams)
+    for blank in blanklist:
+        model.record_operation(oEditor, blank, 'Imprint', toollist, KeepOriginals=True)
+    if not KeepOriginals:
+        model.model_table(oEditor).remove(toollist)
+
+    return result
 
 @conf.checkDefaultEditor
 def duplicate_along_line(oEditor, partlist, x, y, z, clonesNumber,
@@ -927,9 +1400,62 @@ def duplicate_along_line(oEditor, partlist, x, y, z, clonesNumber,
         [
             "CreateGroupsForNewObjects:=", CreateGroupsForNewObjectsFlag
         ])
+    model.record_duplicates(oEditor, partlist, objectName,
+        lambda k: ('Move', tuple('({0})*{1}'.format(Ex(c).expr, k) for c in (x, y, z))))
 
     return partlist + list(objectName)
 
+def _is_zero_offset(oEditor, offset):
+    """
+    Returns whether an offset is known to be zero.
+    """
+    vector = geometry.evaluate_point(oEditor, *offset)
+    return vector is not None and not np.any(vector)
+
+@conf.checkDefaultEditor
+def clone(oEditor, partlist, offset=(0, 0, 0), DuplicateAssignments=False):
+    """
+    Make a copy of the specified parts, optionally translated, with a
+    single duplicate operation.
+
+    Unlike copy() and paste(), it does not go through the clipboard, which
+    is shared by all the HFSS desktops and scripts of the computer, and the
+    new names are returned by the same call.
+
+    Parameters
+    ----------
+    oEditor : pywin32 COMObject
+        The HFSS editor in which the operation will be performed.
+    partlist : list of str
+        The parts to clone.
+    offset : list of float, str or hycohanz Expression object
+        Translation of the copies. With a zero offset, the copies are
+        duplicated at one model unit and moved back, as HFSS does not
+        duplicate along a zero vector.
+    DuplicateAssignments : bool
+        Whether the boundaries and excitations of the parts are also
+        duplicated.
+
+    Returns
+    -------
+    clonelist : list of str
+        Names of the copies, in the order given by HFSS.
+
+    Example Usage
+    -------------
+    >>> hfss.clone(["Patch", "Feed"], ["10mm", 0, 0])
+    ['Patch_1', 'Feed_1']
+    """
+    zero = _is_zero_offset(oEditor, offset)
+    vector = (1, 0, 0) if zero else offset
+    clonelist = duplicate_along_line(oEditor, partlist, *vector, clonesNumber=2,
+                                     DuplicateAssignments=DuplicateAssignments)[len(partlist):]
+    clonelist = [str(part) for part in clonelist]
+    if zero:
+        move(oEditor, clonelist, -1, 0, 0)
+
+    return clonelist
+
 @conf.checkDefaultEditor
 def duplicate_around_axis(oEditor, partlist, angle, clonesNumber, axis="Z",
                         CreateNewObjectsFlag=False,
@@ -977,6 +1503,8 @@ def duplicate_around_axis(oEditor, partlist, angle, clonesNumber, axis="Z",
         [
             "CreateGroupsForNewObjects:=", CreateGroupsForNewObjectsFlag
         ])
+    model.record_duplicates(oEditor, partlist, objectName,
+        lambda k: ('Rotate', axis, '({0})*{1}'.format(Ex(angle).expr, k)))
 
     return partlist + list(objectName)
 
@@ -1024,6 +1552,8 @@ def duplicate_mirror(oEditor, partlist, base, normal,
         [
             "CreateGroupsForNewObjects:=", CreateGroupsForNewObjectsFlag
         ])
+    model.record_duplicates(oEditor, partlist, objectName,
+        lambda k: ('Mirror', tuple(mirrorparamsarray[2:8:2]), tuple(mirrorparamsarray[8::2])))
 
     return partlist + list(objectName)
 
@@ -1061,6 +1591,8 @@ def mirror(oEditor, partlist, base, normal):
                          "MirrorNormalZ:=", Ex(normal[2]).expr]
 
     oEditor.Mirror(selectionsarray, mirrorparamsarray)
+    model.record_transform(oEditor, partlist, ('Mirror', tuple(mirrorparamsarray[2:8:2]),
+                                               tuple(mirrorparamsarray[8::2])))
 
     return get_selections(oEditor)
 
@@ -1101,6 +1633,8 @@ def sweep_along_vector(oEditor, obj_name_list, x, y, z):
                               "SweepVectorX:=", Ex(x).expr,
                               "SweepVectorY:=", Ex(y).expr,
                               "SweepVectorZ:=", Ex(z).expr])
+    for part in obj_name_list:
+        model.record_operation(oEditor, part, 'SweepAlongVector')
 
     return get_selections(oEditor)
 
@@ -1133,6 +1667,7 @@ def rotate(oEditor, partlist, axis, angle):
                              "RotateAngle:=", Ex(angle).expr]
 
     oEditor.Rotate(selectionsarray, rotateparametersarray)
+    model.record_transform(oEditor, partlist, ('Rotate', axis, Ex(angle).expr))
 
 @conf.checkDefaultEditor
 def subtract(oEditor, blanklist, toollist, KeepOriginals=False):
@@ -1171,6 +1706,10 @@ def subtract(oEditor, blanklist, toollist, KeepOriginals=False):
                                "KeepOriginals:=", KeepOriginals]
 
     oEditor.Subtract(subtractselectionsarray, subtractparametersarray)
+    for blank in blanklist:
+        model.record_operation(oEditor, blank, 'Subtract', toollist, KeepOriginals=True)
+    if not KeepOriginals:
+        model.model_table(oEditor).remove(toollist)
 
     return blanklist[0]
 
@@ -1213,6 +1752,7 @@ def unite(oEditor, partlist, KeepOriginals=False):
     uniteparametersarray = ["NAME:UniteParameters", "KeepOriginals:=", KeepOriginals]
 
     oEditor.Unite(selectionsarray, uniteparametersarray)
+    model.record_operation(oEditor, partlist[0], 'Unite', partlist[1:], KeepOriginals)
 
     return partlist[0]
 
@@ -1249,6 +1789,7 @@ def scale(oEditor, partlist, x, y, z):
                             "ScaleZ:=", str(z)]
 
     oEditor.Scale(selectionsarray, scaleparametersarray)
+    model.record_transform(oEditor, partlist, ('Scale', (str(x), str(y), str(z))))
 
 @conf.checkDefaultEditor
 def get_object_name_by_faceid(oEditor, faceid):
@@ -1268,6 +1809,11 @@ def get_object_name_by_faceid(oEditor, faceid):
         The name of the object.
 
     """
+    # Face IDs are unique in the editor, so any cached face list will do
+    for name, topology in model.model_table(oEditor).topology.items():
+        if faceid in topology.get('faces', ()):
+            return name
+
     return oEditor.GetObjectNameByFaceID(faceid)
 
 @conf.checkDefaultEditor
@@ -1278,7 +1824,12 @@ def import_model(oEditor,
                  Options='-1',
                  FileType='UnRecognized',
                  MaxStitchTol=-1,
-                 ImportFreeSurfaces=False):
+                 ImportFreeSurfaces=False,
+                 Cache=False,
+                 CacheDir=None,
+                 Simplify=False,
+                 SimplifyTolerance=None,
+                 SimplifyAngle=1.0):
     """
     Import a 3D model from a file.
 
@@ -1288,10 +1839,30 @@ def import_model(oEditor,
         The HFSS editor in which the operation will be performed.
     sourcefile : str
         Name of the 3D model file.
+    Cache : bool
+        Whether to use the import cache. The first time a file is imported,
+        the imported (healed) bodies are exported to a SAT file in the cache
+        directory, named after a hash of the content of the file and of the
+        import options. Later imports of the same content (also under a
+        different path, or in another design) import that SAT file without
+        healing instead of translating and healing the source file again.
+    CacheDir : str
+        Directory of the import cache. By default, import_cache_dir, or the
+        system temporary directory if it is None.
+    Simplify : bool
+        Whether to simplify an STL or OBJ file locally before importing it
+        (see hycohanz.meshsimplify). The triangle counts and times are
+        given by get_simplify_report().
+    SimplifyTolerance : float
+        Distance under which vertices are merged, in the units of the file.
+        None to only merge coplanar triangles.
+    SimplifyAngle : float
+        Maximum angle between triangles merged as coplanar, in degrees.
 
     Returns
     -------
-    None
+    partlist : list of str
+        Names of the imported objects.
 
     Notes
     -----
@@ -1300,8 +1871,11 @@ def import_model(oEditor,
       equivalents are not documented in the HFSS Scripting Guide.
     - There is no documented way to request a particular name for the created
       object.
-    - There is no documented way to obtain the name assigned to the created
-      object.
+    - The names of the created objects are taken from the selection after the
+      import.
+    - The objects imported from the cache are named after the bodies of the
+      SAT file, which are normally the names of the objects it was exported
+      from.
 
     Examples
     --------
@@ -1313,8 +1887,47 @@ def import_model(oEditor,
     >>> hfss.import_model(oEditor, "Z:\shared\Parts\MachinescrewCap4-40_375mil\91251A108.SAT")
     >>> hfss.import_model(oEditor, "Z:\shared\Parts\MachinescrewCap4-40_375mil\91251A108.IGS")
     >>> hfss.import_model(oEditor, "Z:\shared\Parts\MachinescrewCap4-40_375mil\91251A108.STEP")
+    >>> hfss.import_model(oEditor, "Z:\shared\Parts\Enclosure.STEP", Cache=True)
+    >>> hfss.import_model(oEditor, "Z:\shared\Scans\Horn.stl", Simplify=True, SimplifyTolerance=0.01)
+
+    """
+    options = [HealOption, CheckModel, Options, FileType, MaxStitchTol, ImportFreeSurfaces]
+    hashoptions = options + ([SimplifyTolerance, SimplifyAngle] if Simplify else [])
+    cachefile = None
+    if Cache:
+        cachefile = os.path.join(CacheDir or import_cache_dir or tempfile.gettempdir(),
+                                 'hycohanz_import_{0}.sat'.format(_import_hash(sourcefile, hashoptions)))
+        if os.path.isfile(cachefile):
+            # The cached bodies are already healed
+            options = [0, CheckModel, Options, 'UnRecognized', MaxStitchTol, ImportFreeSurfaces]
+            partlist = _import(oEditor, cachefile, options)
+            _record_import(oEditor, partlist, sourcefile)
+            return partlist
+
+    if Simplify:
+        # The simplified file keeps the name of the source file, which HFSS
+        # gives to the imported bodies
+        simplifieddir = tempfile.mkdtemp(prefix='hycohanz_simplified_')
+        simplifiedfile = os.path.join(simplifieddir, os.path.basename(sourcefile))
+        try:
+            meshsimplify.simplify_mesh_file(sourcefile, simplifiedfile, SimplifyTolerance, SimplifyAngle)
+            partlist = _import(oEditor, simplifiedfile, options)
+        finally:
+            shutil.rmtree(simplifieddir, ignore_errors=True)
+    else:
+        partlist = _import(oEditor, sourcefile, options)
+    _record_import(oEditor, partlist, sourcefile)
+    if cachefile is not None and partlist:
+        export_model(oEditor, partlist, cachefile)
 
+    return partlist
+
+def _import(oEditor, sourcefile, options):
+    """
+    Imports a file with the options of import_model(), in order, and returns
+    the names of the imported objects.
     """
+    HealOption, CheckModel, Options, FileType, MaxStitchTol, ImportFreeSurfaces = options
     import_params_array =["NAME:NativeBodyParameters",
                           "HealOption:=", HealOption,
                           "CheckModel:=", CheckModel,
@@ -1326,13 +1939,112 @@ def import_model(oEditor,
 
     oEditor.Import(import_params_array)
 
-    return get_selections(oEditor)
+    return [str(part) for part in get_selections(oEditor)]
+
+def _record_import(oEditor, partlist, sourcefile):
+    for part in partlist:
+        model.model_table(oEditor).add(model.ModelObject(part, 'Imported',
+                                                         {'SourceFile': sourcefile}))
+
+def _import_hash(sourcefile, options):
+    """
+    Returns the hash of the content of a file and of the import options. The
+    hash of the content is remembered while the size and the modification
+    time of the file do not change, so large files are only read once.
+    """
+    stat = os.stat(sourcefile)
+    signature = (stat.st_size, stat.st_mtime)
+    path = os.path.abspath(sourcefile)
+    if path not in _import_hashes or _import_hashes[path][0] != signature:
+        content = hashlib.sha1()
+        with open(sourcefile, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                content.update(block)
+        _import_hashes[path] = (signature, content.hexdigest())
+
+    key = hashlib.sha1(_import_hashes[path][1].encode('ascii'))
+    key.update(repr([str(option) for option in options]).encode('utf-8'))
+    return key.hexdigest()
+
+@conf.checkDefaultEditor
+def import_models(oEditor, sourcefiles, **kwargs):
+    """
+    Import several 3D model files.
+
+    Each file is hashed once, and files with the same content and options
+    are translated and healed only once per call, even without the import
+    cache: their later imports use the healed copy exported after the
+    first one.
+
+    Parameters
+    ----------
+    oEditor : pywin32 COMObject
+        The HFSS editor in which the operation will be performed.
+    sourcefiles : list of str
+        Names of the 3D model files.
+    **kwargs :
+        Options passed to import_model(), including Cache and CacheDir.
+
+    Returns
+    -------
+    partlists : list of lists of str
+        Names of the objects imported from each file, in the order of
+        sourcefiles.
+
+    Examples
+    --------
+    >>> partlists = hfss.import_models(["screw.step", "nut.step", "screw.step"], Cache=True)
+    """
+    cachedir = None
+    if not kwargs.get('Cache', False):
+        # Without the import cache, repeated files are cached for this call
+        hashes = [_import_hash(sourcefile, []) for sourcefile in sourcefiles]
+        if len(set(hashes)) < len(hashes):
+            cachedir = tempfile.mkdtemp(prefix='hycohanz_import_')
+            kwargs.update(Cache=True, CacheDir=cachedir)
+
+    try:
+        return [import_model(oEditor, sourcefile, **kwargs) for sourcefile in sourcefiles]
+    finally:
+        if cachedir is not None:
+            shutil.rmtree(cachedir, ignore_errors=True)
+
+@conf.checkDefaultEditor
+def export_model(oEditor, partlist, destinationfile):
+    """
+    Export objects to a 3D model file.
+
+    Parameters
+    ----------
+    oEditor : pywin32 COMObject
+        The HFSS editor in which the operation will be performed.
+    partlist : list of str
+        Names of the objects to export.
+    destinationfile : str
+        Name of the file, whose extension sets the format (.sat, .step,
+        .iges, .stl...). Available formats depend on the HFSS license.
+
+    Returns
+    -------
+    None
+    """
+    oEditor.Export(["NAME:ExportParameters",
+                    "AllowRegionDependentPartSelectionForPMLCreation:=", True,
+                    "AllowRegionSelectionForPMLCreation:=", True,
+                    "Selections:=", ",".join(partlist),
+                    "File:=", destinationfile])
 
 @conf.checkDefaultEditor
 def get_edge_by_position(oEditor, bodyname, x, y, z):
     """
     Get the edge of a given body that lies at a given position.
 
+    The IDs found are remembered by edge (see hycohanz.geometry), so other
+    positions on the same edge of a body of known geometry are answered
+    locally until the body is modified.
+
+    To get the edges at many positions at once, see get_edges_by_position().
+
     Parameters
     ----------
     oEditor : pywin32 COMObject
@@ -1360,7 +2072,8 @@ def get_edge_by_position(oEditor, bodyname, x, y, z):
                           "YPosition:=", Ex(y).expr,
                           "ZPosition:=", Ex(z).expr]
 
-    edgeid = oEditor.GetEdgeByPosition(positionparameters)
+    edgeid = geometry.lookup_id(oEditor, bodyname, x, y, z, 'edge',
+        lambda: oEditor.GetEdgeByPosition(positionparameters))
 
     return edgeid
 
@@ -1414,6 +2127,8 @@ def fillet(oEditor, partlist, edgelist, radius, vertexlist=[], setback=0):
     filletparameters = ["NAME:Parameters", tempparams]
 
     oEditor.Fillet(selectionsarray, filletparameters)
+    for part in partlist:
+        model.record_operation(oEditor, part, 'Fillet')
 
 @conf.checkDefaultEditor
 def separate_body(oEditor, partlist, NewPartsModelFlag="Model"):
@@ -1441,7 +2156,11 @@ def separate_body(oEditor, partlist, NewPartsModelFlag="Model"):
 
     oEditor.SeparateBody(selectionsarray)
 
-    return (partlist[0],) + get_selections(oEditor)
+    newpartlist = (partlist[0],) + get_selections(oEditor)
+    model.record_operation(oEditor, partlist[0], 'SeparateBody')
+    model.record_unknown(oEditor, newpartlist)
+
+    return newpartlist
 
 @conf.checkDefaultEditor
 def delete(oEditor, partlist):
@@ -1463,7 +2182,10 @@ def delete(oEditor, partlist):
     selectionsarray = ["NAME:Selections",
                        "Selections:=", ','.join(partlist)]
 
-    return oEditor.Delete(selectionsarray)
+    result = oEditor.Delete(selectionsarray)
+    model.model_table(oEditor).remove(partlist)
+
+    return result
 
 @conf.checkDefaultEditor
 def split(oEditor, partlist,
@@ -1503,13 +2225,25 @@ def split(oEditor, partlist,
                      "SplitCrossingObjectsOnly:=", SplitCrossingObjectsOnly,
                      "DeleteInvalidObjects:=", DeleteInvalidObjects]
 
-    return oEditor.Split(selectionsarray, splittoparams)
+    result = oEditor.Split(selectionsarray, splittoparams)
+    for part in partlist:
+        model.record_operation(oEditor, part, 'Split')
+    # The names of the objects created when keeping both sides are unknown
+    model.record_unknown(oEditor)
+
+    return result
 
 @conf.checkDefaultEditor
 def get_face_by_position(oEditor, bodyname, x, y, z):
     """
     Get the face of a given body that lies at a given position.
 
+    The IDs found are remembered by face (see hycohanz.geometry), so other
+    positions on the same face of a body of known geometry are answered
+    locally until the body is modified.
+
+    To get the faces at many positions at once, see get_faces_by_position().
+
     Parameters
     ----------
     oEditor : pywin32 COMObject
@@ -1534,10 +2268,243 @@ def get_face_by_position(oEditor, bodyname, x, y, z):
                           "YPosition:=", Ex(y).expr,
                           "ZPosition:=", Ex(z).expr]
 
-    faceid = oEditor.GetFaceByPosition(positionparameters)
+    faceid = geometry.lookup_id(oEditor, bodyname, x, y, z, 'face',
+        lambda: oEditor.GetFaceByPosition(positionparameters))
 
     return faceid
 
+# Script run by the desktop to find many faces or edges by position. It
+# writes one ID (or "error") per line to the output file.
+_editor_script = """\
+oProject = oDesktop.SetActiveProject({project!r})
+oDesign = oProject.SetActiveDesign({design!r})
+oEditor = oDesign.SetActiveEditor("3D Modeler")
+out = open({output!r}, "w")
+{body}
+out.close()
+"""
+
+_position_script = """\
+for method, name, bodyname, x, y, z in {queries!r}:
+    try:
+        found = getattr(oEditor, method)([name, "BodyName:=", bodyname,
+                                          "Xposition:=", x, "YPosition:=", y, "ZPosition:=", z])
+        out.write("%d\\n" % found)
+    except:
+        out.write("error\\n")
+"""
+
+_creation_script = """\
+for parameters, attributes in {calls!r}:
+    try:
+        name = oEditor.{method}(parameters, attributes)
+    except:
+        break
+    out.write("%s\\n" % name)
+    out.flush()
+"""
+
+def _run_editor_script(oEditor, oDesktop, body):
+    """
+    Runs body in the 3D modeler of the design of oEditor with a single
+    oDesktop.RunScript() call, and returns the lines that it wrote to its
+    out file, or None if the script could not be run at all (also when
+    oDesktop, or the design of the editor or its project, are not known, as
+    the script must select them by name). The lines written before a
+    failure of RunScript() are still returned.
+    """
+    oDesign = model.model_table(oEditor).oDesign
+    if oDesktop is None or oDesign is None:
+        return None
+    try:
+        project = str(oDesign.GetProject().GetName())
+        design = str(oDesign.GetName())
+    except Exception:
+        return None
+    handle, output = tempfile.mkstemp(suffix='.txt', prefix='hycohanz_')
+    os.close(handle)
+    handle, script = tempfile.mkstemp(suffix='.py', prefix='hycohanz_')
+    os.close(handle)
+    lines = None
+    try:
+        with open(script, 'w') as f:
+            f.write(_editor_script.format(project=project, design=design,
+                                          output=output, body=body))
+        try:
+            oDesktop.RunScript(script)
+        finally:
+            with open(output) as f:
+                lines = f.read().splitlines()
+    except Exception:
+        pass
+    finally:
+        for path in (script, output):
+            if os.path.exists(path):
+                os.remove(path)
+    return lines
+
+def _run_position_script(oEditor, oDesktop, requests):
+    """
+    Requests the IDs of many faces or edges by position in a single
+    oDesktop.RunScript() call. Returns the list of IDs, with None for the
+    ones that could not be found, or None if the script could not be run.
+    """
+    lines = _run_editor_script(oEditor, oDesktop, _position_script.format(
+        queries=[tuple(str(c) for c in request) for request in requests]))
+    if lines is None or len(lines) != len(requests):
+        return None
+    return [None if line == 'error' else int(line) for line in lines]
+
+def _plain(value):
+    """
+    Returns value, or the items of the lists in it, as plain Python values
+    whose repr() can be read back by the script of _create_primitives().
+    """
+    if isinstance(value, list):
+        return [_plain(item) for item in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+def _create_primitives(oEditor, oDesktop, method, primitive,
+                       parametersarrays, attributesarrays):
+    """
+    Creates the primitives of a bulk creation, calling the method of the
+    editor (e.g. 'CreateBox') with each parameters and attributes array, and
+    records them in the model table. Returns the names of the new objects.
+
+    From bulk_script_threshold objects on, all the calls are made by a
+    single oDesktop.RunScript() call instead of one COM call each. The
+    objects that the script did not create (because it could not be run, or
+    stopped at a failing call) are then created one call at a time, so the
+    error of a failing call is raised as usual.
+    """
+    if oDesktop is None:
+        oDesktop = conf.oDesktop
+    count = len(parametersarrays)
+    names = []
+    if count >= bulk_script_threshold:
+        calls = [(_plain(parametersarrays[n]), _plain(attributesarrays[n]))
+                 for n in range(count)]
+        names = _run_editor_script(oEditor, oDesktop, _creation_script.format(
+            method=method, calls=calls)) or []
+
+    partlist = []
+    for n in range(count):
+        if n < len(names):
+            partlist.append(names[n])
+        else:
+            partlist.append(getattr(oEditor, method)(parametersarrays[n], attributesarrays[n]))
+        model.record_primitive(oEditor, partlist[-1], primitive,
+                               parametersarrays[n], attributesarrays[n])
+    return partlist
+
+def _get_ids_by_position(oEditor, positions, kind, oDesktop):
+    """
+    Returns the IDs of the faces or edges of bodies at the given positions,
+    answering locally the ones already known, and requesting each of the
+    other faces or edges once.
+    """
+    table = model.model_table(oEditor)
+    if kind == 'face':
+        method, name, single = 'GetFaceByPosition', 'NAME:Parameters', get_face_by_position
+    else:
+        method, name, single = 'GetEdgeByPosition', 'NAME:EdgeParameters', get_edge_by_position
+
+    ids = []
+    # Positions to request, by face or edge, and the indices of their IDs
+    pending = collections.OrderedDict()
+    for n, (bodyname, x, y, z) in enumerate(positions):
+        key = geometry.position_key(oEditor, bodyname, x, y, z, kind)
+        if key is not None and (kind, key) in table[bodyname].position_ids:
+            ids.append(table[bodyname].position_ids[(kind, key)])
+            continue
+        ids.append(None)
+        request = (bodyname, Ex(x).expr, Ex(y).expr, Ex(z).expr)
+        target = (bodyname, key) if key is not None else request
+        pending.setdefault(target, (request, key, []))[2].append(n)
+
+    found = None
+    if oDesktop is not None and len(pending) >= position_script_threshold:
+        found = _run_position_script(oEditor, oDesktop,
+                                     [(method, name) + request
+                                      for request, key, indices in pending.values()])
+    if found is None:
+        found = [None]*len(pending)
+
+    for foundid, (request, key, indices) in zip(found, pending.values()):
+        if foundid is None:
+            # Requested on its own, which also raises the HFSS error if any
+            foundid = single(oEditor, *request)
+        elif key is not None:
+            table[request[0]].position_ids[(kind, key)] = foundid
+        for n in indices:
+            ids[n] = foundid
+    return ids
+
+@conf.checkDefaultEditor
+def get_faces_by_position(oEditor, positions, oDesktop=None):
+    """
+    Get the faces of bodies that lie at many positions.
+
+    The faces already found are answered locally (see
+    get_face_by_position()), positions on the same face of a body of known
+    geometry are requested once, and the rest are requested to HFSS in a
+    single script run by the desktop (when there are at least
+    position_script_threshold of them) instead of one call per position.
+    If the script cannot be run, they are requested one at a time.
+
+    Parameters
+    ----------
+    oEditor : pywin32 COMObject
+        The HFSS editor in which the operation will be performed.
+    positions : list
+        (bodyname, x, y, z) of each position, where the coordinates are as
+        in get_face_by_position().
+    oDesktop : pywin32 COMObject
+        The HFSS desktop that runs the script. The current global desktop
+        by default.
+
+    Returns
+    -------
+    faceids : list of int
+        ID of the face at each position.
+
+    Example Usage
+    -------------
+    >>> hfss.get_faces_by_position([("Box1", "5mm", 0, 0), ("Box2", 0, "2mm", 0)])
+    [7, 43]
+    """
+    if oDesktop is None:
+        oDesktop = conf.oDesktop
+    return _get_ids_by_position(oEditor, positions, 'face', oDesktop)
+
+@conf.checkDefaultEditor
+def get_edges_by_position(oEditor, positions, oDesktop=None):
+    """
+    Get the edges of bodies that lie at many positions, e.g. to fillet
+    them. See get_faces_by_position().
+
+    Parameters
+    ----------
+    oEditor : pywin32 COMObject
+        The HFSS editor in which the operation will be performed.
+    positions : list
+        (bodyname, x, y, z) of each position, where the coordinates are as
+        in get_edge_by_position().
+    oDesktop : pywin32 COMObject
+        The HFSS desktop that runs the script. The current global desktop
+        by default.
+
+    Returns
+    -------
+    edgeids : list of int
+        ID of the edge at each position.
+    """
+    if oDesktop is None:
+        oDesktop = conf.oDesktop
+    return _get_ids_by_position(oEditor, positions, 'edge', oDesktop)
+
 @conf.checkDefaultEditor
 def uncover_faces(oEditor, partlist, dictoffacelists):
     """
@@ -1567,6 +2534,8 @@ def uncover_faces(oEditor, partlist, dictoffacelists):
     print('uncoverparametersarray:  {s}'.format(s=uncoverparametersarray))
 
     oEditor.UncoverFaces(selectionsarray, uncoverparametersarray)
+    for part in partlist:
+        model.record_operation(oEditor, part, 'UncoverFaces')
 
 @conf.checkDefaultEditor
 def create_object_from_faces(oEditor, partlist, dictoffacelists, create_groups_flag=False):
@@ -1622,6 +2591,7 @@ def create_object_from_faces(oEditor, partlist, dictoffacelists, create_groups_f
 
     oEditor.CreateObjectFromFaces(selectionsarray, parametersarray,
                             ["CreateGroupsForNewObjects:=", create_groups_flag])
+    model.record_unknown(oEditor)
 
 @conf.checkDefaultEditor
 def connect(oEditor, partlist):
@@ -1653,6 +2623,7 @@ def connect(oEditor, partlist):
     selectionsarray = ["NAME:Selections", "Selections:=", ','.join(partlist)]
 
     oEditor.Connect(selectionsarray)
+    model.record_operation(oEditor, partlist[0], 'Connect', partlist[1:])
 
     return partlist[0]
 
@@ -1677,13 +2648,19 @@ def rename_part(oEditor, oldname, newname):
     """
     renameparamsarray = ["Name:Rename Data", "Old Name:=", oldname, "New Name:=", newname]
 
-    return oEditor.RenamePart(renameparamsarray)
+    result = oEditor.RenamePart(renameparamsarray)
+    model.model_table(oEditor).rename(oldname, newname)
+
+    return result
 
 @conf.checkDefaultEditor
 def get_face_ids(oEditor, body_name):
     """
     Get the face id list of a given body name.
 
+    The list is requested to HFSS the first time only, and kept until an
+    operation changes the topology of the body (see clear_topology_cache()).
+
     Parameters
     ----------
     oEditor : pywin32 COMObject
@@ -1697,5 +2674,187 @@ def get_face_ids(oEditor, body_name):
         list with face Id numbers of body_name
     """
 
-    face_id_list = list(oEditor.GetFaceIDs(body_name))
-    return list(map(int,face_id_list))
+    topology = model.model_table(oEditor).topology.setdefault(body_name, dict())
+    if 'faces' not in topology:
+        topology['faces'] = list(map(int, oEditor.GetFaceIDs(body_name)))
+
+    return list(topology['faces'])
+
+@conf.checkDefaultEditor
+def get_edge_ids(oEditor, body_name):
+    """
+    Get the edge id list of a given body name.
+
+    The list is requested to HFSS the first time only, and kept until an
+    operation changes the topology of the body (see clear_topology_cache()).
+
+    Parameters
+    ----------
+    oEditor : pywin32 COMObject
+        The HFSS editor in which the operation will be performed.
+    body_name : str
+        Name of the body whose edge id list will be returned
+
+    Returns
+    -------
+    edge_id_list : list of int
+        list with edge Id numbers of body_name
+    """
+    topology = model.model_table(oEditor).topology.setdefault(body_name, dict())
+    if 'edges' not in topology:
+        topology['edges'] = list(map(int, oEditor.GetEdgeIDs(body_name)))
+
+    return list(topology['edges'])
+
+@conf.checkDefaultEditor
+def get_bounding_box(oEditor, partlist=None):
+    """
+    Get the axis-aligned bounding box of some objects, or of the whole
+    model, from their local geometry (see hycohanz.geometry).
+
+    The boxes are exact for boxes, rectangles, cylinders, circles, spheres
+    and polylines that were only moved, and conservative after rotations,
+    mirrors and boolean operations. The bounding box of the whole model is
+    requested to HFSS if some object has unknown geometry.
+
+    Parameters
+    ----------
+    oEditor : pywin32 COMObject
+        The HFSS editor in which the operation will be performed.
+    partlist : list of str
+        Names of the objects. All the objects of the model by default.
+
+    Returns
+    -------
+    boundingbox : list of float
+        [xmin, ymin, zmin, xmax, ymax, zmax] in meters.
+
+    Raises
+    ------
+    ValueError
+        If the geometry of some of the given objects is not known locally.
+    """
+    index = geometry.spatial_index(oEditor)
+    if partlist is None:
+        if index.unknown:
+            return [geometry.evaluate_length(oEditor, value)
+                    for value in oEditor.GetModelBoundingBox()]
+        partlist = index.names
+    if not partlist:
+        raise ValueError("There are no objects")
+
+    table = model.model_table(oEditor)
+    bounds = []
+    for name in partlist:
+        objectgeometry = geometry.object_geometry(oEditor, table[name]) if name in table else None
+        if objectgeometry is None:
+            raise ValueError("The geometry of {0} is not known".format(name))
+        bounds.append((objectgeometry.lower, objectgeometry.upper))
+    lower = np.min([bound[0] for bound in bounds], axis=0)
+    upper = np.max([bound[1] for bound in bounds], axis=0)
+    return lower.tolist() + upper.tolist()
+
+@conf.checkDefaultEditor
+def get_object_measures(oEditor, name):
+    """
+    Get the volume, area or length of an object, computed locally from its
+    creation parameters.
+
+    Parameters
+    ----------
+    oEditor : pywin32 COMObject
+        The HFSS editor in which the operation will be performed.
+    name : str
+        Name of the object.
+
+    Returns
+    -------
+    measures : dict
+        {'volume': ..., 'area': ...} for solids (in m^3 and m^2, area of the
+        whole surface), {'area': ...} for sheets and {'length': ...} for
+        polylines (plus 'area' if covered).
+
+    Raises
+    ------
+    ValueError
+        If they are not known locally (e.g. after a boolean operation).
+    """
+    table = model.model_table(oEditor)
+    measures = geometry.object_measures(oEditor, table[name]) if name in table else None
+    if measures is None:
+        raise ValueError("The measures of {0} are not known".format(name))
+    return measures
+
+@conf.checkDefaultEditor
+def get_tessellation(oEditor, name, segments=16):
+    """
+    Get a coarse triangle mesh of the surface of an object, computed locally.
+
+    Parameters
+    ----------
+    oEditor : pywin32 COMObject
+        The HFSS editor in which the operation will be performed.
+    name : str
+        Name of the object.
+    segments : int
+        Number of segments per turn of the curved surfaces (true cylinders,
+        circles and spheres).
+
+    Returns
+    -------
+    mesh : hycohanz.geometry Mesh object
+        Mesh with vertices (in meters), triangles, and the face of each
+        triangle.
+
+    Raises
+    ------
+    ValueError
+        If the surface is not known locally.
+    """
+    table = model.model_table(oEditor)
+    mesh = geometry.object_mesh(oEditor, table[name], segments) if name in table else None
+    if mesh is None:
+        raise ValueError("The surface of {0} is not known".format(name))
+    return mesh
+
+@conf.checkDefaultEditor
+def pick_face(oEditor, origin, direction):
+    """
+    Get the first face hit by a ray, found on the local tessellation of the
+    objects. The face ID is obtained with get_face_by_position(), so it is
+    only requested to HFSS the first time a face is picked.
+
+    Parameters
+    ----------
+    oEditor : pywin32 COMObject
+        The HFSS editor in which the operation will be performed.
+    origin : list
+        x, y and z coordinates of the origin of the ray (as in
+        get_face_by_position()).
+    direction : list of float
+        Direction of the ray.
+
+    Returns
+    -------
+    bodyname : str
+        Name of the body hit, or None if none is.
+    faceid : int
+        ID of the face hit, or None if none is.
+
+    Raises
+    ------
+    ValueError
+        If the objects that may be hit are not known locally.
+    """
+    point = geometry.evaluate_point(oEditor, *origin)
+    if point is None:
+        raise ValueError("Cannot evaluate the origin of the ray")
+    found = geometry.pick(oEditor, point, direction)
+    if found is None:
+        return None, None
+    bodyname, hit, facekey = found
+    # The hit on the mesh of a curved face is inside the body, so it is
+    # moved onto the face
+    hit = geometry.surface_point(oEditor, bodyname, hit, facekey)
+    return bodyname, get_face_by_position(oEditor, bodyname,
+                                          *["{0!r}meter".format(float(c)) for c in hit])
@@ -0,0 +1,658 @@
+# -*- coding: utf-8 -*-
+"""
+Declarative description of a parametric model, applied incrementally.
+
+A ModelSpec lists the variables, primitives, operations (booleans, material
+assignments...) and boundaries of a model. apply_model_spec() compares it
+with the spec last applied to the editor and only sends the differences:
+
+- Changed variables are written with a single ChangeProperty() call.
+- Primitives whose parameters or attributes changed are edited in place,
+  through the properties of their creation command in the history
+  ("Patch:CreateBox:1") and of the object, instead of being deleted and
+  drawn again. Their boolean results and boundaries are kept.
+- Anything else that changed (a new or removed node, another operation, a
+  primitive changed in a way that has no editable property) rebuilds the
+  group of objects joined to it by operations, and the boundaries on them.
+
+Example Usage
+-------------
+>>> spec = hfss.ModelSpec()
+>>> spec.variable("W", "7.02mm")
+>>> spec.primitive("create_box", 0, 0, 0, "W", "L", "h", Name="Patch", MaterialName="copper")
+>>> spec.primitive("create_cylinder", 0, 0, 0, "r", "h", Name="Via")
+>>> spec.operation("Drill", "subtract", ["Patch"], ["Via"])
+>>> spec.boundary("PerfE_Patch", "assign_perfect_e", "PerfE_Patch", hfss.FaceIDs("Patch"))
+>>> hfss.apply_model_spec(spec)
+>>> spec.variable("W", "7.5mm")
+>>> spec.primitive("create_box", 0, 0, 0, "W", "L", "h", Name="Patch", MaterialName="gold")
+>>> hfss.apply_model_spec(spec)['updated']
+['Patch']
+"""
+
+from __future__ import division, print_function, unicode_literals, absolute_import
+
+import collections
+import inspect
+import time
+
+import hycohanz.boundarysetup as boundarysetup
+import hycohanz.conf as conf
+import hycohanz.modeler3d as modeler3d
+import hycohanz.model as model
+from hycohanz.deferred import _replace_names
+from hycohanz.design import get_module
+from hycohanz.expression import Expression as Ex
+from hycohanz.property import (add_property, set_variables, _variable_cache,
+                               _variable_owner)
+
+# Last spec applied to each editor, as lists of [oEditor, state] pairs
+_applied_specs = []
+
+# Editable properties of the creation command of each primitive: property
+# name and (argument, HFSS parameter) pairs of its value. A property with
+# three pairs is a position, and a property named None is a size of a
+# rectangle, whose name depends on its axis.
+_command_properties = {
+    'create_box': ('CreateBox', [('Position', (('xpos', 'XPosition'), ('ypos', 'YPosition'),
+                                               ('zpos', 'ZPosition'))),
+                                 ('XSize', (('xsize', 'XSize'),)),
+                                 ('YSize', (('ysize', 'YSize'),)),
+                                 ('ZSize', (('zsize', 'ZSize'),))]),
+    'create_cylinder': ('CreateCylinder', [('Center Position', (('xc', 'XCenter'), ('yc', 'YCenter'),
+                                                                ('zc', 'ZCenter'))),
+                                           ('Axis', (('WhichAxis', 'WhichAxis'),)),
+                                           ('Radius', (('radius', 'Radius'),)),
+                                           ('Height', (('height', 'Height'),)),
+                                           ('Number of Segments', (('NumSides', 'NumSides'),))]),
+    'create_sphere': ('CreateSphere', [('Center Position', (('x', 'XCenter'), ('y', 'YCenter'),
+                                                            ('z', 'ZCenter'))),
+                                       ('Radius', (('radius', 'Radius'),))]),
+    'create_circle': ('CreateCircle', [('Center Position', (('xc', 'XCenter'), ('yc', 'YCenter'),
+                                                            ('zc', 'ZCenter'))),
+                                       ('Axis', (('WhichAxis', 'WhichAxis'),)),
+                                       ('Radius', (('radius', 'Radius'),)),
+                                       ('Number of Segments', (('NumSegments', 'NumSegments'),))]),
+    'create_rectangle': ('CreateRectangle', [('Position', (('xs', 'XStart'), ('ys', 'YStart'),
+                                                           ('zs', 'ZStart'))),
+                                             (None, (('width', 'Width'),)),
+                                             (None, (('height', 'Height'),))])}
+
+# Size properties of a rectangle (width and height) for each axis
+_rectangle_sizes = {'X': ('YSize', 'ZSize'), 'Y': ('ZSize', 'XSize'), 'Z': ('XSize', 'YSize')}
+
+# Editable attributes of the objects, by argument of the creation functions
+_attribute_properties = {'MaterialName': 'Material',
+                         'Color': 'Color',
+                         'Transparency': 'Transparent',
+                         'SolveInside': 'Solve Inside'}
+
+class FaceIDs(object):
+    """
+    Argument of a boundary in a ModelSpec that stands for all the face IDs
+    of a body, found when the boundary is assigned.
+    """
+    def __init__(self, bodyname):
+        self.bodyname = bodyname
+
+    def __repr__(self):
+        return "FaceIDs({0!r})".format(self.bodyname)
+
+class FaceAt(object):
+    """
+    Argument of a boundary in a ModelSpec that stands for the list with the
+    ID of the face of a body at a position, found when the boundary is
+    assigned.
+    """
+    def __init__(self, bodyname, x, y, z):
+        self.bodyname = bodyname
+        self.position = (x, y, z)
+
+    def __repr__(self):
+        return "FaceAt({0!r}, {1}, {2}, {3})".format(self.bodyname, *self.position)
+
+def _freeze(value):
+    """
+    Returns a hashable form of an argument, in which equal HFSS values are
+    equal.
+    """
+    if isinstance(value, FaceIDs):
+        return ('FaceIDs', value.bodyname)
+    if isinstance(value, FaceAt):
+        return ('FaceAt', value.bodyname) + tuple(Ex(c).expr for c in value.position)
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    if isinstance(value, (bool, str)) or value is None:
+        return value
+    return Ex(value).expr
+
+def _strings(value):
+    """
+    Yields the strings in an argument, also inside lists and tuples.
+    """
+    if isinstance(value, str):
+        yield value
+    elif isinstance(value, (FaceIDs, FaceAt)):
+        yield value.bodyname
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            for string in _strings(item):
+                yield string
+
+class SpecNode(object):
+    """
+    Node of a ModelSpec: a call of a hycohanz function.
+
+    Parameters
+    ----------
+    name : str
+        Name of the node: the name of the object of a primitive, a label of
+        an operation, or the name of a boundary.
+    kind : str
+        'primitive', 'operation' or 'boundary'.
+    function : function
+        The hycohanz function.
+    args, kwargs :
+        Arguments of the function, without the editor or design.
+    depends : set of str
+        Names of the primitives the node uses.
+
+    """
+    def __init__(self, name, kind, function, args, kwargs, depends):
+        self.name = name
+        self.kind = kind
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self.depends = depends
+        bound = inspect.signature(function).bind(None, *args, **kwargs)
+        bound.apply_defaults()
+        self.arguments = collections.OrderedDict(
+            (key, _freeze(value)) for key, value in list(bound.arguments.items())[1:])
+
+    def __repr__(self):
+        return "SpecNode({0!r}, {1!r})".format(self.name, self.function.__name__)
+
+    def signature(self):
+        return (self.kind, self.function.__name__, tuple(self.arguments.items()))
+
+class ModelSpec(object):
+    """
+    Declarative description of a model: variables and an ordered list of
+    primitives, operations and boundaries, each depending on the primitives
+    whose names appear in its arguments.
+
+    Declaring a node again with the same name replaces it in place, so a
+    spec can be built once and then modified before each
+    apply_model_spec().
+
+    Attributes
+    ----------
+    variables : OrderedDict
+        Design (or project, with '$') variables and their values.
+    nodes : OrderedDict
+        SpecNode objects by name, in order of application.
+
+    """
+    def __init__(self):
+        self.variables = collections.OrderedDict()
+        self.nodes = collections.OrderedDict()
+
+    def variable(self, name, value):
+        """
+        Declare a variable. Returns it as a hycohanz Expression.
+        """
+        self.variables[name] = value
+        return Ex(name)
+
+    def primitive(self, function, *args, **kwargs):
+        """
+        Declare a primitive, drawn with a creation function of modeler3d
+        (by name, e.g. 'create_box') and an explicit Name argument. Returns
+        the name.
+        """
+        function = self._function(modeler3d, function)
+        bound = inspect.signature(function).bind(None, *args, **kwargs).arguments
+        if 'Name' not in bound:
+            raise ValueError("The primitives of a ModelSpec must have a Name")
+        return self._add(bound['Name'], 'primitive', function, args, kwargs)
+
+    def operation(self, label, function, *args, **kwargs):
+        """
+        Declare an operation on primitives, done with a function of
+        modeler3d (e.g. 'subtract' or 'assign_material'). Returns the label.
+        """
+        return self._add(label, 'operation', self._function(modeler3d, function), args, kwargs)
+
+    def boundary(self, name, function, *args, **kwargs):
+        """
+        Declare a boundary or excitation named name, assigned with a
+        function of boundarysetup. The faces can be given as FaceIDs or
+        FaceAt objects. Returns the name.
+        """
+        return self._add(name, 'boundary', self._function(boundarysetup, function), args, kwargs)
+
+    def remove(self, name):
+        """
+        Remove a node from the spec.
+        """
+        del self.nodes[name]
+
+    def _function(self, module, function):
+        if isinstance(function, str):
+            function = getattr(module, function, None)
+        if not callable(function):
+            raise ValueError("{0} has no function {1}".format(module.__name__, function))
+        return function
+
+    def _add(self, name, kind, function, args, kwargs):
+        primitives = set(node.name for node in self.nodes.values() if node.kind == 'primitive')
+        depends = set(string for value in list(args) + list(kwargs.values())
+                      for string in _strings(value) if string in primitives)
+        self.nodes[name] = SpecNode(name, kind, function, list(args), dict(kwargs), depends)
+        return name
+
+class _Groups(object):
+    """
+    Union-find of the names of primitives and operations joined by
+    operations.
+    """
+    def __init__(self):
+        self.parent = dict()
+
+    def find(self, name):
+        self.parent.setdefault(name, name)
+        while self.parent[name] != name:
+            self.parent[name] = self.parent[self.parent[name]]
+            name = self.parent[name]
+        return name
+
+    def join(self, names):
+        names = list(names)
+        for name in names[1:]:
+            self.parent[self.find(name)] = self.find(names[0])
+
+def _applied_state(oEditor):
+    return conf.get_object_store(_applied_specs, oEditor,
+        lambda: {'variables': dict(), 'nodes': collections.OrderedDict(), 'objects': dict()})
+
+def _spec_design(oEditor, oDesign):
+    """
+    Returns the design of the variables and boundaries of a spec: the
+    given one, the design of the editor or the current global design.
+    """
+    if oDesign is None:
+        oDesign = model.model_table(oEditor).oDesign
+    if oDesign is None and conf.oDesignList:
+        oDesign = conf.oDesignList[-1]
+    return oDesign
+
+def _existing_variables(oDesign, names):
+    """
+    Returns the given variables that already exist in the design (or its
+    project), from the variable cache or else listing them in HFSS.
+    """
+    existing = []
+    listed = dict()
+    for name in names:
+        oOwner = _variable_owner(oDesign, name)
+        if name not in conf.get_object_store(_variable_cache, oOwner):
+            project = name[0] == '$'
+            if project not in listed:
+                listed[project] = set(str(variable) for variable in oOwner.GetVariables())
+            if name not in listed[project]:
+                continue
+        existing.append(name)
+    return existing
+
+def _is_live(oEditor, objectname):
+    """
+    Returns True if an object is in the editor (it was not consumed by an
+    operation).
+    """
+    table = model.model_table(oEditor)
+    if not table.synced:
+        table.reconcile(oEditor.GetMatchedObjectName("*"))
+    return objectname in table
+
+def _find_record(table, name):
+    """
+    Returns the record of a primitive and the name of the object whose body
+    contains it (itself, or the blank of a boolean that consumed it), or
+    (None, None) if it is not known.
+    """
+    def search(records):
+        for record in records:
+            if record.name == name:
+                return record
+            for operation in record.operations:
+                if isinstance(operation[1], list):
+                    found = search([item for item in operation[1]
+                                    if isinstance(item, model.ModelObject)])
+                    if found is not None:
+                        return found
+        return None
+
+    for owner in table.objects.values():
+        record = search([owner])
+        if record is not None:
+            return record, owner.name
+    return None, None
+
+def _property_changes(node, previous):
+    """
+    Returns the command and attribute properties to change to turn the
+    primitive applied as previous into node, as two lists of ChangedProps
+    entries, with the new HFSS parameters, or None if some change has no
+    editable property.
+    """
+    changed = [key for key, value in node.arguments.items()
+               if previous.arguments.get(key) != value]
+    command, properties = _command_properties.get(node.function.__name__, (None, []))
+    editable = set(argument for name, pairs in properties for argument, parameter in pairs)
+    if any(key not in editable and key not in _attribute_properties for key in changed):
+        return None
+    if node.function.__name__ == 'create_rectangle' and 'WhichAxis' in changed:
+        return None
+
+    commandprops = []
+    parameters = dict()
+    for name, pairs in properties:
+        if not any(argument in changed for argument, parameter in pairs):
+            continue
+        values = [node.arguments[argument] for argument, parameter in pairs]
+        parameters.update((parameter, value) for (argument, parameter), value in zip(pairs, values))
+        if name is None:
+            axis = node.arguments['WhichAxis']
+            name = _rectangle_sizes[axis][0 if pairs[0][0] == 'width' else 1]
+        if len(pairs) == 3:
+            commandprops.append(["NAME:" + name, "X:=", values[0], "Y:=", values[1], "Z:=", values[2]])
+        else:
+            commandprops.append(["NAME:" + name, "Value:=", values[0]])
+
+    attributeprops = []
+    for key in changed:
+        if key not in _attribute_properties:
+            continue
+        value = node.arguments[key]
+        name = "NAME:" + _attribute_properties[key]
+        if key == 'Color':
+            attributeprops.append([name, "R:=", int(value[0]), "G:=", int(value[1]), "B:=", int(value[2])])
+        elif key == 'MaterialName':
+            attributeprops.append([name, "Value:=", '"{0}"'.format(value)])
+        elif key == 'Transparency':
+            attributeprops.append([name, "Value:=", float(value)])
+        else:
+            attributeprops.append([name, "Value:=", bool(value)])
+    return commandprops, attributeprops, parameters
+
+def _update_record(oEditor, name, parameters, material):
+    """
+    Updates the local record of a primitive edited in place.
+    """
+    table = model.model_table(oEditor)
+    record, owner = _find_record(table, name)
+    if record is None:
+        return
+    record.parameters.update(parameters)
+    if material is not None:
+        record.material = material
+    table[owner].position_ids.clear()
+    table.invalidate_topology([owner])
+    table.touch()
+
+def _resolve_faces(oEditor, value, faces):
+    """
+    Replaces the FaceIDs and FaceAt objects in an argument.
+    """
+    if isinstance(value, FaceIDs):
+        return list(modeler3d.get_face_ids(oEditor, value.bodyname))
+    if isinstance(value, FaceAt):
+        return [faces[id(value)]]
+    if isinstance(value, (list, tuple)):
+        return type(value)(_resolve_faces(oEditor, item, faces) for item in value)
+    return value
+
+@conf.checkDefaultEditor
+def apply_model_spec(oEditor, spec, oDesign=None, rebuild=False):
+    """
+    Apply a ModelSpec to an editor, sending only the differences with the
+    spec applied before (see the module documentation).
+
+    Variables removed from the spec are left in the design.
+
+    Parameters
+    ----------
+    oEditor : pywin32 COMObject
+        The HFSS editor in which the model is built.
+    spec : hycohanz ModelSpec object
+        The model to apply.
+    oDesign : pywin32 COMObject
+        The HFSS design of the editor, for the variables and boundaries. By
+        default, the design of the editor (see set_active_editor()) or the
+        current global design.
+    rebuild : bool
+        Whether to delete everything applied before and build the whole
+        spec again.
+
+    Returns
+    -------
+    report : dict
+        'variables' (names of the variables written), 'updated' (primitives
+        edited in place), 'rebuilt' (primitives and operations executed),
+        'deleted' (objects deleted), 'boundaries' (boundaries assigned) and
+        'time' (seconds).
+    """
+    start = time.time()
+    table = model.model_table(oEditor)
+    oDesign = _spec_design(oEditor, oDesign)
+    state = _applied_state(oEditor)
+    old, new = state['nodes'], spec.nodes
+    report = {'variables': [], 'updated': [], 'rebuilt': [], 'deleted': [], 'boundaries': []}
+
+    # Variables, with the ones not applied before but already in the
+    # design (e.g. after a reset) written instead of added
+    added = [name for name in spec.variables if name not in state['variables']]
+    changed = dict((name, value) for name, value in spec.variables.items()
+                   if name in state['variables'] and state['variables'][name] != _freeze(value))
+    for name in _existing_variables(oDesign, added) if added else []:
+        added.remove(name)
+        changed[name] = spec.variables[name]
+    if added:
+        add_property(oDesign, added, [spec.variables[name] for name in added])
+    if changed:
+        set_variables(oDesign, changed)
+    report['variables'] = added + sorted(changed)
+    state['variables'] = dict((name, _freeze(value)) for name, value in spec.variables.items())
+
+    # Geometry nodes to rebuild, with every node joined to them by operations
+    allnames = list(new) + [name for name in old if name not in new]
+    groups = _Groups()
+    dirty = set()
+    updates = []
+    for nodes in (old, new):
+        for node in nodes.values():
+            if node.kind != 'boundary':
+                groups.join([node.name] + sorted(node.depends))
+    for name in allnames:
+        before, after = old.get(name), new.get(name)
+        if after is not None and after.kind == 'boundary' or before is not None and before.kind == 'boundary':
+            continue
+        if rebuild or before is None or after is None or before.kind != after.kind:
+            dirty.add(name)
+        elif before.signature() != after.signature():
+            changes = None
+            if after.kind == 'primitive' and before.function is after.function:
+                changes = _property_changes(after, before)
+            # The objects consumed by an operation (e.g. the tools of a
+            # subtraction) have no properties left, so the operation is
+            # done again
+            if changes is None or not _is_live(oEditor, state['objects'].get(name, name)):
+                dirty.add(name)
+            else:
+                updates.append((after, changes))
+    dirtygroups = set(groups.find(name) for name in dirty)
+    rebuilt = set(name for name in allnames if groups.find(name) in dirtygroups
+                  and (old.get(name) or new.get(name)).kind != 'boundary')
+
+    # Boundaries to remove and to assign
+    boundaries = []
+    removed = []
+    for name in allnames:
+        before, after = old.get(name), new.get(name)
+        if (before or after).kind != 'boundary':
+            continue
+        stale = (rebuild or before is None or after is None
+                 or before.signature() != after.signature()
+                 or any(body in rebuilt for body in before.depends | after.depends))
+        if stale and before is not None:
+            removed.append(name)
+        if stale and after is not None:
+            boundaries.append(name)
+    if removed:
+        get_module(oDesign, "BoundarySetup").DeleteBoundaries(sorted(removed))
+        for name in removed:
+            del old[name]
+
+    # Objects of the rebuilt groups left by the previous spec
+    if rebuilt:
+        if not table.synced:
+            table.reconcile(oEditor.GetMatchedObjectName("*"))
+        existing = set(table.names())
+        leftovers = [state['objects'].get(name, name) for name, node in old.items()
+                     if name in rebuilt and node.kind == 'primitive'
+                     and state['objects'].get(name, name) in existing]
+        if leftovers:
+            modeler3d.delete(oEditor, leftovers)
+            report['deleted'] = leftovers
+        for name in rebuilt:
+            old.pop(name, None)
+            state['objects'].pop(name, None)
+
+    # Primitives edited in place, with the same attribute changes together
+    attributechanges = collections.OrderedDict()
+    for node, (commandprops, attributeprops, parameters) in updates:
+        if node.name in rebuilt:
+            continue
+        objectname = state['objects'].get(node.name, node.name)
+        if commandprops:
+            command = _command_properties[node.function.__name__][0]
+            oEditor.ChangeProperty(["NAME:AllTabs",
+                                    ["NAME:Geometry3DCmdTab",
+                                     ["NAME:PropServers", "{0}:{1}:1".format(objectname, command)],
+                                     ["NAME:ChangedProps"] + commandprops]])
+        if attributeprops:
+            attributechanges.setdefault(repr(attributeprops), (attributeprops, []))[1].append(objectname)
+        _update_record(oEditor, objectname, parameters, node.arguments.get('MaterialName')
+                       if 'MaterialName' in node.arguments else None)
+        old[node.name] = node
+        report['updated'].append(node.name)
+    for attributeprops, objectnames in attributechanges.values():
+        oEditor.ChangeProperty(["NAME:AllTabs",
+                                ["NAME:Geometry3DAttributeTab",
+                                 ["NAME:PropServers"] + objectnames,
+                                 ["NAME:ChangedProps"] + attributeprops]])
+
+    # Rebuilt primitives and operations, in the order of the spec, with the
+    # names of the objects as HFSS gave them
+    for name, node in new.items():
+        if name not in rebuilt:
+            continue
+        args = _replace_names(node.args, state['objects'])
+        kwargs = dict((key, _replace_names(value, state['objects']))
+                      for key, value in node.kwargs.items())
+        result = node.function(oEditor, *args, **kwargs)
+        if node.kind == 'primitive' and str(result) != name:
+            state['objects'][name] = str(result)
+        old[name] = node
+        report['rebuilt'].append(name)
+
+    # Boundaries, with all the faces by position found at once
+    positions = [value for name in boundaries for argument in
+                 list(new[name].args) + list(new[name].kwargs.values())
+                 for value in _face_positions(argument)]
+    faceids = modeler3d.get_faces_by_position(
+        oEditor, [(state['objects'].get(value.bodyname, value.bodyname),) + value.position
+                  for value in positions]) if positions else []
+    faces = dict((id(value), faceid) for value, faceid in zip(positions, faceids))
+    for name, node in new.items():
+        if name not in boundaries:
+            continue
+        args = _resolve_faces(oEditor, _replace_faces_bodies(node.args, state['objects']), faces)
+        kwargs = dict((key, _resolve_faces(oEditor, _replace_faces_bodies(value, state['objects']), faces))
+                      for key, value in node.kwargs.items())
+        node.function(oDesign, *args, **kwargs)
+        old[name] = node
+        report['boundaries'].append(name)
+
+    # Keep the order of the spec for the next time
+    state['nodes'] = collections.OrderedDict((name, old[name]) for name in new if name in old)
+    report['time'] = time.time() - start
+    return report
+
+def _face_positions(value):
+    """
+    Yields the FaceAt objects in an argument.
+    """
+    if isinstance(value, FaceAt):
+        yield value
+    elif isinstance(value, (list, tuple)):
+        for item in value:
+            for found in _face_positions(item):
+                yield found
+
+def _replace_faces_bodies(value, names):
+    """
+    Returns an argument with the names of the objects of the primitives
+    replaced, also in FaceIDs (the FaceAt objects are kept, as they are
+    resolved by identity).
+    """
+    if isinstance(value, FaceIDs):
+        return FaceIDs(names.get(value.bodyname, value.bodyname))
+    if isinstance(value, (list, tuple)):
+        return type(value)(_replace_faces_bodies(item, names) for item in value)
+    return _replace_names(value, names)
+
+@conf.checkDefaultEditor
+def reset_model_spec(oEditor, oDesign=None):
+    """
+    Forget the spec applied to an editor, deleting the objects and
+    boundaries it created, so the next apply_model_spec() builds the whole
+    spec again (e.g. after the model was modified outside it). The
+    variables are kept, and only written again if they changed.
+
+    Parameters
+    ----------
+    oEditor : pywin32 COMObject
+        The HFSS editor.
+    oDesign : pywin32 COMObject
+        The HFSS design of the editor, for the boundaries. By default, the
+        design of the editor (see set_active_editor()) or the current
+        global design.
+
+    Returns
+    -------
+    None
+    """
+    state = _applied_state(oEditor)
+    table = model.model_table(oEditor)
+    if not table.synced:
+        table.reconcile(oEditor.GetMatchedObjectName("*"))
+    existing = set(table.names())
+    objects = [state['objects'].get(name, name) for name, node in state['nodes'].items()
+               if node.kind == 'primitive' and state['objects'].get(name, name) in existing]
+    if objects:
+        modeler3d.delete(oEditor, objects)
+    boundaries = [name for name, node in state['nodes'].items() if node.kind == 'boundary']
+    if boundaries:
+        oBoundarySetup = get_module(_spec_design(oEditor, oDesign), "BoundarySetup")
+        existing = set(str(name) for name in oBoundarySetup.GetBoundaries())
+        boundaries = sorted(name for name in boundaries if name in existing)
+        if boundaries:
+            oBoundarySetup.DeleteBoundaries(boundaries)
+
+    state['variables'] = dict()
+    state['nodes'] = collections.OrderedDict()
+    state['objects'] = dict()
@@ -0,0 +1,282 @@
+# -*- coding: utf-8 -*-
+"""
+Functions in this module correspond more or less to the functions described
+in the HFSS Scripting Guide, Section "Optimetrics Module Script Commands".
+
+It also implements a design-of-experiments generator, so that all the
+variations of a study are inserted in a single parametric setup and HFSS
+can solve them in one batch (using its own distributed solving), instead
+of driving them one by one with set_variable() and solve().
+
+At last count there were 2 functions implemented out of 11.
+"""
+from __future__ import division, print_function, unicode_literals, absolute_import
+
+import itertools
+import random
+
+import hycohanz.conf as conf
+from hycohanz.design import get_module
+from hycohanz.expression import Expression as Ex
+from hycohanz.units import parse_literal
+
+# Direction numbers (degree s, coefficients a, initial numbers m) of the
+# Sobol sequence for dimensions 2 onwards, from Joe and Kuo's
+# new-joe-kuo-6.21201 table. Dimension 1 is the van der Corput sequence.
+_sobol_directions = [(1, 0, [1]),
+                     (2, 1, [1, 3]),
+                     (3, 1, [1, 3, 1]),
+                     (3, 2, [1, 1, 1]),
+                     (4, 1, [1, 1, 3, 3]),
+                     (4, 4, [1, 3, 5, 13]),
+                     (5, 2, [1, 1, 5, 5, 17]),
+                     (5, 4, [1, 1, 5, 5, 5]),
+                     (5, 7, [1, 1, 7, 11, 19]),
+                     (5, 11, [1, 1, 5, 1, 1]),
+                     (5, 13, [1, 1, 1, 3, 11]),
+                     (5, 14, [1, 3, 5, 5, 31]),
+                     (6, 1, [1, 3, 3, 9, 7, 49]),
+                     (6, 13, [1, 1, 1, 15, 21, 21]),
+                     (6, 16, [1, 3, 1, 13, 27, 49])]
+
+def _sobol_points(samples, dimensions, bits=32):
+    """
+    Returns the first points of the Sobol sequence in [0, 1)^dimensions,
+    skipping the origin.
+    """
+    if dimensions > len(_sobol_directions) + 1:
+        raise ValueError("Sobol sampling supports up to {0} variables".format(
+                         len(_sobol_directions) + 1))
+
+    directions = [[1 << (bits - 1 - k) for k in range(bits)]]
+    for s, a, m in _sobol_directions[:dimensions-1]:
+        v = [0]*bits
+        for k in range(s):
+            v[k] = m[k] << (bits - 1 - k)
+        for k in range(s, bits):
+            v[k] = v[k-s] ^ (v[k-s] >> s)
+            for j in range(1, s):
+                v[k] ^= ((a >> (s - 1 - j)) & 1)*v[k-j]
+        directions.append(v)
+
+    points = []
+    x = [0]*dimensions
+    for i in range(samples):
+        # Gray code order: flip the direction of the lowest zero bit of i
+        c = 0
+        while (i >> c) & 1:
+            c += 1
+        x = [x[d] ^ directions[d][c] for d in range(dimensions)]
+        points.append([xd/2.0**bits for xd in x])
+    return points
+
+def _latin_hypercube_points(samples, dimensions, seed=None):
+    """
+    Returns a Latin hypercube sample in [0, 1)^dimensions.
+    """
+    rng = random.Random(seed)
+    columns = []
+    for d in range(dimensions):
+        strata = list(range(samples))
+        rng.shuffle(strata)
+        columns.append([(stratum + rng.random())/samples for stratum in strata])
+    return [list(point) for point in zip(*columns)]
+
+def _parse_range(varrange):
+    """
+    Returns the (start, stop, unit) of a variable range given as
+    (start, stop), where the limits can be numbers or strings with units.
+    """
+    start, startunit = parse_literal(varrange[0])
+    stop, stopunit = parse_literal(varrange[1])
+    if startunit and stopunit and startunit != stopunit:
+        raise ValueError("Range limits {0} must have the same units".format(varrange))
+    return start, stop, startunit or stopunit
+
+def _format_value(value, unit):
+    return '{0:.12g}{1}'.format(value, unit)
+
+def generate_variations(ranges, plan='full_factorial', samples=None, levels=3, seed=None):
+    """
+    Generate the variations of a design of experiments.
+
+    Parameters
+    ----------
+    ranges : dict
+        Dictionary with the variable names as keys and their ranges as
+        values. A range is a tuple (start, stop) of numbers or strings with
+        units, as ('6mm', '8mm'). For the full factorial plan, a list with
+        the explicit values of the variable is also admitted.
+    plan : str
+        Sampling plan. One of 'full_factorial', 'latin_hypercube' or 'sobol'.
+    samples : int
+        Number of variations to generate. Required for the 'latin_hypercube'
+        and 'sobol' plans.
+    levels : int or dict
+        Number of equally-spaced levels of every variable for the
+        'full_factorial' plan, or dictionary with the levels of each variable.
+    seed : int
+        Seed of the random generator used by the 'latin_hypercube' plan.
+
+    Returns
+    -------
+    variations : list of dict
+        List of variations, each one as a dictionary with the variable names
+        as keys and their values (str) as values.
+
+    Example Usage
+    -------------
+    >>> generate_variations({'W': ('6mm', '8mm'), 'L': [4, 5]}, levels=3)
+    [{'W': '6mm', 'L': '4'}, {'W': '6mm', 'L': '5'}, {'W': '7mm', 'L': '4'}, ...]
+    """
+    names = list(ranges)
+
+    if plan == 'full_factorial':
+        valuelists = []
+        for name in names:
+            if isinstance(ranges[name], list):
+                valuelists.append([Ex(value).expr for value in ranges[name]])
+                continue
+            start, stop, unit = _parse_range(ranges[name])
+            n = levels[name] if isinstance(levels, dict) else levels
+            if n == 1:
+                valuelists.append([_format_value(start, unit)])
+            else:
+                valuelists.append([_format_value(start + (stop - start)*i/(n - 1), unit)
+                                   for i in range(n)])
+        return [dict(zip(names, values)) for values in itertools.product(*valuelists)]
+
+    if samples is None:
+        raise ValueError("The number of samples is required for the '{0}' plan".format(plan))
+    if plan == 'latin_hypercube':
+        points = _latin_hypercube_points(samples, len(names), seed)
+    elif plan == 'sobol':
+        points = _sobol_points(samples, len(names))
+    else:
+        raise ValueError("Unknown sampling plan '{0}'".format(plan))
+
+    limits = [_parse_range(ranges[name]) for name in names]
+    return [{name: _format_value(start + (stop - start)*u, unit)
+             for name, (start, stop, unit), u in zip(names, limits, point)}
+            for point in points]
+
+@conf.checkDefaultDesign
+def insert_parametric_setup(oDesign,
+                            variations,
+                            setupname_list,
+                            Name="ParametricSetup1",
+                            IsEnabled=True,
+                            SaveFields=False,
+                            CopyMesh=False,
+                            SolveWithCopiedMeshOnly=True):
+    """
+    Insert an Optimetrics parametric setup with an arbitrary list of
+    variations.
+
+    All the variable sweeps are synchronized, so HFSS solves exactly the
+    given variations (and not their combinations).
+
+    Parameters
+    ----------
+    oDesign : pywin32 COMObject
+        The HFSS design object upon which to operate.
+    variations : list of dict
+        List of variations, each one as a dictionary with the variable names
+        as keys and their values as values (see generate_variations()).
+        All the variations must contain the same variables.
+    setupname_list : list of str
+        Names of the analysis setups to solve for each variation.
+    Name : str
+        Name of the parametric setup.
+    IsEnabled : bool
+        Whether the parametric setup is enabled.
+    SaveFields : bool
+        Whether to save the fields of every variation.
+    CopyMesh : bool
+        Whether to copy the mesh of the nominal design to the variations.
+    SolveWithCopiedMeshOnly : bool
+        Whether to solve only with the copied mesh.
+
+    Returns
+    -------
+    Name : str
+        The name of the parametric setup.
+    """
+    if not isinstance(setupname_list, list):
+        setupname_list = [setupname_list]
+
+    sweepsarray = ["NAME:Sweeps"]
+    for varname in variations[0]:
+        data = ', '.join([Ex(variation[varname]).expr for variation in variations])
+        sweepsarray.append(["NAME:SweepDefinition",
+                            "Variable:=", varname,
+                            "Data:=", data,
+                            "OffsetF1:=", False,
+                            "Synchronize:=", 1])
+
+    oModule = get_module(oDesign, "Optimetrics")
+    oModule.InsertSetup("OptiParametric",
+                        ["NAME:" + Name,
+                         "IsEnabled:=", IsEnabled,
+                         ["NAME:ProdOptiSetupDataV2",
+                          "SaveFields:=", SaveFields,
+                          "CopyMesh:=", CopyMesh,
+                          "SolveWithCopiedMeshOnly:=", SolveWithCopiedMeshOnly],
+                         ["NAME:StartingPoint"],
+                         "Sim. Setups:=", setupname_list,
+                         sweepsarray,
+                         ["NAME:Sweep Operations"],
+                         ["NAME:Goals"]])
+    return Name
+
+@conf.checkDefaultDesign
+def insert_doe_setup(oDesign,
+                     ranges,
+                     setupname_list,
+                     plan='full_factorial',
+                     samples=None,
+                     levels=3,
+                     seed=None,
+                     Name="ParametricSetup1",
+                     **kwargs):
+    """
+    Generate a design of experiments and insert all its variations in a
+    single parametric setup.
+
+    Parameters
+    ----------
+    oDesign : pywin32 COMObject
+        The HFSS design object upon which to operate.
+    ranges, plan, samples, levels, seed :
+        See generate_variations().
+    setupname_list, Name, **kwargs :
+        See insert_parametric_setup().
+
+    Returns
+    -------
+    variations : list of dict
+        The variations inserted in the parametric setup.
+    """
+    variations = generate_variations(ranges, plan=plan, samples=samples,
+                                     levels=levels, seed=seed)
+    insert_parametric_setup(oDesign, variations, setupname_list, Name=Name, **kwargs)
+    return variations
+
+@conf.checkDefaultDesign
+def solve_parametric_setup(oDesign, Name="ParametricSetup1"):
+    """
+    Solve all the variations of a parametric setup.
+
+    Parameters
+    ----------
+    oDesign : pywin32 COMObject
+        The HFSS design object upon which to operate.
+    Name : str
+        Name of the parametric setup.
+
+    Returns
+    -------
+    None
+    """
+    oModule = get_module(oDesign, "Optimetrics")
+    return oModule.SolveSetup(Name)
@@ -0,0 +1,251 @@
+# -*- coding: utf-8 -*-
+"""
+Local orchestration of parametric sweeps across several HFSS desktops.
+
+This is intended for variations that Optimetrics cannot express (e.g. the
+geometry is rebuilt from Python for each variation). The variation list is
+partitioned across the workers (one per desktop instance), each of them
+applies, solves and exports its variations, and all the results are
+aggregated into a single table. Idle workers steal pending variations
+from the busiest ones, so slow variations do not leave desktops idle.
+
+The orchestrator only calls the user functions, so it can be tried
+without HFSS by simulating the solve times.
+
+The workers run in threads of the same process, so they share the global
+COM objects of hycohanz.conf (the current desktop, project, design and
+editor). Each worker must create its own COM objects in setup_worker() and
+pass them explicitly to every hycohanz function. The local data of
+hycohanz (variable cache, model tables...) is kept per COM object, so the
+workers do not share it, and the updates of the stores themselves are
+serialized with conf.store_lock.
+
+Example Usage
+-------------
+>>> def setup_worker(projectfile):
+...     # COM objects must be created in the thread that uses them
+...     oAnsoftApp = win32com.client.Dispatch('AnsoftHfss.HfssScriptInterface')
+...     oDesktop = oAnsoftApp.GetAppDesktop()
+...     return hfss.open_project(oDesktop, projectfile)
+>>> def run_variation(oProject, variation):
+...     oDesign = hfss.get_active_design(oProject)
+...     hfss.set_variables(oDesign, variation)
+...     hfss.solve(oDesign, 'Setup1')
+...     return {'S11_file': export_s11(oDesign, variation)}
+>>> orchestrator = SweepOrchestrator(['C:/runs/w0.aedt', 'C:/runs/w1.aedt'],
+...                                  run_variation, setup_worker)
+>>> table = orchestrator.run(generate_variations({'W': ('6mm', '8mm')}, levels=9))
+>>> write_csv(table, 'results.csv')
+"""
+
+from __future__ import division, print_function, unicode_literals, absolute_import
+
+import collections
+import csv
+import threading
+import time
+
+class SweepOrchestrator(object):
+    """
+    Run a list of variations across several workers with work stealing.
+
+    Parameters
+    ----------
+    workers : int or list
+        Number of workers, or list with one object per worker (e.g. the
+        oDesktop of each HFSS instance) that is passed to setup_worker().
+    run_variation : callable
+        Function run_variation(context, variation) that applies a variation
+        (set_variables(), geometry construction...), solves it, exports the
+        results and returns them as a dictionary. context is the object
+        returned by setup_worker().
+    setup_worker : callable, optional
+        Function setup_worker(worker) called once in each worker thread
+        before running any variation, which returns the context given to
+        run_variation(). worker is the element of the workers list (or the
+        worker index if workers is an int). By default, the context is the
+        worker itself.
+    teardown_worker : callable, optional
+        Function teardown_worker(context) called once in each worker thread
+        after its last variation.
+    stop_on_error : bool
+        If True, pending variations are cancelled after the first failure,
+        and their rows get the 'cancelled' error. Otherwise, the error is
+        recorded in the results table.
+
+    Attributes
+    ----------
+    stats : dict
+        Statistics of the last run: number of variations run by each worker
+        ('completed'), number of variations stolen ('steals') and total
+        elapsed time in seconds ('elapsed').
+
+    """
+    def __init__(self, workers, run_variation, setup_worker=None,
+                 teardown_worker=None, stop_on_error=False):
+        if isinstance(workers, int):
+            workers = list(range(workers))
+        self.workers = list(workers)
+        self.run_variation = run_variation
+        self.setup_worker = setup_worker
+        self.teardown_worker = teardown_worker
+        self.stop_on_error = stop_on_error
+        self.stats = dict()
+        self._lock = threading.Lock()
+        self._queues = []
+        self._cancelled = False
+
+    def _partition(self, variations):
+        """
+        Splits the indexes of the variations into contiguous chunks, one
+        per worker.
+        """
+        n = len(self.workers)
+        size, remainder = divmod(len(variations), n)
+        queues = []
+        start = 0
+        for w in range(n):
+            stop = start + size + (1 if w < remainder else 0)
+            queues.append(collections.deque(range(start, stop)))
+            start = stop
+        return queues
+
+    def _next_index(self, w):
+        """
+        Returns the index of the next variation for worker w: the first one
+        of its own queue or, if it is empty, the last one of the longest
+        queue of the other workers. Returns None when there is no work left.
+        """
+        with self._lock:
+            if self._queues[w]:
+                return self._queues[w].popleft()
+            victim = max(range(len(self._queues)), key=lambda v: len(self._queues[v]))
+            if not self._queues[victim]:
+                return None
+            self.stats['steals'] += 1
+            return self._queues[victim].pop()
+
+    def _cancel(self):
+        with self._lock:
+            for queue in self._queues:
+                queue.clear()
+            self._cancelled = True
+
+    def _work(self, w, variations, rows):
+        try:
+            import pythoncom
+            pythoncom.CoInitialize()
+        except ImportError:
+            pythoncom = None
+
+        try:
+            if self.setup_worker is not None:
+                context = self.setup_worker(self.workers[w])
+            else:
+                context = self.workers[w]
+        except Exception as exc:
+            # This worker is lost, so its variations go to the other ones
+            rows.append({'worker': w, 'error': 'setup: {0}'.format(exc)})
+            if pythoncom is not None:
+                pythoncom.CoUninitialize()
+            return
+
+        try:
+            index = self._next_index(w)
+            while index is not None:
+                row = collections.OrderedDict(variations[index])
+                start = time.time()
+                try:
+                    results = self.run_variation(context, variations[index])
+                    row.update(results or {})
+                    row['error'] = ''
+                except Exception as exc:
+                    row['error'] = repr(exc)
+                    if self.stop_on_error:
+                        self._cancel()
+                row['index'] = index
+                row['worker'] = w
+                row['elapsed'] = time.time() - start
+                rows.append(row)
+                with self._lock:
+                    self.stats['completed'][w] += 1
+                index = self._next_index(w)
+        finally:
+            if self.teardown_worker is not None:
+                self.teardown_worker(context)
+            if pythoncom is not None:
+                pythoncom.CoUninitialize()
+
+    def run(self, variations):
+        """
+        Run all the variations and aggregate their results.
+
+        Parameters
+        ----------
+        variations : list of dict
+            List of variations, each one as a dictionary with the variable
+            names as keys and their values as values (see
+            generate_variations()).
+
+        Returns
+        -------
+        table : list of dict
+            One row per variation, in the order of the variations, with the
+            variable values, the results returned by run_variation(), and
+            the 'error', 'index', 'worker' and 'elapsed' columns. The
+            variations that never ran have the 'cancelled' error (see
+            stop_on_error) or the 'no worker' error (when the setup of every
+            worker failed), and no worker. Rows of workers whose setup
+            failed are appended at the end.
+        """
+        self._queues = self._partition(variations)
+        self._cancelled = False
+        self.stats = {'completed': [0]*len(self.workers), 'steals': 0, 'elapsed': 0.0}
+        rows = []
+
+        start = time.time()
+        threads = [threading.Thread(target=self._work, args=(w, variations, rows))
+                   for w in range(len(self.workers))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.stats['elapsed'] = time.time() - start
+
+        done = set(row['index'] for row in rows if 'index' in row)
+        for index in range(len(variations)):
+            if index not in done:
+                row = collections.OrderedDict(variations[index])
+                row['error'] = 'cancelled' if self._cancelled else 'no worker'
+                row['index'] = index
+                row['worker'] = None
+                row['elapsed'] = 0.0
+                rows.append(row)
+
+        return sorted(rows, key=lambda row: row.get('index', len(variations)))
+
+def write_csv(table, filename):
+    """
+    Write a results table (see SweepOrchestrator.run()) to a CSV file.
+
+    Parameters
+    ----------
+    table : list of dict
+        Rows of the table. Missing columns are left empty.
+    filename : str
+        Name of the CSV file.
+
+    Returns
+    -------
+    None
+    """
+    columns = []
+    for row in table:
+        for column in row:
+            if column not in columns:
+                columns.append(column)
+
+    with open(filename, 'w', newline='') as csvfile:
+        writer = csv.DictWriter(csvfile, fieldnames=columns)
+        writer.writeheader()
+        writer.writerows(table)
@@ -10,7 +10,8 @@ from __future__ import division, print_function, unicode_literals, absolute_impo
 
 import hycohanz.conf as conf
 from hycohanz.expression import Expression
-from hycohanz.desktop import get_active_project
+from hycohanz.variablegraph import VariableGraph
+import hycohanz.units as units
 import re
 import math
 from quantiphy import Quantity
@@ -24,6 +25,95 @@ constants_dict = {'c0': str(float(Quantity('c'))),
                   'u0': str(float(Quantity('mu0'))),
                   'pi': str(math.pi)}
 
+# Write-through cache with the last known values of the design and project
+# variables, in order to skip the writes that would not change anything in
+# HFSS (each write costs a COM call and a full model re-evaluation).
+# The cache is filled by every hycohanz write or read of a variable, so it
+# should be cleared with clear_variable_cache() if variables are modified
+# from outside hycohanz (e.g. from the HFSS GUI).
+_variable_cache = []
+_variable_cache_stats = {'writes': 0, 'elided': 0}
+
+# Local dependency graphs (one per design) of the known design and project
+# variables, so numeric values can be obtained without querying HFSS and
+# only the variables depending on a changed one are re-evaluated.
+_variable_graphs = []
+
+# Counter increased whenever a known variable value changes, so the data
+# computed from the variables (e.g. the local geometry of the model) can be
+# recomputed when needed.
+_variable_version = 0
+
+def _normalize_value(value):
+    """
+    Returns a normalized version of an HFSS value string, so equivalent
+    writes (e.g. '2 mm' and '2mm', or '1e-3' and '0.001') compare equal.
+    """
+    value = ''.join(value.split())
+    try:
+        return repr(float(value))
+    except ValueError:
+        return value
+
+def _variable_owner(oDesign, varName):
+    """
+    Returns the COM object owning a variable: the project of the design
+    for global ('$') variables and the design for the local ones.
+    """
+    if varName[0] == '$':
+        return oDesign.GetProject()
+    else:
+        return oDesign
+
+def _variable_changed(oOwner, varName, valueExpr):
+    """
+    Returns True if the value of a variable differs from the one in the
+    cache (or it is not known).
+    """
+    cache = conf.get_object_store(_variable_cache, oOwner)
+    return cache.get(varName) != _normalize_value(valueExpr)
+
+def _cache_variable(oDesign, oOwner, varName, valueExpr):
+    """
+    Stores the value of a variable in the cache and in the variable graphs.
+    Returns True if the value differs from the previously known one (or it
+    was not known).
+    """
+    global _variable_version
+    with conf.store_lock:
+        if _variable_graph(oDesign).set(varName, valueExpr):
+            _variable_version += 1
+
+        cache = conf.get_object_store(_variable_cache, oOwner)
+        normalized = _normalize_value(valueExpr)
+        if cache.get(varName) == normalized:
+            return False
+        cache[varName] = normalized
+
+        # Project variables are shared by all the designs of the project
+        if varName[0] == '$':
+            for graph in [pair[1] for pair in _variable_graphs]:
+                if varName in graph:
+                    graph.set(varName, valueExpr)
+        return True
+
+def _variable_graph(oDesign):
+    """
+    Returns the local dependency graph of the variables of a design.
+    """
+    return conf.get_object_store(_variable_graphs, oDesign,
+                                 lambda: VariableGraph(constants_dict))
+
+def _variable_value_expr(value):
+    """
+    Returns the HFSS string representation of a variable value, which can
+    be a single value or a list of them (array variable).
+    """
+    if isinstance(value, list):
+        return '['+','.join([Expression(i).expr for i in value])+']'
+    else:
+        return Expression(value).expr
+
 @conf.checkDefaultDesign
 def add_property(oDesign, name, value):
     """
@@ -72,39 +162,37 @@ def add_property(oDesign, name, value):
         newpropsarray = ["NAME:NewProps"]
 
         for n in range(len(design_varname_list)):
-            if isinstance(design_varvalue_list[n], list):
-                valueAux = '['+','.join([Expression(i).expr for i in design_varvalue_list[n]])+']'
-            else:
-                valueAux = Expression(design_varvalue_list[n]).expr
-
             newpropsarray.append(["NAME:" + design_varname_list[n],
                                "PropType:=", "VariableProp",
                                "UserDef:=", True,
-                               "Value:=", valueAux])
+                               "Value:=", _variable_value_expr(design_varvalue_list[n])])
 
         proptabarray = ["NAME:LocalVariableTab", propserversarray, newpropsarray]
         oDesign.ChangeProperty(["NAME:AllTabs", proptabarray])
 
+        for n in range(len(design_varname_list)):
+            _cache_variable(oDesign, oDesign, design_varname_list[n],
+                            _variable_value_expr(design_varvalue_list[n]))
+
     # For global variables
     if project_varname_list:
         propserversarray = ["NAME:PropServers", "ProjectVariables"]
         newpropsarray = ["NAME:NewProps"]
 
         for n in range(len(project_varname_list)):
-            if isinstance(project_varvalue_list[n], list):
-                valueAux = '['+','.join([Expression(i).expr for i in project_varvalue_list[n]])+']'
-            else:
-                valueAux = Expression(project_varvalue_list[n]).expr
-
             newpropsarray.append(["NAME:" + project_varname_list[n],
                                "PropType:=", "VariableProp",
                                "UserDef:=", True,
-                               "Value:=", valueAux])
+                               "Value:=", _variable_value_expr(project_varvalue_list[n])])
 
         proptabarray = ["NAME:ProjectVariableTab", propserversarray, newpropsarray]
-        oProject = get_active_project()
+        oProject = oDesign.GetProject()
         oProject.ChangeProperty(["NAME:AllTabs", proptabarray])
 
+        for n in range(len(project_varname_list)):
+            _cache_variable(oDesign, oProject, project_varname_list[n],
+                            _variable_value_expr(project_varvalue_list[n]))
+
     if single_value_flag:
         return Expression(name[0])
     else:
@@ -118,6 +206,9 @@ def set_variable(oDesign, name, value):
     makes the reasonable assumption that if the variable contains '$', then
     the variable is global; otherwise, it is assumed to be a local variable.
 
+    The write is skipped if the variable is already known to have the
+    same value (see get_variable_cache_stats()).
+
     Parameters
     ----------
     oDesign : pywin32 COMObject
@@ -132,11 +223,126 @@ def set_variable(oDesign, name, value):
     None
 
     """
-    if name[0] == '$':
-        oProject = get_active_project()
-        oProject.SetVariableValue(name,Expression(value).expr)
-    else:
-        oDesign.SetVariableValue(name,Expression(value).expr)
+    oOwner = _variable_owner(oDesign, name)
+    valueExpr = Expression(value).expr
+    if not _variable_changed(oOwner, name, valueExpr):
+        _variable_cache_stats['elided'] += 1
+        return
+
+    # The cache is only updated once HFSS has accepted the value
+    oOwner.SetVariableValue(name, valueExpr)
+    _cache_variable(oDesign, oOwner, name, valueExpr)
+    _variable_cache_stats['writes'] += 1
+
+@conf.checkDefaultDesign
+def set_variables(oDesign, variables):
+    """
+    Change several design and/or project properties at once.
+    As in set_variable(), if the variable contains '$', then the variable is
+    global (project); otherwise, it is assumed to be a local variable (design).
+
+    All the design variables are changed with a single ChangeProperty() call,
+    and the same happens with the project ones, so HFSS only re-evaluates
+    the model once per tab instead of once per variable. Variables already
+    known to have the requested value are left out of the call.
+
+    Parameters
+    ----------
+    oDesign : pywin32 COMObject
+        The HFSS design from which to retrieve the module.
+    variables : dict
+        Dictionary with the names of the properties to edit as keys, and
+        their new values (float, str or hycohanz Expression, or list of them)
+        as values.
+
+    Returns
+    -------
+    None
+
+    Example Usage
+    -------------
+    >>> set_variables(oDesign, {'W': '7.1mm', 'L': Expression('W')*0.7, '$freq': '14GHz'})
+    """
+    design_changedprops = ["NAME:ChangedProps"]
+    project_changedprops = ["NAME:ChangedProps"]
+    design_written = []
+    project_written = []
+    oProject = None
+    for varName, varValue in variables.items():
+        valueExpr = _variable_value_expr(varValue)
+        if varName[0] == '$':
+            if oProject is None:
+                oProject = oDesign.GetProject()
+            oOwner = oProject
+            changedprops = project_changedprops
+            written = project_written
+        else:
+            oOwner = oDesign
+            changedprops = design_changedprops
+            written = design_written
+
+        if not _variable_changed(oOwner, varName, valueExpr):
+            _variable_cache_stats['elided'] += 1
+            continue
+        changedprops.append(["NAME:" + varName, "Value:=", valueExpr])
+        written.append((varName, valueExpr))
+
+    # The cache is only updated once HFSS has accepted the values of a tab
+    # For local variables
+    if len(design_changedprops) > 1:
+        propserversarray = ["NAME:PropServers", "LocalVariables"]
+        proptabarray = ["NAME:LocalVariableTab", propserversarray, design_changedprops]
+        oDesign.ChangeProperty(["NAME:AllTabs", proptabarray])
+        for varName, valueExpr in design_written:
+            _cache_variable(oDesign, oDesign, varName, valueExpr)
+        _variable_cache_stats['writes'] += len(design_written)
+
+    # For global variables
+    if len(project_changedprops) > 1:
+        propserversarray = ["NAME:PropServers", "ProjectVariables"]
+        proptabarray = ["NAME:ProjectVariableTab", propserversarray, project_changedprops]
+        oProject.ChangeProperty(["NAME:AllTabs", proptabarray])
+        for varName, valueExpr in project_written:
+            _cache_variable(oDesign, oProject, varName, valueExpr)
+        _variable_cache_stats['writes'] += len(project_written)
+
+def get_variable_cache_stats():
+    """
+    Returns the statistics of the variable write cache.
+
+    Returns
+    -------
+    stats : dict
+        Dictionary with the number of variable writes sent to HFSS ('writes')
+        and the number of writes skipped because the variable already had
+        the requested value ('elided').
+    """
+    return dict(_variable_cache_stats)
+
+def clear_variable_cache(reset_stats=False):
+    """
+    Forget all the known variable values and dependencies, so the next
+    writes and reads are sent to HFSS. It should be called whenever the variables are
+    modified from outside hycohanz.
+
+    Parameters
+    ----------
+    reset_stats : bool
+        Whether to also reset the counters returned by
+        get_variable_cache_stats().
+
+    Returns
+    -------
+    None
+    """
+    global _variable_version
+    with conf.store_lock:
+        del _variable_cache[:]
+        del _variable_graphs[:]
+        _variable_version += 1
+    if reset_stats:
+        _variable_cache_stats['writes'] = 0
+        _variable_cache_stats['elided'] = 0
 
 @conf.checkDefaultProject
 def get_variables(oProject,oDesign=''):
@@ -183,11 +389,10 @@ def get_variable_value(oDesign,varName):
     string representing the value of the variable
 
     """
-    if varName[0] == '$':
-        oProject = get_active_project()
-        return oProject.GetVariableValue(Expression(varName).expr)
-    else:
-        return oDesign.GetVariableValue(Expression(varName).expr)
+    oOwner = _variable_owner(oDesign, varName)
+    varValue = oOwner.GetVariableValue(Expression(varName).expr)
+    _cache_variable(oDesign, oOwner, varName, varValue)
+    return varValue
 
 @conf.checkDefaultDesign
 def expand_expression(oDesign, exprValue):
@@ -243,7 +448,9 @@ def expand_expression(oDesign, exprValue):
 @conf.checkDefaultDesign
 def eval_expression(oDesign, exprValue):
     """
-    Evaluates an expression taking the necessary HFSS design variables
+    Evaluates an expression taking the necessary HFSS design variables.
+    Variable values are kept locally, so they are only requested to HFSS
+    the first time they are needed (or after clear_variable_cache()).
 
     Parameters
     ----------
@@ -266,16 +473,15 @@ def eval_expression(oDesign, exprValue):
     >>> expand_expression(oDesign, 'varC')
     0.0749661145
     """
-    str1 = expand_expression(oDesign, exprValue)
-    # print(str1)
-    for variableWithUnits in list(set(re.findall(r'\b[\d]+\.?[\d]*[A-Za-z]+', str1))):
-        # print(variableWithUnits)
-        if 'mil' in variableWithUnits:	# Catch non-standard units:
-            aux = variableWithUnits.replace('mil','')
-            str1 = str1.replace(variableWithUnits, str(float(aux)*2.54e-5))
-        else:
-            str1 = str1.replace(variableWithUnits, str(float(Quantity(variableWithUnits))))
-        # print(str1)
-    value = eval(str1)
+    # The values of the variables are taken from the local variable graph,
+    # so only the variables that are not known yet are requested to HFSS
+    graph = _variable_graph(oDesign)
+    str1 = Expression(exprValue).expr
+    missing = graph.missing(str1)
+    while missing:
+        for variable in missing:
+            get_variable_value(oDesign, variable)
+        missing = graph.missing(str1)
+    value = graph.evaluate(str1)
     # print('Expresion con unidades en SI: '+str1+' = '+str(value))
     return value
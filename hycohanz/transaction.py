@@ -0,0 +1,283 @@
+# -*- coding: utf-8 -*-
+"""
+Transactional groups of modeler and boundary operations.
+
+A transaction queues modeler3d and boundarysetup calls, validates each of
+them locally when it is queued (arguments, object names and face IDs), and
+sends them to HFSS together when the transaction ends. If a call fails
+while they are sent, the calls already executed are undone in the design,
+so no half-built geometry is left behind, and the local model table is
+restored.
+
+Example Usage
+-------------
+>>> with hfss.transaction() as t:
+...     substrate = t.create_box(0, 0, 0, "W", "L", "h", Name="Substrate")
+...     via = t.create_cylinder(0, 0, 0, "r", "h", Name="Via")
+...     t.subtract([substrate], [via])
+...     t.assign_perfect_e("Ground", [faceid])
+"""
+
+from __future__ import division, print_function, unicode_literals, absolute_import
+
+import inspect
+import math
+
+import numpy as np
+
+import hycohanz.boundarysetup as boundarysetup
+import hycohanz.conf as conf
+import hycohanz.geometry as geometry
+import hycohanz.modeler3d as modeler3d
+from hycohanz.deferred import DeferredModeler, _bulk_creations
+from hycohanz.model import model_table
+
+# Arguments holding object names and face IDs, which are validated
+_object_arguments = ('partlist', 'blanklist', 'toollist', 'obj_name_list', 'objname',
+                     'bodyname', 'body_name', 'oldname', 'objectsList')
+_face_arguments = ('facelist', 'faceidlist', 'faceList', 'faceid')
+
+# Functions that create objects whose names are not predicted, after which
+# the names of the objects cannot be validated anymore
+_unpredicted_creations = ('paste', 'clone', 'duplicate_along_line', 'duplicate_around_axis',
+                          'duplicate_mirror', 'import_model', 'import_models',
+                          'split', 'separate_body', 'create_object_from_faces')
+
+# Functions that do not modify the design
+_no_undo = ('copy', 'export_model')
+
+def _as_list(value):
+    if isinstance(value, (str, int)):
+        return [value]
+    return list(value)
+
+class Transaction(DeferredModeler):
+    """
+    Queues modeler3d and boundarysetup calls, and executes them with
+    execute(), undoing them all if any of them fails.
+
+    The functions are called as methods, without the editor or design
+    argument, and return as for the DeferredModeler: the creation functions
+    return the names of the new objects, and the rest return None. Queries
+    (get_*() functions) cannot be queued, and see the design as it was
+    before the transaction.
+
+    Parameters
+    ----------
+    oEditor : pywin32 COMObject
+        The HFSS editor in which the modeler calls will be executed. The
+        current global editor by default.
+    oDesign : pywin32 COMObject
+        The HFSS design of the editor, in which the boundary calls are
+        executed and the undo is done. By default, the design of the editor
+        (see set_active_editor()) or the current global design.
+
+    Attributes
+    ----------
+    results : list
+        Values returned by the calls of the last execute(), in order.
+    undone : int
+        Number of undo steps done by the last rollback.
+
+    Raises
+    ------
+    ValueError
+        When a call is queued with arguments that do not match the function,
+        or with objects or faces that do not exist.
+    Exception
+        When the design is not known, as the calls could not be undone.
+
+    """
+    _modules = (modeler3d, boundarysetup)
+
+    def __init__(self, oEditor=None, oDesign=None):
+        DeferredModeler.__init__(self, oEditor)
+        table = model_table(self.oEditor)
+        if oDesign is None:
+            oDesign = table.oDesign
+        if oDesign is None and conf.oDesignList:
+            oDesign = conf.oDesignList[-1]
+        if oDesign is None:
+            raise Exception("The design of the editor is not known, so the transaction could not be undone")
+        self.oDesign = oDesign
+        self.undone = 0
+        # Objects that will exist when the queued calls are executed, in
+        # lower case, or None when they cannot be predicted
+        if not table.synced:
+            table.reconcile(self.oEditor.GetMatchedObjectName("*"))
+        self._objects = set(name.lower() for name in table.names())
+
+    def _queue(self, attr, function, args, kwargs):
+        if attr.startswith('get_'):
+            raise ValueError("{0}() is a query and cannot be part of a transaction".format(attr))
+        try:
+            arguments = inspect.signature(function).bind(None, *args, **kwargs).arguments
+        except TypeError as error:
+            raise ValueError("{0}(): {1}".format(attr, error))
+        self._validate(attr, arguments)
+
+        names = DeferredModeler._queue(self, attr, function, args, kwargs)
+        self._track(attr, arguments, names)
+        return names
+
+    def _validate(self, attr, arguments):
+        """
+        Checks that the objects and faces in the arguments of a call exist.
+        """
+        if self._objects is not None:
+            for key in _object_arguments:
+                for name in _as_list(arguments.get(key, ())):
+                    if str(name).lower() not in self._objects:
+                        raise ValueError("{0}(): there is no object named {1}".format(attr, name))
+
+        faces = []
+        for key in _face_arguments:
+            faces.extend(_as_list(arguments.get(key, ())))
+        if not faces:
+            return
+        table = model_table(self.oEditor)
+        known = set()
+        for ids in table.topology.values():
+            known.update(ids.get('faces', ()))
+        for modelobject in table.objects.values():
+            known.update(foundid for (kind, key), foundid in modelobject.position_ids.items()
+                         if kind == 'face')
+        for face in faces:
+            if int(face) in known:
+                continue
+            try:
+                valid = bool(modeler3d.get_object_name_by_faceid(self.oEditor, int(face)))
+            except Exception:
+                valid = False
+            if not valid:
+                raise ValueError("{0}(): there is no face with ID {1}".format(attr, face))
+
+    def _track(self, attr, arguments, names):
+        """
+        Updates the objects that will exist after a queued call.
+        """
+        if self._objects is None:
+            return
+        if attr in _unpredicted_creations:
+            self._objects = None
+            return
+        if names is not None:
+            self._objects.update(name.lower() for name in _as_list(names))
+        removed = []
+        if attr == 'delete':
+            removed = arguments['partlist']
+        elif attr == 'subtract' and not arguments.get('KeepOriginals', False):
+            removed = arguments['toollist']
+        elif attr in ('unite', 'connect') and not arguments.get('KeepOriginals', False):
+            removed = arguments['partlist'][1:]
+        elif attr == 'rename_part':
+            removed = [arguments['oldname']]
+            self._objects.add(arguments['newname'].lower())
+        self._objects.difference_update(str(name).lower() for name in _as_list(removed))
+
+    def _run(self, function, args, kwargs):
+        self._names_before = set(model_table(self.oEditor).names())
+        if function.__module__ == boundarysetup.__name__:
+            return function(self.oDesign, *args, **kwargs)
+        return DeferredModeler._run(self, function, args, kwargs)
+
+    def execute(self):
+        """
+        Executes the queued calls, in order. If one of them fails, the calls
+        already executed are undone, the local model table is restored, and
+        the exception is raised again (also if the undo fails, with the
+        error of the undo as its context).
+
+        Returns
+        -------
+        results : list
+            Values returned by the calls.
+        """
+        table = model_table(self.oEditor)
+        snapshot = table.snapshot()
+        pending = list(self.pending)
+        self.undone = 0
+        try:
+            return DeferredModeler.execute(self)
+        except Exception as error:
+            try:
+                # Calls that completed, plus the objects already created by
+                # the failed one (e.g. the first boxes of a create_boxes() call)
+                steps = sum(_undo_steps(function.__name__, args, kwargs, result, self.oEditor)
+                            for (function, args, kwargs, predicted), result
+                            in zip(pending, self.results))
+                if pending[len(self.results)][0].__name__ in _bulk_creations:
+                    steps += len(set(table.names()) - self._names_before)
+                self.rollback(steps)
+            except Exception:
+                raise error
+            finally:
+                table.restore(snapshot)
+            raise
+        finally:
+            for function, args, kwargs, predicted in pending:
+                for name in predicted or ():
+                    table.reserved.discard(name.lower())
+
+    def rollback(self, steps):
+        """
+        Undoes the given number of operations in the design.
+        """
+        if self.oDesign is None:
+            raise Exception("The design of the editor is not known, so it cannot be restored")
+        for n in range(steps):
+            self.oDesign.Undo()
+        self.undone = steps
+
+def _undo_steps(attr, args, kwargs, result, oEditor):
+    """
+    Returns the number of HFSS operations done by a completed call.
+    """
+    if attr in _no_undo:
+        return 0
+    if attr == 'clone':
+        arguments = inspect.signature(modeler3d.clone).bind(None, *args, **kwargs).arguments
+        # A clone in place is duplicated and moved back
+        return 2 if modeler3d._is_zero_offset(oEditor, arguments.get('offset', (0, 0, 0))) else 1
+    if attr in _bulk_creations:
+        return len(result)
+    if attr == 'import_models':
+        return len(result)
+    if attr == 'create_polyline':
+        arguments = inspect.signature(modeler3d.create_polyline).bind(None, *args, **kwargs).arguments
+        maxpoints = arguments.get('MaxPoints')
+        points = len(arguments['x'])
+        if arguments.get('Tolerance') is not None:
+            coordinates = np.column_stack([np.asarray(arguments[c]) for c in 'xyz'])
+            points = len(geometry.simplify_polyline(coordinates, arguments['Tolerance']))
+        if maxpoints is not None and points > maxpoints:
+            # The chunks and their union
+            return int(math.ceil((points - 1)/(maxpoints - 1))) + 1
+    return 1
+
+@conf.checkDefaultEditor
+def transaction(oEditor, oDesign=None):
+    """
+    Returns a Transaction, to be used as a context manager: the calls queued
+    in the with block are validated as they are queued, and executed on exit
+    (unless an exception was raised in the block). If one of them fails, the
+    ones already executed are undone.
+
+    Parameters
+    ----------
+    oEditor : pywin32 COMObject
+        The HFSS editor in which the modeler calls will be executed.
+    oDesign : pywin32 COMObject
+        The HFSS design of the editor. See Transaction.
+
+    Returns
+    -------
+    transaction : hycohanz Transaction object
+
+    Example Usage
+    -------------
+    >>> with hfss.transaction() as t:
+    ...     t.create_box(0, 0, 0, 1, 1, 1, Name="Box")
+    ...     t.unite(["Box", "Body"])
+    """
+    return Transaction(oEditor, oDesign)
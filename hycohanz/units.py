@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+"""
+Conversion of HFSS unit-bearing literals (as '18um', '4GHz' or '30mil') to
+numbers in SI units, and local evaluation of numeric HFSS expressions.
+
+All the HFSS units handled by hycohanz are precompiled at import time in a
+single table (units_dict), so converting a literal is a dictionary lookup.
+Units not found in the table are parsed by quantiphy as a fallback.
+
+Example Usage
+-------------
+>>> import hycohanz.units as units
+>>> units.to_si('299792458.0/4GHz + 18um')
+'299792458.0/4000000000.0 + 1.8e-05'
+>>> units.evaluate('2*30mil')
+0.001524
+"""
+
+from __future__ import division, print_function, unicode_literals, absolute_import
+
+import re
+import math
+from functools import lru_cache
+
+import numpy as np
+from quantiphy import Quantity
+
+# SI prefixes and their multipliers
+prefixes_dict = {'f': 1e-15,
+                 'p': 1e-12,
+                 'n': 1e-9,
+                 'u': 1e-6,
+                 'm': 1e-3,
+                 '': 1.0,
+                 'k': 1e3,
+                 'M': 1e6,
+                 'G': 1e9,
+                 'T': 1e12}
+
+def _build_units_dict():
+    """
+    Returns the dictionary with every supported unit name and its
+    multiplier to SI units.
+    """
+    table = dict()
+
+    # Units admitting the SI prefixes: resistance, frequency, time,
+    # capacitance, inductance, voltage, current, power and conductance
+    for base in ['ohm', 'Ohm', 'Hz', 's', 'F', 'H', 'V', 'A', 'W', 'S']:
+        for prefix, multiplier in prefixes_dict.items():
+            table[prefix + base] = multiplier
+    # Length, which also admits centi and deci
+    for prefix, multiplier in list(prefixes_dict.items()) + [('c', 1e-2), ('d', 1e-1)]:
+        table[prefix + 'm'] = multiplier
+    table.update({'meter': 1.0,
+                  'meters': 1.0,
+                  'uin': 2.54e-8,
+                  'mil': 2.54e-5,
+                  'mils': 2.54e-5,
+                  'in': 2.54e-2,
+                  'inch': 2.54e-2,
+                  'ft': 0.3048,
+                  'yd': 0.9144,
+                  'mileUS': 1609.344,
+                  'mileNaut': 1852.0,
+                  'ltyr': 9.4607304725808e15})
+    # Angle (SI unit is the radian)
+    table.update({'rad': 1.0,
+                  'mrad': 1e-3,
+                  'urad': 1e-6,
+                  'deg': math.pi/180,
+                  'degmin': math.pi/180/60,
+                  'degsec': math.pi/180/3600})
+    # Other non-prefixed units
+    table.update({'megohm': 1e6,
+                  'mho': 1.0,
+                  'per_sec': 1.0,
+                  'min': 60.0,
+                  'hour': 3600.0})
+    return table
+
+# Dictionary with the supported unit names and their multipliers to SI units.
+# It is visible from outside in order to let the user add more units from
+# the executable scripts (clear_cache() must be called afterwards).
+units_dict = _build_units_dict()
+
+# Numeric literals with an optional unit attached, e.g. '2', '1.5e-3' or
+# '30mil'. Digits that are part of an identifier (as in 'var2') are skipped.
+_literal_regex = re.compile(r'(?<![\w.$])((?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)([A-Za-z_]\w*)?')
+
+# Functions available to HFSS expressions, with their HFSS names
+functions_dict = {'abs': abs,
+                  'sin': math.sin,
+                  'cos': math.cos,
+                  'tan': math.tan,
+                  'asin': math.asin,
+                  'acos': math.acos,
+                  'atan': math.atan,
+                  'atan2': math.atan2,
+                  'sinh': math.sinh,
+                  'cosh': math.cosh,
+                  'tanh': math.tanh,
+                  'sqrt': math.sqrt,
+                  'exp': math.exp,
+                  'ln': math.log,
+                  'log10': math.log10,
+                  'pow': math.pow,
+                  'min': min,
+                  'max': max,
+                  'int': int,
+                  'nint': round,
+                  'sgn': lambda x: (x > 0) - (x < 0)}
+
+# The same functions, applied element-wise to NumPy arrays
+array_functions_dict = {'abs': np.abs,
+                        'sin': np.sin,
+                        'cos': np.cos,
+                        'tan': np.tan,
+                        'asin': np.arcsin,
+                        'acos': np.arccos,
+                        'atan': np.arctan,
+                        'atan2': np.arctan2,
+                        'sinh': np.sinh,
+                        'cosh': np.cosh,
+                        'tanh': np.tanh,
+                        'sqrt': np.sqrt,
+                        'exp': np.exp,
+                        'ln': np.log,
+                        'log10': np.log10,
+                        'pow': np.power,
+                        'min': np.minimum,
+                        'max': np.maximum,
+                        'int': np.trunc,
+                        'nint': np.rint,
+                        'sgn': np.sign}
+
+@lru_cache(maxsize=4096)
+def _literal_to_si(number, unit):
+    """
+    Returns the string representation of a unit-bearing literal in SI units.
+    """
+    if unit in units_dict:
+        return repr(float(number)*units_dict[unit])
+    return repr(float(Quantity(number + unit)))
+
+def _replace_literal(match):
+    if match.group(2) is None:
+        return match.group(0)
+    return _literal_to_si(match.group(1), match.group(2))
+
+@lru_cache(maxsize=1024)
+def to_si(expr):
+    """
+    Replaces every unit-bearing literal in an expression by its value in
+    SI units, in a single pass.
+
+    Parameters
+    ----------
+    expr : str
+        Expression with numeric literals and units only (see
+        expand_expression() for removing the HFSS variables from it).
+
+    Returns
+    -------
+    str
+        Expression without units, in SI units.
+    """
+    return _literal_regex.sub(_replace_literal, expr)
+
+def parse_literal(literal):
+    """
+    Splits a single unit-bearing literal into its number and unit.
+
+    Parameters
+    ----------
+    literal : int, float or str
+        The literal to parse, as 3, '3' or '3mm'.
+
+    Returns
+    -------
+    value : float
+        The number of the literal, without converting it to SI units.
+    unit : str
+        The unit of the literal, or an empty string if it has no unit.
+    """
+    literal = ''.join(str(literal).split())
+    match = _literal_regex.match(literal.lstrip('+-'))
+    if match is None or match.end() != len(literal.lstrip('+-')):
+        raise ValueError("'{0}' is not a numeric literal".format(literal))
+    sign = -1 if literal.startswith('-') else 1
+    return sign*float(match.group(1)), match.group(2) or ''
+
+def evaluate(expr):
+    """
+    Evaluates an expression with numeric literals, units, HFSS functions
+    and operators only.
+
+    Parameters
+    ----------
+    expr : str
+        Expression to evaluate.
+
+    Returns
+    -------
+    value : float
+        Evaluated value in SI units.
+    """
+    return eval(to_si(expr).replace('^', '**'), {'__builtins__': {}}, functions_dict)
+
+def evaluate_array(expr, names):
+    """
+    Evaluates an expression element-wise, with the values of the names it
+    references (as the parameter _t of an equation based curve) given as
+    NumPy arrays or numbers.
+
+    Parameters
+    ----------
+    expr : str
+        Expression to evaluate.
+    names : dict
+        Dictionary with the names referenced by the expression as keys and
+        their values as values.
+
+    Returns
+    -------
+    value : numpy array or float
+        Evaluated value in SI units.
+    """
+    namespace = dict(array_functions_dict)
+    namespace.update(names)
+    return eval(to_si(expr).replace('^', '**'), {'__builtins__': {}}, namespace)
+
+def clear_cache():
+    """
+    Empties the caches of parsed literals and expressions. It must be called
+    whenever units_dict is modified.
+    """
+    _literal_to_si.cache_clear()
+    to_si.cache_clear()
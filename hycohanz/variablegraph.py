@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+Local dependency graph of the HFSS project and design variables.
+
+Variables usually reference each other (e.g. varC = c0/varB + varA), so
+the graph stores the expression of each known variable, the variables it
+depends on and its numeric value. When a variable changes, only the
+variables depending on it are re-evaluated, in topological order.
+
+"""
+
+from __future__ import division, print_function, unicode_literals, absolute_import
+
+import re
+
+import hycohanz.units as units
+
+# Names of variables (or constants) referenced by an expression. Units are
+# not matched because they are attached to a number (e.g. '4GHz').
+_name_regex = re.compile(r'\$?\b[a-zA-Z_]\w*')
+
+class VariableGraph(object):
+    """
+    Dependency graph of HFSS variables with their numeric values.
+
+    Parameters
+    ----------
+    constants : dict
+        Dictionary with the names of the HFSS constants as keys and their
+        values (as str) as values. These names are never treated as
+        variables.
+
+    Attributes
+    ----------
+    expressions : dict
+        Expression (str) of each known variable.
+    dependencies : dict
+        Set of names of the variables referenced by each known variable.
+    dependents : dict
+        Set of names of the known variables referencing each variable.
+    values : dict
+        Numeric value in SI units of each variable whose expression and
+        dependencies are known and could be evaluated.
+
+    """
+    def __init__(self, constants=None):
+        self.constants = constants if constants is not None else {}
+        self.expressions = dict()
+        self.dependencies = dict()
+        self.dependents = dict()
+        self.values = dict()
+
+    def __contains__(self, name):
+        return name in self.expressions
+
+    def references(self, expr):
+        """
+        Returns the set of variable names referenced by an expression.
+        """
+        return set(name for name in _name_regex.findall(expr)
+                   if name not in self.constants
+                   and name not in units.functions_dict)
+
+    def missing(self, expr):
+        """
+        Returns the set of variables needed to evaluate an expression
+        (directly or through other variables) whose expression is unknown.
+        """
+        missing = set()
+        pending = list(self.references(expr))
+        visited = set()
+        while pending:
+            name = pending.pop()
+            if name in visited:
+                continue
+            visited.add(name)
+            if name in self.expressions:
+                pending.extend(self.dependencies[name])
+            else:
+                missing.add(name)
+        return missing
+
+    def descendants(self, name):
+        """
+        Returns the variables depending (directly or indirectly) on a given
+        one, in topological order.
+
+        Raises
+        ------
+        ValueError
+            If the variables have a circular dependency.
+        """
+        # Depth-first search in reverse post-order
+        order = []
+        state = dict()
+        stack = [(name, iter(sorted(self.dependents.get(name, ()))))]
+        state[name] = 'open'
+        while stack:
+            node, children = stack[-1]
+            for child in children:
+                if state.get(child) == 'open':
+                    raise ValueError("Circular dependency in variable '{0}'".format(child))
+                if child not in state:
+                    state[child] = 'open'
+                    stack.append((child, iter(sorted(self.dependents.get(child, ())))))
+                    break
+            else:
+                stack.pop()
+                state[node] = 'closed'
+                order.append(node)
+        order.reverse()
+        return order[1:]
+
+    def set(self, name, expr):
+        """
+        Set the expression of a variable and re-evaluate it and its
+        descendants.
+
+        Parameters
+        ----------
+        name : str
+            Name of the variable.
+        expr : str
+            Expression of the variable, as given to HFSS.
+
+        Returns
+        -------
+        updated : list of str
+            Names of the variables whose value was re-evaluated, in order.
+        """
+        expr = str(expr)
+        if self.expressions.get(name) == expr:
+            return []
+
+        for dependency in self.dependencies.get(name, ()):
+            self.dependents[dependency].discard(name)
+        self.expressions[name] = expr
+        self.dependencies[name] = self.references(expr)
+        for dependency in self.dependencies[name]:
+            self.dependents.setdefault(dependency, set()).add(name)
+
+        updated = [name] + self.descendants(name)
+        for variable in updated:
+            self._evaluate_variable(variable)
+        return updated
+
+    def remove(self, name):
+        """
+        Forget a variable. The variables depending on it lose their value.
+        """
+        if name not in self.expressions:
+            return
+        descendants = self.descendants(name)
+        for dependency in self.dependencies.pop(name):
+            self.dependents[dependency].discard(name)
+        del self.expressions[name]
+        self.values.pop(name, None)
+        for variable in descendants:
+            self.values.pop(variable, None)
+
+    def clear(self):
+        """
+        Forget all the variables.
+        """
+        self.expressions.clear()
+        self.dependencies.clear()
+        self.dependents.clear()
+        self.values.clear()
+
+    def _substitute(self, expr):
+        """
+        Returns the expression with its variables and constants replaced by
+        their numeric values, or None if any of them is not known.
+        """
+        unknown = []
+        def replace(match):
+            name = match.group(0)
+            if name in self.constants:
+                return '(' + str(self.constants[name]) + ')'
+            if name in units.functions_dict:
+                return name
+            if name in self.values:
+                return '(' + repr(self.values[name]) + ')'
+            unknown.append(name)
+            return name
+        expr = _name_regex.sub(replace, expr)
+        return None if unknown else expr
+
+    def _evaluate_variable(self, name):
+        expr = self._substitute(self.expressions[name])
+        try:
+            self.values[name] = units.evaluate(expr)
+        except Exception:
+            # Unknown dependencies, array variables, unsupported syntax...
+            self.values.pop(name, None)
+
+    def evaluate(self, expr):
+        """
+        Evaluates an expression with the known variable values.
+
+        Parameters
+        ----------
+        expr : str
+            Expression to evaluate.
+
+        Returns
+        -------
+        value : float
+            Evaluated value in SI units.
+
+        Raises
+        ------
+        KeyError
+            If the value of any of the referenced variables is not known.
+        """
+        substituted = self._substitute(expr)
+        if substituted is None:
+            raise KeyError("Unknown variables in '{0}'".format(expr))
+        return units.evaluate(substituted)
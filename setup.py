@@ -8,5 +8,5 @@ setup(name='hycohanz',
       author_email='mradway@gmail.com',
       version='0.0.2pre',
       packages=['hycohanz'],
-      install_requires=['pywin32', 'quantiphy']
+      install_requires=['pywin32', 'quantiphy', 'numpy']
       )